@@ -17,8 +17,10 @@ import os
 import sys
 import argparse
 import hashlib
+import time
+import zlib
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Dict, List, NamedTuple, Tuple, Optional
 import zipfile
 import re
 
@@ -32,6 +34,102 @@ FLAG_ENCRYPTED = 0x0001  # Source was encrypted (now decrypted)
 FLAG_REGION_JP = 0x0010
 FLAG_REGION_US = 0x0020
 FLAG_REGION_EU = 0x0040
+FLAG_PREVIEW = 0x0100    # Menu preview section present (see ngfc_preview.py)
+FLAG_BOOT_ORDER = 0x0200  # Sections stored in boot-priority chunks (see chunk map)
+FLAG_BANK_TABLES = 0x0400  # Address translation tables present (see build_bank_tables)
+FLAG_LINK_FRAMES = 0x0800  # S, M and C-ROM stored as link frames (see encode_link_frames)
+FLAG_PAIR_TABLE = 0x1000  # C-ROM pair size table after the header (see pack_pair_table)
+
+# Menu preview section: fixed, sector-aligned location so the menu can
+# fetch it with one aligned read. Data sections follow it when present.
+PREVIEW_OFFSET = 0x200
+PREVIEW_SIZE = 0x1200
+
+# C-ROM pair size table: only written when the chip size changes between
+# pairs in a way c_pair_size cannot describe (e.g. 4, 4, 2, 1 MB pairs).
+# Fixed location right after the header; data then starts at the next sector.
+PAIR_TABLE_OFFSET = NGFC_HEADER_SIZE
+PAIR_TABLE_MAGIC = b'NGPT'
+PAIR_TABLE_HEADER_SIZE = 8  # magic, pair count (2), reserved (2)
+PAIR_TABLE_MAX = (PREVIEW_OFFSET - PAIR_TABLE_OFFSET - PAIR_TABLE_HEADER_SIZE) // 4
+
+# Data sections, in file order
+SECTION_ORDER = ('p', 's', 'm', 'v', 'c')
+
+# Streaming chunk size for extract/verify (multiple of 32 bytes)
+STREAM_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Boot-first layout: P, M and S-ROM plus the first part of V-ROM and C-ROM
+# are stored first, so firmware can release reset once that prefix is loaded
+# and stream the remaining chunks in the background
+CHUNK_MAP_MAGIC = b'NGCM'
+CHUNK_MAP_HEADER_SIZE = 16
+CHUNK_ENTRY_SIZE = 16
+SECTOR_SIZE = 512
+BOOT_CHUNK_SIZE = 1024 * 1024
+BOOT_C_SIZE = 4 * 1024 * 1024
+BOOT_V_SIZE = 1024 * 1024
+SD_READ_RATE = 10 * 1024 * 1024  # Bytes/s assumed for load time estimates
+
+# Address translation tables: sector-aligned after the header (or preview),
+# before the data, for firmware to DMA into RAM. u32 arrays behind a directory:
+#   MASK  mirror masks of P, S, M, V, C (pow2 - 1), sprite tile mask, 2 spare
+#   PBNK  P-ROM 0x200000 window: (offset, mask) for each bank select 0-7
+#   MBNK  Z80 windows 2/4/8/16 KB (0xF000/0xE000/0xC000/0x8000): offset of banks 0-255
+#   CPAR  per C-ROM pair: first tile, tile count, section offset, chip size
+#   VBNK  YM2610 1 MB pages: ADPCM-A pages 0-15, ADPCM-B pages 0-15 (or unmapped)
+BANK_TABLES_MAGIC = b'NGBT'
+BANK_TABLES_VERSION = 1
+BANK_TABLES_HEADER_SIZE = 16
+BANK_TABLE_DIR_SIZE = 16
+BANK_TABLE_IDS = ('MASK', 'PBNK', 'MBNK', 'CPAR', 'VBNK')
+BANK_MASK_ENTRIES = 8
+BANK_UNMAPPED = 0xFFFFFFFF
+P_BANK_SIZE = 0x100000
+P_BANK_COUNT = 8
+M_WINDOW_SHIFTS = (11, 12, 13, 14)
+M_BANK_COUNT = 256
+M_BANK_ADDRESS_MASK = 0x3FFFF
+V_PAGE_SIZE = 0x100000
+V_PAGE_COUNT = 16
+V_ADDRESS_SPACE = V_PAGE_SIZE * V_PAGE_COUNT
+SPRITE_TILE_SIZE = 128  # Bytes per tile in a transformed C-ROM pair
+
+# Link frames: S, M and C-ROM pre-encoded for the inter-Pico links, so Pico A
+# can DMA them from SD to the link PIO unmodified. C-ROM goes over link B,
+# S then M-ROM over link C. A frame is a 16-byte header and its payload,
+# LINK_FRAME_SIZE bytes (16 sectors) except a section's last frame, which is
+# padded to a sector:
+#   u8 sync 0xA5, u8 target (bit 7: last frame of the section),
+#   u16 payload length, u32 sequence number (per link), u32 target address
+#   (section offset), u32 CRC32 of header bytes 0-11 and the payload
+LINK_FRAME_SYNC = 0xA5
+LINK_FRAME_HEADER_SIZE = 16
+LINK_FRAME_SIZE = 8192
+LINK_PAYLOAD_SIZE = LINK_FRAME_SIZE - LINK_FRAME_HEADER_SIZE
+LINK_LAST_FRAME = 0x80
+LINK_TARGETS = {'s': 2, 'm': 3, 'c': 1}  # Pico C fix ROM, Pico C Z80 ROM, Pico B sprite memory
+LINK_STREAMS = {'s': 'C', 'm': 'C', 'c': 'B'}
+
+# Game database
+GAMEDB_PATH = Path(__file__).with_name('ngfc_gamedb.tsv')
+ROM_ROLES = ('p', 's', 'm', 'v', 'c')
+ADPCMB_INDEX = 256  # V-ROM index of the first file of a separate ADPCM-B region
+GAMEDB_FILE_HEADER = (
+    "# NGFC game database - one line per ROM file, tab separated:\n"
+    "# set\tngh\tflags\trole\tindex\tsize\tcrc32\tname\n"
+    "# role: p/s/m/v/c; index: load order (C-ROM: chip number, odd chips first in a pair;\n"
+    "# V-ROM: ADPCM-B files of sets with a separate ADPCM-B region from 256)\n"
+    "# Regenerate with: ngfc_converter.py gamedb build <mame -listxml output>\n"
+)
+NGH_MAP_PATH = Path(__file__).with_name('ngfc_ngh.tsv')
+
+# 68000 cartridge header in the P-ROM: "NEO-GEO" at 0x100, then the NGH
+# number as a BCD word at 0x108. P-ROMs stored banked area first (MAME
+# ROM_CONTINUE) have it 1 MB in.
+PROM_HEADER_MAGIC = b'NEO-GEO'
+PROM_HEADER_OFFSETS = (0x100, 0x100100)
+PROM_NGH_OFFSET = 8
 
 
 class NGFCHeader:
@@ -49,12 +147,18 @@ class NGFCHeader:
         self.c_size = 0  # After transformation
         self.c_size_original = 0  # Before transformation
         self.crc32 = 0
-        self.reserved = bytes(24)
+        self.c_pair_size = 0  # Size of each C-ROM chip (last pair may be smaller)
+        self.pair_sizes = []  # Pair size table (FLAG_PAIR_TABLE): chip size of every pair
+        self.boot_prefix = 0  # Boot-first files: bytes to load before releasing reset
+        self.chunk_map_offset = 0  # Boot-first files: file offset of the chunk map
+        self.tables_offset = 0  # Bank tables: file offset
+        self.tables_size = 0  # Bank tables: size in bytes
+        self.adpcma_size = 0  # V-ROM bytes of ADPCM-A when ADPCM-B has its own region (0: shared)
     
     def pack(self) -> bytes:
         """Pack header into 64 bytes."""
         return struct.pack(
-            '<4sHHIIIIIIII24s',
+            '<4sHHIIIIIIIIIIIIII',
             self.magic,
             self.version,
             self.flags,
@@ -66,7 +170,12 @@ class NGFCHeader:
             self.c_size,
             self.c_size_original,
             self.crc32,
-            self.reserved
+            self.c_pair_size,
+            self.boot_prefix,
+            self.chunk_map_offset,
+            self.tables_offset,
+            self.tables_size,
+            self.adpcma_size
         )
     
     @classmethod
@@ -88,13 +197,502 @@ class NGFCHeader:
             header.c_size,
             header.c_size_original,
             header.crc32,
-            header.reserved
-        ) = struct.unpack('<4sHHIIIIIIII24s', data[:NGFC_HEADER_SIZE])
+            header.c_pair_size,
+            header.boot_prefix,
+            header.chunk_map_offset,
+            header.tables_offset,
+            header.tables_size,
+            header.adpcma_size
+        ) = struct.unpack('<4sHHIIIIIIIIIIIIII', data[:NGFC_HEADER_SIZE])
         
         if header.magic != NGFC_MAGIC:
             raise ValueError(f"Invalid magic: {header.magic}")
         
+        if header.flags & FLAG_PAIR_TABLE:
+            table = data[PAIR_TABLE_OFFSET:PAIR_TABLE_OFFSET + PAIR_TABLE_HEADER_SIZE]
+            if len(table) < PAIR_TABLE_HEADER_SIZE:
+                raise ValueError("Data ends before the C-ROM pair table (use NGFCHeader.read)")
+            magic, count, _ = struct.unpack('<4sHH', table)
+            end = PAIR_TABLE_OFFSET + PAIR_TABLE_HEADER_SIZE + count * 4
+            if magic != PAIR_TABLE_MAGIC or count > PAIR_TABLE_MAX or len(data) < end:
+                raise ValueError("Invalid C-ROM pair table")
+            header.pair_sizes = list(struct.unpack(f'<{count}I', data[end - count * 4:end]))
+            if sum(header.pair_sizes) * 2 != header.c_size:
+                raise ValueError("C-ROM pair table does not match the C-ROM size")
+        
         return header
+    
+    @classmethod
+    def read(cls, f) -> 'NGFCHeader':
+        """Read the header, and the C-ROM pair table when present, from an open file."""
+        f.seek(0)
+        return cls.unpack(f.read(PREVIEW_OFFSET))
+    
+    def pack_pair_table(self) -> bytes:
+        """C-ROM pair size table (FLAG_PAIR_TABLE) that follows the header."""
+        return struct.pack(f'<4sHH{len(self.pair_sizes)}I', PAIR_TABLE_MAGIC,
+                           len(self.pair_sizes), 0, *self.pair_sizes)
+    
+    def packed_size(self) -> int:
+        """Bytes of header data at the start of the file (header and pair table)."""
+        if self.flags & FLAG_PAIR_TABLE:
+            return PAIR_TABLE_OFFSET + PAIR_TABLE_HEADER_SIZE + 4 * len(self.pair_sizes)
+        return NGFC_HEADER_SIZE
+    
+    def data_offset(self) -> int:
+        """File offset of the first data section."""
+        if self.flags & FLAG_BANK_TABLES:
+            return _align(self.tables_offset + self.tables_size)
+        if self.flags & FLAG_PREVIEW:
+            return PREVIEW_OFFSET + PREVIEW_SIZE
+        if self.flags & FLAG_PAIR_TABLE:
+            return _align(self.packed_size())
+        return NGFC_HEADER_SIZE
+    
+    def sections(self) -> List[Tuple[str, int, int]]:
+        """
+        Standard file layout as (section, offset, size), in SECTION_ORDER.
+        
+        Link-framed sections start on a sector boundary, offset is that of
+        their first frame. Boot-first files store sections in chunks
+        instead; use read_section_extents() to locate data in any file.
+        """
+        return [(name, offset, size) for name, offset, size, _ in self._section_spans()]
+    
+    def data_end(self) -> int:
+        """End of the data sections in a standard layout file."""
+        spans = self._section_spans()
+        return spans[-1][1] + spans[-1][3]
+    
+    def _section_spans(self) -> List[Tuple[str, int, int, int]]:
+        spans = []
+        offset = self.data_offset()
+        framed = self.flags & FLAG_LINK_FRAMES
+        for name in SECTION_ORDER:
+            size = getattr(self, f'{name}_size')
+            file_size = size
+            if framed and name in LINK_TARGETS:
+                offset = _align(offset)
+                file_size = link_section_size(size)
+            spans.append((name, offset, size, file_size))
+            offset += file_size
+        return spans
+    
+    def c_pair_sizes(self) -> List[int]:
+        """
+        Chip size of each C-ROM pair: from the pair table when present,
+        else c_pair_size for every pair but a smaller last one (files
+        written before c_pair_size: one pair).
+        """
+        if self.pair_sizes:
+            return list(self.pair_sizes)
+        total = self.c_size // 2
+        if not self.c_pair_size:
+            return [total] if total else []
+        sizes = [self.c_pair_size] * (total // self.c_pair_size)
+        if total % self.c_pair_size:
+            sizes.append(total % self.c_pair_size)
+        return sizes
+
+
+class Chunk(NamedTuple):
+    """One entry of a boot-first chunk map."""
+    section: str
+    section_offset: int
+    file_offset: int
+    size: int
+
+
+def _align(value: int, alignment: int = SECTOR_SIZE) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+
+def plan_boot_layout(sizes: Dict[str, int], data_offset: int,
+                     chunk_size: int = BOOT_CHUNK_SIZE,
+                     boot_c: int = BOOT_C_SIZE,
+                     boot_v: int = BOOT_V_SIZE) -> Tuple[List[Chunk], int]:
+    """
+    Order sections and chunks by boot priority.
+    
+    The boot prefix holds P-ROM, M-ROM and S-ROM whole, then the first
+    boot_v bytes of V-ROM and boot_c bytes of C-ROM. The rest of V and C
+    follows in chunk_size chunks, interleaved in proportion to their size
+    so both finish loading together. The chunk map sits at data_offset and
+    every chunk starts on a sector boundary.
+    
+    Returns (chunks in file order, boot prefix end offset).
+    """
+    if chunk_size % SECTOR_SIZE:
+        raise ValueError(f"Chunk size must be a multiple of {SECTOR_SIZE} bytes")
+    
+    pieces = [(name, 0, sizes[name]) for name in ('p', 'm', 's') if sizes[name]]
+    heads = {name: min(sizes[name], _align(limit)) for name, limit in (('v', boot_v), ('c', boot_c))}
+    pieces += [(name, 0, heads[name]) for name in ('v', 'c') if heads[name]]
+    boot_count = len(pieces)
+    
+    # Remaining V/C chunks, merged by fraction of the section already placed
+    pending = {}
+    for name in ('v', 'c'):
+        pending[name] = [(name, start, min(chunk_size, sizes[name] - start))
+                         for start in range(heads[name], sizes[name], chunk_size)]
+    while pending['v'] or pending['c']:
+        def progress(name):
+            return pending[name][0][1] / sizes[name] if pending[name] else 2.0
+        pieces.append(pending[min(('v', 'c'), key=progress)].pop(0))
+    
+    offset = _align(data_offset + CHUNK_MAP_HEADER_SIZE + CHUNK_ENTRY_SIZE * len(pieces))
+    chunks = []
+    boot_prefix = offset
+    for idx, (name, start, size) in enumerate(pieces):
+        chunks.append(Chunk(name, start, offset, size))
+        offset = _align(offset + size)
+        if idx < boot_count:
+            boot_prefix = chunks[-1].file_offset + size
+    
+    return chunks, boot_prefix
+
+
+def pack_chunk_map(chunks: List[Chunk], boot_count: int) -> bytes:
+    """
+    Pack a chunk map.
+    
+    Header: magic "NGCM", entry count (4), boot entry count (4), reserved (4).
+    Entry: section index in SECTION_ORDER (1), reserved (3),
+           section offset (4), file offset (4), size (4).
+    """
+    data = struct.pack('<4sIII', CHUNK_MAP_MAGIC, len(chunks), boot_count, 0)
+    for chunk in chunks:
+        data += struct.pack('<B3xIII', SECTION_ORDER.index(chunk.section),
+                            chunk.section_offset, chunk.file_offset, chunk.size)
+    return data
+
+
+def read_chunk_map(f, offset: int) -> Tuple[List[Chunk], int]:
+    """Read a chunk map from an open file. Returns (chunks, boot entry count)."""
+    f.seek(offset)
+    magic, count, boot_count, _ = struct.unpack('<4sIII', f.read(CHUNK_MAP_HEADER_SIZE))
+    if magic != CHUNK_MAP_MAGIC:
+        raise ValueError(f"Invalid chunk map magic: {magic}")
+    data = f.read(CHUNK_ENTRY_SIZE * count)
+    chunks = []
+    for idx in range(count):
+        section, section_offset, file_offset, size = struct.unpack_from('<B3xIII', data, idx * CHUNK_ENTRY_SIZE)
+        chunks.append(Chunk(SECTION_ORDER[section], section_offset, file_offset, size))
+    return chunks, boot_count
+
+
+def read_section_extents(f, header: NGFCHeader) -> Dict[str, List[Tuple[int, int, int]]]:
+    """
+    Locate every section's data in an open NGFC file.
+    
+    Returns section -> [(section offset, file offset, size)], sorted by
+    section offset. Standard files have one extent per section, or one
+    per frame payload for link-framed sections.
+    """
+    if not header.flags & FLAG_BOOT_ORDER:
+        extents = {}
+        for name, offset, size in header.sections():
+            if header.flags & FLAG_LINK_FRAMES and name in LINK_TARGETS:
+                extents[name] = [(start, offset + start // LINK_PAYLOAD_SIZE * LINK_FRAME_SIZE
+                                  + LINK_FRAME_HEADER_SIZE, min(LINK_PAYLOAD_SIZE, size - start))
+                                 for start in range(0, size, LINK_PAYLOAD_SIZE)]
+            else:
+                extents[name] = [(0, offset, size)] if size else []
+        return extents
+    
+    extents = {name: [] for name in SECTION_ORDER}
+    chunks, _ = read_chunk_map(f, header.chunk_map_offset)
+    for chunk in chunks:
+        extents[chunk.section].append((chunk.section_offset, chunk.file_offset, chunk.size))
+    for name in SECTION_ORDER:
+        extents[name].sort()
+    return extents
+
+
+def _mirror_mask(size: int) -> int:
+    """Address mask of a ROM mirrored to the next power of two (0 if empty)."""
+    return (1 << (size - 1).bit_length()) - 1 if size else 0
+
+
+def adpcm_regions(v_size: int, adpcma_size: int = 0) -> List[Tuple[int, int]]:
+    """
+    V-ROM (offset, size) of the ADPCM-A and ADPCM-B sample regions.
+    
+    Sets with a separate ADPCM-B region (adpcma_size set) keep it after
+    the ADPCM-A data. Otherwise ADPCM-B starts after the first 16 MB when
+    V-ROM is larger, and both channel types share V-ROM when it is not.
+    """
+    if adpcma_size:
+        return [(0, adpcma_size), (adpcma_size, v_size - adpcma_size)]
+    if v_size > V_ADDRESS_SPACE:
+        return [(0, V_ADDRESS_SPACE), (V_ADDRESS_SPACE, v_size - V_ADDRESS_SPACE)]
+    return [(0, v_size), (0, v_size)]
+
+
+def build_bank_tables(sizes: Dict[str, int], c_pair_sizes: List[int],
+                      adpcma_size: int = 0) -> Dict[str, List[int]]:
+    """
+    Precompute the address translation tables for a game (see BANK_TABLE_IDS).
+    
+    Entries are section offsets, so firmware maps a CPU/chip address with
+    one lookup and one mask instead of deriving banks from section sizes.
+    """
+    p_size, m_size, v_size = sizes['p'], sizes['m'], sizes['v']
+    masks = [_mirror_mask(sizes[name]) for name in SECTION_ORDER]
+    c_tiles = sizes['c'] // SPRITE_TILE_SIZE
+    masks.append(_mirror_mask(c_tiles))
+    masks += [0] * (BANK_MASK_ENTRIES - len(masks))
+    
+    # P-ROM 0x200000-0x2FFFFF window: bank select n maps offset (n + 1) MB;
+    # empty banks fall back to the first, sets of 1 MB or less map offset 0
+    p_banks = []
+    for select in range(P_BANK_COUNT):
+        base = (select + 1) * P_BANK_SIZE if p_size > P_BANK_SIZE else 0
+        if base >= p_size:
+            base = P_BANK_SIZE if p_size > P_BANK_SIZE else 0
+        p_banks += [base, min(P_BANK_SIZE, _mirror_mask(p_size - base) + 1) - 1 if p_size else 0]
+    
+    # Z80 windows 0xF000/0xE000/0xC000/0x8000: bank n maps offset n << shift
+    m_mask = _mirror_mask(m_size) & M_BANK_ADDRESS_MASK
+    m_banks = [(bank << shift) & m_mask for shift in M_WINDOW_SHIFTS for bank in range(M_BANK_COUNT)]
+    
+    # C-ROM pairs: first tile, tile count, section offset, chip size
+    c_pairs = []
+    tile = offset = 0
+    for chip_size in c_pair_sizes:
+        c_pairs += [tile, chip_size * 2 // SPRITE_TILE_SIZE, offset, chip_size]
+        tile += chip_size * 2 // SPRITE_TILE_SIZE
+        offset += chip_size * 2
+    
+    # YM2610 1 MB pages of each sample region (see adpcm_regions), mirrored
+    # up to 16 MB; unbacked pages unmapped
+    v_pages = []
+    for base, size in adpcm_regions(v_size, adpcma_size):
+        size = min(size, V_ADDRESS_SPACE)
+        mask = _mirror_mask(size)
+        for page in range(V_PAGE_COUNT):
+            offset = (page * V_PAGE_SIZE) & mask
+            v_pages.append(base + offset if offset < size else BANK_UNMAPPED)
+    
+    return {'MASK': masks, 'PBNK': p_banks, 'MBNK': m_banks, 'CPAR': c_pairs, 'VBNK': v_pages}
+
+
+def pack_bank_tables(tables: Dict[str, List[int]]) -> bytes:
+    """Pack tables as u32 arrays, 16-byte aligned, behind a directory."""
+    ids = [table_id for table_id in BANK_TABLE_IDS if table_id in tables]
+    offset = BANK_TABLES_HEADER_SIZE + BANK_TABLE_DIR_SIZE * len(ids)
+    directory = bytearray()
+    body = bytearray()
+    for table_id in ids:
+        entries = tables[table_id]
+        directory += struct.pack('<4sIII', table_id.encode(), offset + len(body), len(entries), 0)
+        body += struct.pack(f'<{len(entries)}I', *entries)
+        body += bytes(-len(body) % 16)
+    payload = bytes(directory + body)
+    size = BANK_TABLES_HEADER_SIZE + len(payload)
+    return struct.pack('<4sHHII', BANK_TABLES_MAGIC, BANK_TABLES_VERSION, len(ids),
+                       size, zlib.crc32(payload)) + payload
+
+
+def unpack_bank_tables(data: bytes) -> Dict[str, List[int]]:
+    """Parse packed tables, checking magic and CRC."""
+    magic, _, count, size, crc = struct.unpack_from('<4sHHII', data)
+    if magic != BANK_TABLES_MAGIC:
+        raise ValueError(f"Invalid bank table magic: {magic}")
+    if size > len(data) or zlib.crc32(data[BANK_TABLES_HEADER_SIZE:size]) != crc:
+        raise ValueError("Bank table CRC mismatch")
+    tables = {}
+    for i in range(count):
+        table_id, offset, entries, _ = struct.unpack_from(
+            '<4sIII', data, BANK_TABLES_HEADER_SIZE + i * BANK_TABLE_DIR_SIZE)
+        tables[table_id.decode()] = list(struct.unpack_from(f'<{entries}I', data, offset))
+    return tables
+
+
+def read_bank_tables(f, header: NGFCHeader) -> Dict[str, List[int]]:
+    """Read and parse the bank tables of an open NGFC file."""
+    f.seek(header.tables_offset)
+    return unpack_bank_tables(f.read(header.tables_size))
+
+
+def validate_bank_tables(tables: Dict[str, List[int]], header: NGFCHeader) -> List[str]:
+    """
+    Check that the tables translate every address the game can generate
+    into its section: all P-ROM bank selects, all Z80 bank numbers on each
+    window, every sprite tile up to the tile mask and every YM2610 page.
+    
+    Returns a list of problems (empty if the tables are complete).
+    """
+    sizes = {name: size for name, _, size in header.sections()}
+    expected = {'MASK': BANK_MASK_ENTRIES, 'PBNK': P_BANK_COUNT * 2,
+                'MBNK': M_BANK_COUNT * len(M_WINDOW_SHIFTS), 'VBNK': V_PAGE_COUNT * 2}
+    problems = [f"{table_id}: {len(tables.get(table_id, []))} entries, expected {count}"
+                for table_id, count in expected.items() if len(tables.get(table_id, [])) != count]
+    if problems or 'CPAR' not in tables:
+        return problems + ([] if 'CPAR' in tables else ["CPAR: table missing"])
+    
+    masks = tables['MASK']
+    for i, name in enumerate(SECTION_ORDER):
+        if masks[i] != _mirror_mask(sizes[name]):
+            problems.append(f"MASK: {name.upper()}-ROM mask 0x{masks[i]:X} does not match size")
+    
+    # Every window must lie inside its section
+    p_fixed = min(masks[0] + 1, P_BANK_SIZE) if sizes['p'] else 0
+    if p_fixed > sizes['p']:
+        problems.append(f"P-ROM fixed window 0x{sizes['p']:X}-0x{p_fixed - 1:X} unbacked")
+    pbnk = tables['PBNK']
+    for select in range(P_BANK_COUNT):
+        base, mask = pbnk[select * 2], pbnk[select * 2 + 1]
+        if sizes['p'] and base + mask + 1 > sizes['p']:
+            problems.append(f"PBNK: bank {select} (0x{base:X} + 0x{mask + 1:X}) past end of P-ROM")
+    
+    mbnk = tables['MBNK']
+    for window, shift in enumerate(M_WINDOW_SHIFTS):
+        span = min(1 << shift, masks[2] + 1)
+        for bank in range(M_BANK_COUNT):
+            base = mbnk[window * M_BANK_COUNT + bank]
+            if sizes['m'] and base + span > sizes['m']:
+                problems.append(f"MBNK: {1 << shift >> 10} KB window bank {bank} past end of M-ROM")
+                break
+    
+    cpar = tables['CPAR']
+    tile = offset = 0
+    for i in range(0, len(cpar), 4):
+        first, count, pair_offset, chip_size = cpar[i:i + 4]
+        if first != tile or pair_offset != offset or count != chip_size * 2 // SPRITE_TILE_SIZE:
+            problems.append(f"CPAR: pair {i // 4} does not follow the previous pair")
+        tile += count
+        offset += chip_size * 2
+    if cpar[3::4] != header.c_pair_sizes():
+        problems.append("CPAR: chip sizes do not match the header's C-ROM pairs")
+    if offset != sizes['c']:
+        problems.append(f"CPAR: pairs cover 0x{offset:X} of 0x{sizes['c']:X} C-ROM bytes")
+    if masks[5] + 1 < tile:
+        problems.append(f"MASK: tile mask 0x{masks[5]:X} hides tiles up to {tile - 1}")
+    
+    # Each mapped page must start in its own channel's samples
+    vbnk = tables['VBNK']
+    for channel, (region, size) in enumerate(adpcm_regions(sizes['v'], header.adpcma_size)):
+        for page in range(V_PAGE_COUNT):
+            base = vbnk[channel * V_PAGE_COUNT + page]
+            if base != BANK_UNMAPPED and not region <= base < region + size:
+                problems.append(f"VBNK: ADPCM-{'AB'[channel]} page {page} (0x{base:X}) "
+                                f"outside 0x{region:X}-0x{region + size:X}")
+    
+    return problems
+
+
+def link_section_size(size: int) -> int:
+    """File bytes of a section stored as link frames."""
+    if not size:
+        return 0
+    frames, last = divmod(size - 1, LINK_PAYLOAD_SIZE)
+    return frames * LINK_FRAME_SIZE + _align(LINK_FRAME_HEADER_SIZE + last + 1)
+
+
+def link_sequence_starts(header: NGFCHeader) -> Dict[str, int]:
+    """Sequence number of the first frame of each framed section (numbered per link)."""
+    starts = {}
+    next_sequence = {}
+    for name in SECTION_ORDER:
+        if name in LINK_TARGETS:
+            link = LINK_STREAMS[name]
+            starts[name] = next_sequence.get(link, 0)
+            size = getattr(header, f'{name}_size')
+            next_sequence[link] = starts[name] + (size + LINK_PAYLOAD_SIZE - 1) // LINK_PAYLOAD_SIZE
+    return starts
+
+
+def encode_link_frames(data: bytes, target: int, address: int, sequence: int, last: bool) -> bytes:
+    """
+    Encode section data starting at section offset address as link frames.
+    
+    Data is split into LINK_PAYLOAD_SIZE payloads; each frame is padded to
+    a sector boundary. With last, the final frame is flagged as the end of
+    the section.
+    """
+    out = bytearray()
+    for pos in range(0, len(data), LINK_PAYLOAD_SIZE):
+        payload = data[pos:pos + LINK_PAYLOAD_SIZE]
+        flags = target | (LINK_LAST_FRAME if last and pos + LINK_PAYLOAD_SIZE >= len(data) else 0)
+        head = struct.pack('<BBHII', LINK_FRAME_SYNC, flags, len(payload), sequence, address + pos)
+        out += head
+        out += struct.pack('<I', zlib.crc32(payload, zlib.crc32(head)))
+        out += payload
+        out += bytes(-len(out) % SECTOR_SIZE)
+        sequence += 1
+    return bytes(out)
+
+
+def invert_permutation(perm: List[int]) -> List[int]:
+    """Return the inverse of a block permutation table."""
+    inverse = [0] * len(perm)
+    for dst, src in enumerate(perm):
+        inverse[src] = dst
+    return inverse
+
+
+# C-ROM burst reorder: source byte for each position of a 32-byte block
+# (MiSTer: j = (i & ~0x1F) | ((i >> 2) & 7) | ((i & 1) << 3) | (((i & 2) << 3) ^ 0x10))
+CROM_BURST_ORDER = [((i >> 2) & 7) | ((i & 1) << 3) | (((i & 2) << 3) ^ 0x10) for i in range(32)]
+CROM_BURST_ORDER_INV = invert_permutation(CROM_BURST_ORDER)
+
+# S-ROM fix tile remap: source byte for each position of a 32-byte tile
+SROM_REMAP = [
+    0x10, 0x18, 0x00, 0x08, 0x11, 0x19, 0x01, 0x09,
+    0x12, 0x1A, 0x02, 0x0A, 0x13, 0x1B, 0x03, 0x0B,
+    0x14, 0x1C, 0x04, 0x0C, 0x15, 0x1D, 0x05, 0x0D,
+    0x16, 0x1E, 0x06, 0x0E, 0x17, 0x1F, 0x07, 0x0F
+]
+SROM_REMAP_INV = invert_permutation(SROM_REMAP)
+
+
+def _crom_pair_order() -> List[Tuple[int, int]]:
+    """
+    Compose interleave, byte swap and burst reorder into one table.
+
+    Each 32-byte block of transformed C-ROM takes 16 bytes from C1 and 16
+    from C2. Entry i gives (chip, offset) of the source of output byte i,
+    where chip 0 is C1 and 1 is C2, and offset is within the 16-byte chunk.
+    """
+    order = []
+    for i in range(32):
+        swapped = CROM_BURST_ORDER[i]
+        # byte_swap_crom exchanges bytes 1 and 2 of each word
+        inter = swapped ^ 3 if swapped & 3 in (1, 2) else swapped
+        # interleave_crom_pair emits C2 C2 C1 C1 per word
+        word, pos = inter >> 2, inter & 3
+        order.append((0 if pos >= 2 else 1, word * 2 + (pos & 1)))
+    return order
+
+
+CROM_PAIR_ORDER = _crom_pair_order()
+
+
+def permute_blocks(data: bytes, perm: List[int]) -> bytearray:
+    """
+    Apply out[i] = data[block + perm[i % n]] to every n-byte block.
+
+    Whole blocks are moved with one strided slice per table entry, so the
+    work is done in C rather than per byte. A trailing partial block keeps
+    the zero-fill behaviour of the reference loops.
+    """
+    n = len(perm)
+    size = len(data)
+    full = size - size % n
+    out = bytearray(size)
+    
+    if full:
+        view = memoryview(data)[:full]
+        for dst, src in enumerate(perm):
+            out[dst:full:n] = view[src::n]
+    
+    for i in range(full, size):
+        src = full + perm[i - full]
+        if src < size:
+            out[i] = data[src]
+    
+    return out
 
 
 def transform_crom_burst_order(data: bytearray) -> bytearray:
@@ -109,16 +707,12 @@ def transform_crom_burst_order(data: bytearray) -> bytearray:
     The transformation reorders data within each 32-byte block so that
     a 4-word SDRAM burst returns pixels in the order the NEO-ZMC2 expects.
     """
-    size = len(data)
-    out = bytearray(size)
-    
-    for i in range(size):
-        # Calculate source index using MiSTer's bit manipulation
-        j = (i & ~0x1F) | ((i >> 2) & 7) | ((i & 1) << 3) | (((i & 2) << 3) ^ 0x10)
-        if j < size:
-            out[i] = data[j]
-    
-    return out
+    return permute_blocks(data, CROM_BURST_ORDER)
+
+
+def restore_crom_burst_order(data: bytes) -> bytearray:
+    """Inverse of transform_crom_burst_order."""
+    return permute_blocks(data, CROM_BURST_ORDER_INV)
 
 
 def byte_swap_crom(data: bytearray) -> bytearray:
@@ -130,22 +724,15 @@ def byte_swap_crom(data: bytearray) -> bytearray:
     
     Input:  [B3][B2][B1][B0]
     Output: [B3][B1][B2][B0]
-    """
-    size = len(data)
-    out = bytearray(size)
     
-    # Process 4 bytes at a time
-    for i in range(0, size - 3, 4):
-        out[i + 0] = data[i + 0]  # B0 stays
-        out[i + 1] = data[i + 2]  # B2 -> B1 position
-        out[i + 2] = data[i + 1]  # B1 -> B2 position
-        out[i + 3] = data[i + 3]  # B3 stays
+    The swap is its own inverse.
+    """
+    out = bytearray(data)
     
-    # Handle remaining bytes (shouldn't happen with aligned ROM data)
-    remainder = size % 4
-    if remainder:
-        for i in range(size - remainder, size):
-            out[i] = data[i]
+    # Remaining bytes (shouldn't happen with aligned ROM data) are copied as-is
+    full = len(data) - len(data) % 4
+    out[1:full:4] = data[2:full:4]  # B2 -> B1 position
+    out[2:full:4] = data[1:full:4]  # B1 -> B2 position
     
     return out
 
@@ -161,26 +748,78 @@ def interleave_crom_pair(c1_data: bytes, c2_data: bytes) -> bytearray:
     MiSTer interleaves them as: C2 C2 C1 C1 C2 C2 C1 C1...
     This allows reading all 4 bitplanes in a single SDRAM burst.
     """
-    if len(c1_data) != len(c2_data):
-        # Pad shorter one to match
-        max_len = max(len(c1_data), len(c2_data))
-        c1_data = c1_data + bytes(max_len - len(c1_data))
-        c2_data = c2_data + bytes(max_len - len(c2_data))
+    # Pad to a common, even length
+    size = max(len(c1_data), len(c2_data))
+    size += size & 1
+    c1_data = bytes(c1_data) + bytes(size - len(c1_data))
+    c2_data = bytes(c2_data) + bytes(size - len(c2_data))
     
-    size = len(c1_data)
     out = bytearray(size * 2)
     
     # Interleave: C2 C2 C1 C1 pattern (2 bytes each)
-    for i in range(0, size, 2):
-        out_idx = i * 2
-        out[out_idx + 0] = c2_data[i + 0]
-        out[out_idx + 1] = c2_data[i + 1]
-        out[out_idx + 2] = c1_data[i + 0]
-        out[out_idx + 3] = c1_data[i + 1]
+    out[0::4] = c2_data[0::2]
+    out[1::4] = c2_data[1::2]
+    out[2::4] = c1_data[0::2]
+    out[3::4] = c1_data[1::2]
     
     return out
 
 
+def deinterleave_crom_pair(data: bytes) -> Tuple[bytearray, bytearray]:
+    """Inverse of interleave_crom_pair: split C2 C2 C1 C1 words into (C1, C2)."""
+    size = len(data) // 2
+    c1 = bytearray(size)
+    c2 = bytearray(size)
+    
+    c2[0::2] = data[0::4]
+    c2[1::2] = data[1::4]
+    c1[0::2] = data[2::4]
+    c1[1::2] = data[3::4]
+    
+    return c1, c2
+
+
+def transform_crom_pair(c1_data: bytes, c2_data: bytes) -> bytearray:
+    """
+    Interleave, byte swap and burst reorder one C1/C2 pair in a single pass.
+    
+    Equivalent to transform_crom_burst_order(byte_swap_crom(interleave_crom_pair(c1, c2)))
+    but uses the precomputed CROM_PAIR_ORDER table, so no intermediate
+    buffers are built.
+    """
+    size = max(len(c1_data), len(c2_data))
+    if size % 16:
+        return transform_crom_burst_order(byte_swap_crom(interleave_crom_pair(c1_data, c2_data)))
+    
+    chips = (bytes(c1_data) + bytes(size - len(c1_data)),
+             bytes(c2_data) + bytes(size - len(c2_data)))
+    out = bytearray(size * 2)
+    
+    for dst, (chip, src) in enumerate(CROM_PAIR_ORDER):
+        out[dst::32] = chips[chip][src::16]
+    
+    return out
+
+
+def split_crom_pair(data: bytes) -> Tuple[bytearray, bytearray]:
+    """
+    Inverse of transform_crom_pair: recover (C1, C2) from transformed C-ROM.
+    
+    Works on any 32-byte aligned slice of a pair, so a C-ROM section can be
+    split in chunks.
+    """
+    if len(data) % 32:
+        raise ValueError(f"C-ROM data must be a multiple of 32 bytes, got {len(data)}")
+    
+    size = len(data) // 2
+    chips = (bytearray(size), bytearray(size))
+    
+    for dst, (chip, src) in enumerate(CROM_PAIR_ORDER):
+        chips[chip][src::16] = data[dst::32]
+    
+    return chips
+
+
 def transform_srom(data: bytearray) -> bytearray:
     """
     Transform S-ROM (fix layer) data for SDRAM burst access.
@@ -196,26 +835,12 @@ def transform_srom(data: bytearray) -> bytearray:
       Original: 10 18 00 08 11 19 01 09 12 1A 02 0A 13 1B 03 0B 14 1C 04 0C 15 1D 05 0D 16 1E 06 0E 17 1F 07 0F
       SDRAM:    Pairs grouped for 16-bit word access
     """
-    # Remap table for fix layer transformation
-    SROM_REMAP = [
-        0x10, 0x18, 0x00, 0x08, 0x11, 0x19, 0x01, 0x09,
-        0x12, 0x1A, 0x02, 0x0A, 0x13, 0x1B, 0x03, 0x0B,
-        0x14, 0x1C, 0x04, 0x0C, 0x15, 0x1D, 0x05, 0x0D,
-        0x16, 0x1E, 0x06, 0x0E, 0x17, 0x1F, 0x07, 0x0F
-    ]
-    
-    size = len(data)
-    out = bytearray(size)
-    
-    # Process each 32-byte tile
-    for tile_start in range(0, size, 32):
-        for i in range(32):
-            src_idx = tile_start + SROM_REMAP[i]
-            dst_idx = tile_start + i
-            if src_idx < size and dst_idx < size:
-                out[dst_idx] = data[src_idx]
-    
-    return out
+    return permute_blocks(data, SROM_REMAP)
+
+
+def restore_srom(data: bytes) -> bytearray:
+    """Inverse of transform_srom."""
+    return permute_blocks(data, SROM_REMAP_INV)
 
 
 def transform_full_crom(crom_pairs: List[Tuple[bytes, bytes]]) -> bytearray:
@@ -230,140 +855,470 @@ def transform_full_crom(crom_pairs: List[Tuple[bytes, bytes]]) -> bytearray:
     
     for idx, (c1, c2) in enumerate(crom_pairs):
         print(f"  Processing C-ROM pair {idx + 1}/{len(crom_pairs)} ({len(c1) + len(c2)} bytes)...")
-        
-        # Step 1: Interleave
-        interleaved = interleave_crom_pair(c1, c2)
-        
-        # Step 2: Byte swap
-        swapped = byte_swap_crom(interleaved)
-        
-        # Step 3: Burst reorder
-        reordered = transform_crom_burst_order(swapped)
-        
-        result.extend(reordered)
+        result.extend(transform_crom_pair(c1, c2))
     
     return result
 
 
-def load_mame_romset(path: Path) -> dict:
+class RomEntry(NamedTuple):
+    """One ROM file of a game database entry."""
+    role: str      # 'p', 's', 'm', 'v' or 'c'
+    index: int     # Load order within the role (C-ROM: chip number, 1-based)
+    size: int
+    crc32: int
+    name: str
+
+
+class GameEntry:
+    """A Neo Geo ROM set as described by the game database."""
+
+    def __init__(self, name: str, ngh_number: int = 0, flags: int = 0):
+        self.name = name
+        self.ngh_number = ngh_number
+        self.flags = flags
+        self.roms = []  # type: List[RomEntry]
+
+
+class GameDB:
     """
-    Load a MAME-format ROM set from a directory or zip file.
-    
-    Returns dict with keys: 'p', 's', 'm', 'v', 'c_pairs'
+    Bundled Neo Geo game database (ngfc_gamedb.tsv).
+
+    One tab-separated line per ROM file:
+      set  ngh  flags  role  index  size  crc32  name
+
+    The file is only parsed on the first lookup, and is indexed by
+    (CRC32, size) so that a set can be identified from the CRC32s stored
+    in a zip central directory, without decompressing anything.
+    """
+
+    def __init__(self, path: Path = GAMEDB_PATH):
+        self.path = path
+        self._games = None  # type: Optional[Dict[str, GameEntry]]
+        self._index = None  # type: Optional[Dict[Tuple[int, int], List[str]]]
+
+    def _load(self):
+        if self._games is not None:
+            return
+
+        games = {}
+        index = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line_no, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line or line.startswith('#'):
+                        continue
+                    fields = line.split('\t')
+                    if len(fields) != 8:
+                        raise ValueError(f"{self.path}:{line_no}: expected 8 fields, got {len(fields)}")
+                    set_name, ngh, flags, role, idx, size, crc, rom_name = fields
+                    if role not in ROM_ROLES:
+                        raise ValueError(f"{self.path}:{line_no}: unknown role '{role}'")
+
+                    game = games.get(set_name)
+                    if game is None:
+                        game = games[set_name] = GameEntry(set_name, int(ngh), int(flags, 0))
+                    rom = RomEntry(role, int(idx), int(size, 0), int(crc, 16), rom_name)
+                    game.roms.append(rom)
+                    index.setdefault((rom.crc32, rom.size), []).append(set_name)
+
+        self._games = games
+        self._index = index
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._games)
+
+    def __iter__(self):
+        self._load()
+        return iter(self._games.values())
+
+    def get(self, name: str) -> Optional[GameEntry]:
+        self._load()
+        return self._games.get(name)
+
+    def identify(self, members: Dict[str, Tuple[int, int]],
+                 hint: str = '') -> Optional[Tuple[GameEntry, Dict[RomEntry, str]]]:
+        """
+        Identify a ROM set from its files.
+
+        members maps file name -> (crc32, size). Returns the game whose ROMs
+        are all present, together with a RomEntry -> file name mapping, or
+        None. When several games match (merged sets), the one named like
+        the zip (hint) wins, then the one with the most ROMs.
+        """
+        self._load()
+
+        by_key = {}
+        for name in sorted(members):
+            by_key.setdefault(members[name], name)
+
+        candidates = set()
+        for key in by_key:
+            candidates.update(self._index.get(key, ()))
+
+        best = None
+        best_score = None
+        for set_name in candidates:
+            game = self._games[set_name]
+            if not all((rom.crc32, rom.size) in by_key for rom in game.roms):
+                continue
+            score = (set_name == hint, len(game.roms))
+            if best_score is None or score > best_score:
+                best, best_score = game, score
+
+        if best is None:
+            return None
+        return best, {rom: by_key[(rom.crc32, rom.size)] for rom in best.roms}
+
+
+_gamedb = None
+
+
+def get_gamedb() -> GameDB:
+    """Return the bundled game database (loaded lazily on first lookup)."""
+    global _gamedb
+    if _gamedb is None:
+        _gamedb = GameDB()
+    return _gamedb
+
+
+def load_ngh_map(path: Path = NGH_MAP_PATH) -> Dict[str, Tuple[int, int]]:
+    """
+    Load an NGH map (ngfc_ngh.tsv): set name -> (NGH number, region flags).
+
+    One tab-separated line per MVS release: set  ngh  flags
+    """
+    ngh_map = {}
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                fields = line.split('\t')
+                if len(fields) != 3:
+                    raise ValueError(f"{path}:{line_no}: expected 3 fields, got {len(fields)}")
+                ngh_map[fields[0]] = (int(fields[1]), int(fields[2], 0))
+    return ngh_map
+
+
+_ngh_map = None
+
+
+def get_ngh_map() -> Dict[str, Tuple[int, int]]:
+    """Return the bundled NGH map (loaded on first use)."""
+    global _ngh_map
+    if _ngh_map is None:
+        _ngh_map = load_ngh_map()
+    return _ngh_map
+
+
+def prom_ngh_number(p: bytes) -> int:
+    """
+    NGH number from the cartridge header in a P-ROM, or 0 if there is no
+    readable header (encrypted P-ROMs). Byte-swapped dumps are accepted.
     """
+    for offset in PROM_HEADER_OFFSETS:
+        header = bytes(p[offset:offset + PROM_NGH_OFFSET + 2])
+        if len(header) < PROM_NGH_OFFSET + 2:
+            break
+        if not header.startswith(PROM_HEADER_MAGIC):
+            header = bytes(b for pair in zip(header[1::2], header[0::2]) for b in pair)
+            if not header.startswith(PROM_HEADER_MAGIC):
+                continue
+        digits = header[PROM_NGH_OFFSET:PROM_NGH_OFFSET + 2].hex()
+        return int(digits) if digits.isdigit() else 0
+    return 0
+
+
+def identify_ngh(p: bytes, set_name: str = '') -> Tuple[int, int]:
+    """
+    NGH number and region flags of a set without them in the game database.
+
+    The NGH number comes from the P-ROM cartridge header, or from the NGH
+    map by set name when the header is unreadable; region flags from the
+    NGH map entry with that number. Returns (0, 0) when unknown.
+    """
+    ngh_map = get_ngh_map()
+    ngh_number = prom_ngh_number(p) or ngh_map.get(set_name, (0, 0))[0]
+    if ngh_number:
+        for entry_ngh, flags in ngh_map.values():
+            if entry_ngh == ngh_number:
+                return ngh_number, flags
+    return ngh_number, 0
+
+
+def resolve_ngh(roms: dict, input_path: Path) -> Tuple[int, int]:
+    """
+    NGH number and region flags for a loaded set (see load_romset): from
+    the game database, else from the P-ROM header and NGH map (see
+    identify_ngh), using the set's file or directory name.
+    """
+    game = roms.get('game')
+    if game and game.ngh_number:
+        return game.ngh_number, game.flags
+    set_name = game.name if game else (input_path.stem if input_path.is_file() else input_path.name)
+    return identify_ngh(roms['p'], set_name)
+
+
+def plan_from_names(names: List[str]) -> dict:
+    """
+    Assign files to ROM roles by MAME naming conventions (fallback when
+    the set is not in the game database).
+
+    Returns dict with keys: 'p', 's', 'm', 'v' (lists of file names in load
+    order), 'c_pairs' (list of (odd, even) file name tuples) and 'adpcmb'
+    (the V-ROM files of a separate ADPCM-B region, last in 'v').
+    """
+    plan = {'p': [], 's': [], 'm': [], 'v': [], 'c_pairs': [], 'adpcmb': []}
+
+    for role in ('p', 's', 'm', 'v'):
+        plan[role] = sorted([n for n in names if re.match(rf'.*[_-]{role}\d*\.', n.lower())])
+
+    # Group C-ROMs into pairs (c1+c2, c3+c4, etc.)
+    c_files = sorted([n for n in names if re.match(r'.*[_-]c\d*\.', n.lower())])
+    c_odd = [f for f in c_files if re.search(r'[_-]c[13579]\.', f.lower())]
+    c_even = [f for f in c_files if re.search(r'[_-]c[2468]\.', f.lower())]
+    plan['c_pairs'] = list(zip(c_odd, c_even))
+
+    return plan
+
+
+def plan_from_game(mapping: Dict[RomEntry, str]) -> dict:
+    """Build a load plan (see plan_from_names) from a game database match."""
+    plan = {'p': [], 's': [], 'm': [], 'v': [], 'c_pairs': [], 'adpcmb': []}
+
+    roms = sorted(mapping, key=lambda rom: (rom.role, rom.index))
+    for rom in roms:
+        if rom.role != 'c':
+            plan[rom.role].append(mapping[rom])
+        if rom.role == 'v' and rom.index >= ADPCMB_INDEX:
+            plan['adpcmb'].append(mapping[rom])
+
+    # C-ROM chips are numbered from 1; odd chips hold bitplanes 0/1
+    c_roms = [mapping[rom] for rom in roms if rom.role == 'c']
+    plan['c_pairs'] = list(zip(c_roms[0::2], c_roms[1::2]))
+
+    return plan
+
+
+def dir_members(path: Path) -> Dict[str, Tuple[int, int]]:
+    """CRC32 and size of every file in a ROM set directory."""
+    members = {}
+    for f in path.iterdir():
+        if not f.is_file():
+            continue
+        crc = 0
+        with open(f, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b''):
+                crc = zlib.crc32(chunk, crc)
+        members[f.name] = (crc, f.stat().st_size)
+    return members
+
+
+def zip_members(zf: zipfile.ZipFile) -> Dict[str, Tuple[int, int]]:
+    """CRC32 and size of every file in a zip, from the central directory."""
+    return {info.filename: (info.CRC, info.file_size)
+            for info in zf.infolist() if not info.is_dir()}
+
+
+def identify_romset(path: Path, db: Optional[GameDB] = None) -> Optional[Tuple[GameEntry, dict]]:
+    """
+    Identify a ROM set directory or zip against the game database.
+
+    Returns (game, plan) or None if the set is unknown.
+    """
+    db = db or get_gamedb()
+    if path.suffix.lower() == '.zip':
+        with zipfile.ZipFile(path, 'r') as zf:
+            members = zip_members(zf)
+    else:
+        members = dir_members(path)
+
+    match = db.identify(members, hint=path.stem)
+    if match is None:
+        return None
+    game, mapping = match
+    return game, plan_from_game(mapping)
+
+
+def load_romset_plan(plan: dict, read_file) -> dict:
+    """Load the ROM data described by a plan, using read_file(name) -> bytes."""
     roms = {
         'p': bytearray(),
         's': bytearray(),
         'm': bytearray(),
         'v': bytearray(),
-        'c_pairs': []
+        'c_pairs': [],
+        'adpcma_size': 0,  # V-ROM bytes before a separate ADPCM-B region (0: shared)
     }
-    
+
+    for role, label in (('p', 'P'), ('s', 'S'), ('m', 'M'), ('v', 'V')):
+        for name in plan[role]:
+            if name in plan.get('adpcmb', ()) and not roms['adpcma_size']:
+                roms['adpcma_size'] = len(roms['v'])
+            print(f"  Loading {label}-ROM: {name}")
+            roms[role].extend(read_file(name))
+
+    for c1_name, c2_name in plan['c_pairs']:
+        print(f"  Loading C-ROM pair: {c1_name} + {c2_name}")
+        roms['c_pairs'].append((read_file(c1_name), read_file(c2_name)))
+
+    return roms
+
+
+def load_mame_romset(path: Path, db: Optional[GameDB] = None) -> dict:
+    """
+    Load a MAME-format ROM set from a directory or zip file.
+
+    The set is first identified against the game database, which gives
+    file roles, load order and C-ROM pairing; unknown sets fall back to
+    MAME naming conventions.
+
+    Returns dict with keys: 'p', 's', 'm', 'v', 'c_pairs', 'game'
+    """
     # Determine if it's a zip or directory
     if path.suffix.lower() == '.zip':
-        return load_mame_zip(path)
-    
+        return load_mame_zip(path, db)
+
     if not path.is_dir():
         raise ValueError(f"Path must be a directory or zip file: {path}")
-    
-    files = list(path.iterdir())
-    
-    # Find and load P-ROM (program)
-    p_files = sorted([f for f in files if re.match(r'.*-p\d*\.', f.name.lower())])
-    for f in p_files:
-        print(f"  Loading P-ROM: {f.name}")
-        roms['p'].extend(f.read_bytes())
-    
-    # Find and load S-ROM (fix layer)
-    s_files = sorted([f for f in files if re.match(r'.*-s\d*\.', f.name.lower())])
-    for f in s_files:
-        print(f"  Loading S-ROM: {f.name}")
-        roms['s'].extend(f.read_bytes())
-    
-    # Find and load M-ROM (Z80 program)
-    m_files = sorted([f for f in files if re.match(r'.*-m\d*\.', f.name.lower())])
-    for f in m_files:
-        print(f"  Loading M-ROM: {f.name}")
-        roms['m'].extend(f.read_bytes())
-    
-    # Find and load V-ROM (ADPCM samples)
-    v_files = sorted([f for f in files if re.match(r'.*-v\d*\.', f.name.lower())])
-    for f in v_files:
-        print(f"  Loading V-ROM: {f.name}")
-        roms['v'].extend(f.read_bytes())
-    
-    # Find and load C-ROM pairs
-    c_files = sorted([f for f in files if re.match(r'.*-c\d*\.', f.name.lower())])
-    
-    # Group into pairs (c1+c2, c3+c4, etc.)
-    c_odd = [f for f in c_files if re.match(r'.*-c[13579]\.', f.name.lower())]
-    c_even = [f for f in c_files if re.match(r'.*-c[2468]\.', f.name.lower())]
-    
-    for c1_file, c2_file in zip(sorted(c_odd), sorted(c_even)):
-        print(f"  Loading C-ROM pair: {c1_file.name} + {c2_file.name}")
-        c1_data = c1_file.read_bytes()
-        c2_data = c2_file.read_bytes()
-        roms['c_pairs'].append((c1_data, c2_data))
-    
+
+    db = db or get_gamedb()
+    match = db.identify(dir_members(path), hint=path.name)
+    if match:
+        game, plan = match[0], plan_from_game(match[1])
+        print(f"  Identified: {game.name} (NGH {game.ngh_number})")
+    else:
+        game, plan = None, plan_from_names([f.name for f in path.iterdir() if f.is_file()])
+
+    roms = load_romset_plan(plan, lambda name: (path / name).read_bytes())
+    roms['game'] = game
     return roms
 
 
-def load_mame_zip(path: Path) -> dict:
+def load_mame_zip(path: Path, db: Optional[GameDB] = None) -> dict:
     """Load ROM set from a zip file."""
-    roms = {
-        'p': bytearray(),
-        's': bytearray(),
-        'm': bytearray(),
-        'v': bytearray(),
-        'c_pairs': []
-    }
-    
+    db = db or get_gamedb()
+
     with zipfile.ZipFile(path, 'r') as zf:
-        names = zf.namelist()
-        
-        # P-ROM
-        p_files = sorted([n for n in names if re.match(r'.*-p\d*\.', n.lower()) or 
-                                               re.match(r'.*_p\d*\.', n.lower())])
-        for f in p_files:
-            print(f"  Loading P-ROM: {f}")
-            roms['p'].extend(zf.read(f))
-        
-        # S-ROM
-        s_files = sorted([n for n in names if re.match(r'.*-s\d*\.', n.lower()) or
-                                               re.match(r'.*_s\d*\.', n.lower())])
-        for f in s_files:
-            print(f"  Loading S-ROM: {f}")
-            roms['s'].extend(zf.read(f))
-        
-        # M-ROM
-        m_files = sorted([n for n in names if re.match(r'.*-m\d*\.', n.lower()) or
-                                               re.match(r'.*_m\d*\.', n.lower())])
-        for f in m_files:
-            print(f"  Loading M-ROM: {f}")
-            roms['m'].extend(zf.read(f))
-        
-        # V-ROM
-        v_files = sorted([n for n in names if re.match(r'.*-v\d*\.', n.lower()) or
-                                               re.match(r'.*_v\d*\.', n.lower())])
-        for f in v_files:
-            print(f"  Loading V-ROM: {f}")
-            roms['v'].extend(zf.read(f))
-        
-        # C-ROM pairs
-        c_files = sorted([n for n in names if re.match(r'.*-c\d*\.', n.lower()) or
-                                               re.match(r'.*_c\d*\.', n.lower())])
-        c_odd = [f for f in c_files if re.search(r'[_-]c[13579]\.', f.lower())]
-        c_even = [f for f in c_files if re.search(r'[_-]c[2468]\.', f.lower())]
-        
-        for c1_name, c2_name in zip(sorted(c_odd), sorted(c_even)):
-            print(f"  Loading C-ROM pair: {c1_name} + {c2_name}")
-            c1_data = zf.read(c1_name)
-            c2_data = zf.read(c2_name)
-            roms['c_pairs'].append((c1_data, c2_data))
-    
+        match = db.identify(zip_members(zf), hint=path.stem)
+        if match:
+            game, plan = match[0], plan_from_game(match[1])
+            print(f"  Identified: {game.name} (NGH {game.ngh_number})")
+        else:
+            game, plan = None, plan_from_names(zf.namelist())
+
+        roms = load_romset_plan(plan, zf.read)
+
+    roms['game'] = game
     return roms
 
 
+def build_gamedb(listxml: Path, output: Path, ngh_map_path: Path = NGH_MAP_PATH) -> int:
+    """
+    Build a game database from MAME -listxml output.
+
+    File roles come from the MAME ROM regions and load order from the ROM
+    offsets (C-ROM chips loaded at odd offsets are the even chip of a pair).
+    Early sets keep ADPCM-B samples in their own region: those V-ROMs are
+    numbered from ADPCMB_INDEX so the split survives in the database.
+    MAME does not record NGH numbers or regions: those come from the NGH
+    map (see load_ngh_map), where clones inherit their parent's entry.
+    Games in neither are written with NGH 0.
+
+    Returns the number of games written.
+    """
+    import xml.etree.ElementTree as ET
+
+    ngh_map = load_ngh_map(ngh_map_path)
+
+    region_roles = {
+        'maincpu': 'p',
+        'fixed': 's',
+        'audiocpu': 'm',
+        'ymsnd': 'v',
+        'adpcma': 'v',
+        'adpcmb': 'v',
+        'ymsnd.deltat': 'v',
+        'sprites': 'c',
+    }
+
+    lines = []
+    games = 0
+    for _, elem in ET.iterparse(str(listxml)):
+        if elem.tag not in ('machine', 'game'):
+            continue
+
+        neogeo = 'neogeo' in elem.get('sourcefile', '')
+        by_role = {role: [] for role in ROM_ROLES}
+        for rom in elem.findall('rom'):
+            region = rom.get('region', '')
+            if not (neogeo or region.startswith('cslot')):
+                continue
+            role = region_roles.get(region.split(':')[-1])
+            if role is None or rom.get('crc') is None or rom.get('status') == 'nodump':
+                continue
+            # ADPCM-A samples load before ADPCM-B
+            order = (region.endswith(('adpcmb', 'deltat')), int(rom.get('offset', '0'), 16))
+            by_role[role].append((order, rom))
+
+        if by_role['p'] and by_role['c']:
+            games += 1
+            ngh_number, flags = ngh_map.get(elem.get('name'), ngh_map.get(elem.get('cloneof'), (0, 0)))
+            for role in ROM_ROLES:
+                first = 1 if role == 'c' else 0
+                entries = sorted(by_role[role], key=lambda r: r[0])
+                adpcma_count = sum(1 for (adpcmb, _), _ in entries if not adpcmb)
+                for idx, ((adpcmb, _), rom) in enumerate(entries, first):
+                    if adpcmb:
+                        idx += ADPCMB_INDEX - adpcma_count
+                    lines.append('\t'.join([
+                        elem.get('name'), str(ngh_number), f"0x{flags:04X}", role, str(idx),
+                        f"0x{int(rom.get('size')):X}", rom.get('crc').lower(), rom.get('name'),
+                    ]))
+        elem.clear()
+
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(GAMEDB_FILE_HEADER)
+        for line in lines:
+            f.write(line + '\n')
+
+    return games
+
+
+def identify_library(paths: List[Path]):
+    """Identify every ROM set zip under the given files/directories."""
+    zips = []
+    for path in paths:
+        if path.is_dir():
+            zips.extend(sorted(path.rglob('*.zip')))
+        else:
+            zips.append(path)
+
+    db = get_gamedb()
+    start = time.perf_counter()
+    known = 0
+    for path in zips:
+        try:
+            result = identify_romset(path, db)
+        except zipfile.BadZipFile:
+            print(f"  {path.name}: not a valid zip")
+            continue
+        if result:
+            game, plan = result
+            known += 1
+            print(f"  {path.name}: {game.name} (NGH {game.ngh_number}, "
+                  f"{len(plan['c_pairs'])} C-ROM pairs)")
+        else:
+            print(f"  {path.name}: unknown")
+    elapsed = time.perf_counter() - start
+
+    print(f"\nIdentified {known}/{len(zips)} sets in {elapsed:.3f}s "
+          f"({len(db)} games in database)")
+
+
 def load_neo_file(path: Path) -> dict:
     """
     Load a .neo format ROM file (TerraOnion NeoSD format).
@@ -401,75 +1356,258 @@ def load_neo_file(path: Path) -> dict:
     return roms
 
 
-def convert_to_ngfc(input_path: Path, output_path: Path, ngh_number: int = 0, flags: int = 0):
+class NGFCWriter:
+    """
+    Lays out and writes an NGFC file from loaded ROMs.
+    
+    Transformed section data is produced on demand, one chunk at a time,
+    so memory use is the source ROMs plus one chunk. The header CRC is
+    computed in a first pass, which lets the header be written ahead of
+    the data: output can be streamed to a pipe or socket as it is produced.
+    """
+    
+    def __init__(self, roms: dict, ngh_number: int = 0, flags: int = 0, preview: bytes = b'',
+                 boot_order: bool = False, boot_c: int = BOOT_C_SIZE, boot_v: int = BOOT_V_SIZE,
+                 bank_tables: bool = False, link_frames: bool = False):
+        if link_frames and boot_order:
+            raise ValueError("Link frames need the standard layout, not boot-first")
+        self.preview = preview
+        self._data = {
+            'p': roms['p'],
+            's': transform_srom(roms['s']) if roms['s'] else bytearray(),
+            'm': roms['m'],
+            'v': roms['v'],
+        }
+        
+        # C-ROM pairs: (section offset, chip size, c1, c2)
+        self._pairs = []
+        c_size = 0
+        for c1, c2 in roms['c_pairs']:
+            chip_size = max(len(c1), len(c2))
+            self._pairs.append((c_size, chip_size, c1, c2))
+            c_size += chip_size * 2
+        
+        self.sizes = {name: len(data) for name, data in self._data.items()}
+        self.sizes['c'] = c_size
+        
+        header = NGFCHeader()
+        header.flags = flags | (FLAG_PREVIEW if preview else 0) | (FLAG_LINK_FRAMES if link_frames else 0)
+        header.ngh_number = ngh_number
+        header.p_size = self.sizes['p']
+        header.s_size = self.sizes['s']
+        header.m_size = self.sizes['m']
+        header.v_size = self.sizes['v']
+        header.c_size = c_size
+        header.c_size_original = sum(len(c1) + len(c2) for c1, c2 in roms['c_pairs'])
+        header.adpcma_size = roms.get('adpcma_size', 0)
+        if self._pairs:
+            header.c_pair_size = self._pairs[0][1]
+            pair_sizes = [chip_size for _, chip_size, _, _ in self._pairs]
+            if header.c_pair_sizes() != pair_sizes:
+                if len(pair_sizes) > PAIR_TABLE_MAX:
+                    raise ValueError(f"Too many C-ROM pairs: {len(pair_sizes)}")
+                header.pair_sizes = pair_sizes
+                header.flags |= FLAG_PAIR_TABLE
+        
+        self.tables = b''
+        if bank_tables:
+            self.tables = pack_bank_tables(build_bank_tables(self.sizes, header.c_pair_sizes(),
+                                                             header.adpcma_size))
+            header.tables_offset = _align(header.data_offset())
+            header.tables_size = len(self.tables)
+            header.flags |= FLAG_BANK_TABLES
+        
+        self.chunks = []  # type: List[Chunk]
+        if boot_order:
+            header.flags |= FLAG_BOOT_ORDER
+            header.chunk_map_offset = header.data_offset()
+            self.chunks, header.boot_prefix = plan_boot_layout(
+                self.sizes, header.chunk_map_offset, boot_c=boot_c, boot_v=boot_v)
+        self.header = header
+    
+    def read(self, name: str, start: int, length: int) -> bytes:
+        """Transformed bytes [start, start + length) of a section."""
+        if name != 'c':
+            return bytes(self._data[name][start:start + length])
+        
+        out = bytearray()
+        end = start + length
+        for base, chip_size, c1, c2 in self._pairs:
+            lo = max(start, base)
+            hi = min(end, base + chip_size * 2)
+            if lo >= hi:
+                continue
+            # Transform whole 32-byte blocks (16 bytes from each chip)
+            a0 = (lo - base) & ~31
+            a1 = min(chip_size * 2, (hi - base + 31) & ~31)
+            block = transform_crom_pair(c1[a0 // 2:a1 // 2], c2[a0 // 2:a1 // 2])
+            out += block[lo - base - a0:hi - base - a0]
+        return bytes(out)
+    
+    def iter_section(self, name: str, start: int = 0, length: Optional[int] = None,
+                     chunk_size: int = STREAM_CHUNK_SIZE):
+        """Yield transformed section data in chunks."""
+        if length is None:
+            length = self.sizes[name] - start
+        for offset in range(start, start + length, chunk_size):
+            yield self.read(name, offset, min(chunk_size, start + length - offset))
+    
+    def checksum(self, progress=None) -> int:
+        """
+        Header CRC field: sum of the first 4 bytes (LE) of each non-empty block's MD5.
+        
+        progress(0) is called after each chunk, as in write().
+        """
+        crc = 0
+        blocks = [[self.preview] if self.preview else []]
+        blocks += [self.iter_section(name) for name in SECTION_ORDER]
+        for block in blocks:
+            md5 = hashlib.md5()
+            size = 0
+            for data in block:
+                md5.update(data)
+                size += len(data)
+                if progress:
+                    progress(0)
+            if size:
+                crc = (crc + int.from_bytes(md5.digest()[:4], 'little')) & 0xFFFFFFFF
+        return crc
+    
+    def write(self, f, progress=None, chunk_size: int = STREAM_CHUNK_SIZE) -> int:
+        """
+        Write the file to f (any writable binary stream, no seeking needed).
+        
+        progress(bytes written) is called after each chunk, also during the
+        checksum pass that transforms all data before the first byte is
+        written; it may raise to abort the write. Returns the file size.
+        """
+        self.header.crc32 = self.checksum(progress)
+        written = 0
+        
+        def emit(data):
+            nonlocal written
+            f.write(data)
+            written += len(data)
+            if progress:
+                progress(written)
+        
+        emit(self.header.pack())
+        if self.header.pair_sizes:
+            emit(self.header.pack_pair_table())
+        if self.preview:
+            emit(bytes(PREVIEW_OFFSET - written))
+            emit(self.preview)
+        if self.tables:
+            emit(bytes(self.header.tables_offset - written))
+            emit(self.tables)
+        emit(bytes(self.header.data_offset() - written))
+        
+        if self.chunks:
+            boot_count = sum(1 for chunk in self.chunks if chunk.file_offset < self.header.boot_prefix)
+            emit(pack_chunk_map(self.chunks, boot_count))
+            for chunk in self.chunks:
+                emit(bytes(chunk.file_offset - written))
+                for data in self.iter_section(chunk.section, chunk.section_offset, chunk.size, chunk_size):
+                    emit(data)
+        elif self.header.flags & FLAG_LINK_FRAMES:
+            sequences = link_sequence_starts(self.header)
+            frame_chunk = max(1, chunk_size // LINK_PAYLOAD_SIZE) * LINK_PAYLOAD_SIZE
+            for name, offset, size in self.header.sections():
+                if name not in LINK_TARGETS:
+                    for data in self.iter_section(name, chunk_size=chunk_size):
+                        emit(data)
+                    continue
+                emit(bytes(offset - written))
+                sequence = sequences[name]
+                for start in range(0, size, frame_chunk):
+                    data = self.read(name, start, min(frame_chunk, size - start))
+                    emit(encode_link_frames(data, LINK_TARGETS[name], start, sequence,
+                                            start + len(data) == size))
+                    sequence += (len(data) + LINK_PAYLOAD_SIZE - 1) // LINK_PAYLOAD_SIZE
+        else:
+            for name in SECTION_ORDER:
+                for data in self.iter_section(name, chunk_size=chunk_size):
+                    emit(data)
+        
+        return written
+
+
+def load_romset(input_path: Path) -> dict:
+    """Load a ROM set (MAME directory/zip or .neo file)."""
+    if input_path.suffix.lower() == '.neo':
+        return load_neo_file(input_path)
+    return load_mame_romset(input_path)
+
+
+def convert_to_ngfc(input_path: Path, output_path: Path, ngh_number: int = 0, flags: int = 0,
+                    preview_title: Optional[str] = None, preview_image: Optional[Path] = None,
+                    preview_font_base: int = 0, boot_order: bool = False,
+                    boot_c: int = BOOT_C_SIZE, boot_v: int = BOOT_V_SIZE,
+                    bank_tables: bool = False, link_frames: bool = False):
     """
     Convert a Neo Geo ROM set to NGFC format.
+    
+    With preview_title (empty: use the game name) or preview_image, a menu
+    preview section is stored at PREVIEW_OFFSET. With boot_order, sections
+    are stored in boot-priority chunks (see plan_boot_layout). With
+    bank_tables, address translation tables (see build_bank_tables) are
+    stored before the data. With link_frames, S, M and C-ROM are stored as inter-Pico
+    link frames (see encode_link_frames).
     """
     print(f"Converting: {input_path}")
     print(f"Output: {output_path}")
     
     # Load source ROMs
-    if input_path.suffix.lower() == '.neo':
-        roms = load_neo_file(input_path)
-    else:
-        roms = load_mame_romset(input_path)
+    roms = load_romset(input_path)
     
+    # Fill in NGH number and region flags
+    game = roms.get('game')
+    game_ngh, game_flags = resolve_ngh(roms, input_path)
+    if not ngh_number:
+        ngh_number = game_ngh
+    flags |= game_flags
+
     # Verify we have data
     if not roms['p']:
         print("Warning: No P-ROM data found")
     if not roms['c_pairs']:
         print("Warning: No C-ROM data found")
     
-    print("\nTransforming ROMs for SDRAM access...")
-    
-    # Transform S-ROM
-    print("  Transforming S-ROM...")
-    s_transformed = transform_srom(roms['s']) if roms['s'] else bytearray()
-    
-    # Transform C-ROM (the big one)
-    print("  Transforming C-ROM (this may take a moment)...")
-    c_original_size = sum(len(c1) + len(c2) for c1, c2 in roms['c_pairs'])
-    c_transformed = transform_full_crom(roms['c_pairs']) if roms['c_pairs'] else bytearray()
-    
-    # Build header
-    header = NGFCHeader()
-    header.flags = flags
-    header.ngh_number = ngh_number
-    header.p_size = len(roms['p'])
-    header.s_size = len(s_transformed)
-    header.m_size = len(roms['m'])
-    header.v_size = len(roms['v'])
-    header.c_size = len(c_transformed)
-    header.c_size_original = c_original_size
-    
-    # Calculate CRC32 of all data
-    crc = 0
-    for data in [roms['p'], s_transformed, roms['m'], roms['v'], c_transformed]:
-        if data:
-            crc = (crc + (int.from_bytes(hashlib.md5(bytes(data)).digest()[:4], 'little'))) & 0xFFFFFFFF
-    header.crc32 = crc
-    
-    # Write output file
-    print(f"\nWriting output file...")
+    # Build menu preview
+    preview = b''
+    if preview_title is not None or preview_image is not None:
+        from ngfc_preview import build_preview
+        title = preview_title or (game.name if game else output_path.stem)
+        print(f"  Building menu preview ({'image' if preview_image else 'title'}: {title})...")
+        preview = build_preview(title, roms['s'], preview_image, preview_font_base)
+    
+    writer = NGFCWriter(roms, ngh_number, flags, preview, boot_order, boot_c, boot_v,
+                        bank_tables, link_frames)
+    header = writer.header
+    if writer.tables:
+        for problem in validate_bank_tables(unpack_bank_tables(writer.tables), header):
+            print(f"Warning: {problem}")
+    
+    # S-ROM and C-ROM are transformed for SDRAM access while writing
+    print(f"\nTransforming ROMs and writing output file...")
     with open(output_path, 'wb') as f:
-        f.write(header.pack())
-        f.write(bytes(roms['p']))
-        f.write(bytes(s_transformed))
-        f.write(bytes(roms['m']))
-        f.write(bytes(roms['v']))
-        f.write(bytes(c_transformed))
+        total_size = writer.write(f)
     
     # Summary
-    total_size = (NGFC_HEADER_SIZE + len(roms['p']) + len(s_transformed) + 
-                  len(roms['m']) + len(roms['v']) + len(c_transformed))
-    
     print(f"\nConversion complete!")
-    print(f"  P-ROM: {len(roms['p']):,} bytes")
-    print(f"  S-ROM: {len(s_transformed):,} bytes (transformed)")
-    print(f"  M-ROM: {len(roms['m']):,} bytes")
-    print(f"  V-ROM: {len(roms['v']):,} bytes")
-    print(f"  C-ROM: {len(c_transformed):,} bytes (from {c_original_size:,} original)")
+    print(f"  P-ROM: {header.p_size:,} bytes")
+    print(f"  S-ROM: {header.s_size:,} bytes (transformed)")
+    print(f"  M-ROM: {header.m_size:,} bytes")
+    print(f"  V-ROM: {header.v_size:,} bytes")
+    print(f"  C-ROM: {header.c_size:,} bytes (from {header.c_size_original:,} original)")
+    if writer.tables:
+        print(f"  Bank tables: {header.tables_size:,} bytes at 0x{header.tables_offset:X}")
+    if link_frames:
+        print_link_frames(header)
     print(f"  Total: {total_size:,} bytes ({total_size / 1024 / 1024:.1f} MB)")
+    if boot_order:
+        print()
+        print_boot_report(header, writer.chunks, total_size)
 
 
 def verify_ngfc(path: Path):
@@ -477,8 +1615,7 @@ def verify_ngfc(path: Path):
     print(f"Verifying: {path}")
     
     with open(path, 'rb') as f:
-        header_data = f.read(NGFC_HEADER_SIZE)
-        header = NGFCHeader.unpack(header_data)
+        header = NGFCHeader.read(f)
         
         print(f"\nNGFC Header:")
         print(f"  Version: {header.version}")
@@ -488,14 +1625,51 @@ def verify_ngfc(path: Path):
         print(f"  S-ROM size: {header.s_size:,} bytes")
         print(f"  M-ROM size: {header.m_size:,} bytes")
         print(f"  V-ROM size: {header.v_size:,} bytes")
+        if header.adpcma_size:
+            print(f"  ADPCM-B region: from 0x{header.adpcma_size:X}")
         print(f"  C-ROM size: {header.c_size:,} bytes (original: {header.c_size_original:,})")
+        print(f"  C-ROM pairs: {len(header.c_pair_sizes())}")
+        if header.flags & FLAG_PAIR_TABLE:
+            print(f"  Pair sizes: {', '.join(f'{size:,}' for size in header.pair_sizes)} bytes")
+        if header.flags & FLAG_PREVIEW:
+            print(f"  Preview: {PREVIEW_SIZE:,} bytes at 0x{PREVIEW_OFFSET:X}")
         print(f"  CRC32: 0x{header.crc32:08X}")
         
+        if header.flags & FLAG_BANK_TABLES:
+            print(f"\nBank tables: {header.tables_size:,} bytes at 0x{header.tables_offset:X}")
+            try:
+                tables = read_bank_tables(f, header)
+            except (ValueError, struct.error) as e:
+                print(f"  ✗ {e}")
+            else:
+                pairs = len(tables.get('CPAR', [])) // 4
+                unmapped = tables.get('VBNK', []).count(BANK_UNMAPPED)
+                print(f"  {P_BANK_COUNT} P-ROM banks, {len(M_WINDOW_SHIFTS)}x{M_BANK_COUNT} Z80 banks, "
+                      f"{pairs} C-ROM pairs, {V_PAGE_COUNT * 2} V-ROM pages ({unmapped} unmapped)")
+                problems = validate_bank_tables(tables, header)
+                for problem in problems:
+                    print(f"  ✗ {problem}")
+                if not problems:
+                    print("  ✓ Tables cover every address")
+        
         # Check file size
         f.seek(0, 2)
         file_size = f.tell()
-        expected_size = (NGFC_HEADER_SIZE + header.p_size + header.s_size + 
-                        header.m_size + header.v_size + header.c_size)
+        if header.flags & FLAG_BOOT_ORDER:
+            chunks, _ = read_chunk_map(f, header.chunk_map_offset)
+            expected_size = max((chunk.file_offset + chunk.size for chunk in chunks),
+                                default=header.data_offset())
+            print()
+            print_boot_report(header, chunks, file_size)
+            for name, _, size in header.sections():
+                covered = sum(chunk.size for chunk in chunks if chunk.section == name)
+                if covered != size:
+                    print(f"  ✗ Chunk map covers {covered:,} of {size:,} bytes of {name.upper()}-ROM")
+        else:
+            expected_size = header.data_end()
+            if header.flags & FLAG_LINK_FRAMES:
+                print("\nLink frames:")
+                print_link_frames(header)
         
         print(f"\n  File size: {file_size:,} bytes")
         print(f"  Expected:  {expected_size:,} bytes")
@@ -506,6 +1680,348 @@ def verify_ngfc(path: Path):
             print(f"  ✗ Size mismatch! Difference: {file_size - expected_size:,} bytes")
 
 
+def print_link_frames(header: NGFCHeader):
+    """Summarize the link-framed sections of a file."""
+    for name, offset, size in header.sections():
+        if name in LINK_TARGETS and size:
+            frames = (size + LINK_PAYLOAD_SIZE - 1) // LINK_PAYLOAD_SIZE
+            print(f"  Link {LINK_STREAMS[name]} {name.upper()}-ROM: {frames:,} frames at 0x{offset:X} "
+                  f"({link_section_size(size):,} bytes)")
+
+
+def print_boot_report(header: NGFCHeader, chunks: List[Chunk], file_size: int):
+    """Report how much of a boot-first file must load before the game can start."""
+    prefix = header.boot_prefix
+    print("Boot-first layout:")
+    print(f"  Chunks: {len(chunks)} ({sum(1 for c in chunks if c.file_offset < prefix)} in boot prefix)")
+    print(f"  Boot prefix: {prefix:,} bytes ({prefix / max(file_size, 1):.1%} of file)")
+    for name, _, size in header.sections():
+        if not size:
+            continue
+        loaded = sum(c.size for c in chunks if c.section == name and c.file_offset < prefix)
+        print(f"    {name.upper()}-ROM: {loaded:,} / {size:,} bytes ({loaded / size:.0%})")
+    rate = SD_READ_RATE / 1024 / 1024
+    print(f"  Load before reset at {rate:.0f} MB/s: {prefix / SD_READ_RATE:.2f}s "
+          f"(full file: {file_size / SD_READ_RATE:.2f}s)")
+
+
+def boot_report(paths: List[Path], boot_c: int = BOOT_C_SIZE, boot_v: int = BOOT_V_SIZE):
+    """
+    Offline boot-first report for NGFC files. Files converted without
+    --boot-first are reported as they would be laid out with it.
+    """
+    for path in paths:
+        print(f"{path}:")
+        with open(path, 'rb') as f:
+            header = NGFCHeader.read(f)
+            if header.flags & FLAG_BOOT_ORDER:
+                chunks, _ = read_chunk_map(f, header.chunk_map_offset)
+                file_size = f.seek(0, 2)
+            else:
+                print("  (standard layout - showing boot-first plan)")
+                sizes = {name: size for name, _, size in header.sections()}
+                chunks, header.boot_prefix = plan_boot_layout(sizes, header.data_offset(),
+                                                              boot_c=boot_c, boot_v=boot_v)
+                file_size = max((c.file_offset + c.size for c in chunks), default=header.data_offset())
+        print_boot_report(header, chunks, file_size)
+        print()
+
+
+def iter_section(f, offset: int, size: int, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Yield size bytes of an open file, starting at offset, in chunks."""
+    f.seek(offset)
+    remaining = size
+    while remaining:
+        chunk = f.read(min(chunk_size, remaining))
+        if not chunk:
+            raise ValueError(f"File truncated: {remaining:,} bytes missing at offset {f.tell():,}")
+        remaining -= len(chunk)
+        yield chunk
+
+
+def iter_section_range(f, extents: List[Tuple[int, int, int]], start: int, length: int,
+                       chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Yield length bytes of a section, starting at section offset start,
+    across its extents (see read_section_extents). Every chunk except the
+    last is exactly chunk_size bytes.
+    """
+    end = start + length
+    pending = bytearray()
+    covered = 0
+    for section_offset, file_offset, size in extents:
+        lo = max(start, section_offset)
+        hi = min(end, section_offset + size)
+        if lo >= hi:
+            continue
+        covered += hi - lo
+        for data in iter_section(f, file_offset + lo - section_offset, hi - lo, chunk_size):
+            if not pending and len(data) == chunk_size:
+                yield data
+                continue
+            pending += data
+            while len(pending) >= chunk_size:
+                yield bytes(pending[:chunk_size])
+                del pending[:chunk_size]
+    
+    if covered != length:
+        raise ValueError(f"Section data missing: {length - covered:,} of {length:,} bytes not in file")
+    if pending:
+        yield bytes(pending)
+
+
+def extract_streams(f, header: NGFCHeader, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Stream the original ROM data back out of an open NGFC file.
+    
+    Yields (stream, data) where stream is 'p', 's', 'm', 'v' or 'c1'..'cN'
+    (one per C-ROM chip); chunks of each stream are yielded in order.
+    Only one chunk is held in memory at a time.
+    """
+    if chunk_size % 32:
+        raise ValueError(f"Chunk size must be a multiple of 32 bytes, got {chunk_size}")
+    
+    extents = read_section_extents(f, header)
+    for name, _, size in header.sections():
+        if name == 'c':
+            pair_start = 0
+            for idx, chip_size in enumerate(header.c_pair_sizes()):
+                for chunk in iter_section_range(f, extents[name], pair_start, chip_size * 2, chunk_size):
+                    c1, c2 = split_crom_pair(chunk)
+                    yield f'c{idx * 2 + 1}', c1
+                    yield f'c{idx * 2 + 2}', c2
+                pair_start += chip_size * 2
+        elif name == 's':
+            for chunk in iter_section_range(f, extents[name], 0, size, chunk_size):
+                yield name, restore_srom(chunk)
+        else:
+            for chunk in iter_section_range(f, extents[name], 0, size, chunk_size):
+                yield name, chunk
+
+
+def find_game_for_header(header: NGFCHeader, db: Optional[GameDB] = None) -> Optional[GameEntry]:
+    """
+    Find the game database entry matching an NGFC header's NGH number and
+    sizes. Files without an NGH number match on sizes alone, if only one
+    game has them.
+    """
+    db = db or get_gamedb()
+    matches = []
+    for game in db:
+        if header.ngh_number and game.ngh_number != header.ngh_number:
+            continue
+        sizes = {role: sum(rom.size for rom in game.roms if rom.role == role) for role in ROM_ROLES}
+        if (sizes['p'], sizes['s'], sizes['m'], sizes['v'], sizes['c']) == \
+                (header.p_size, header.s_size, header.m_size, header.v_size, header.c_size_original):
+            if header.ngh_number:
+                return game
+            matches.append(game)
+    return matches[0] if len(matches) == 1 else None
+
+
+def extract_file_layout(header: NGFCHeader, stem: str,
+                        game: Optional[GameEntry] = None) -> Dict[str, List[RomEntry]]:
+    """
+    Output files for each extracted stream.
+    
+    With a game database entry, streams are split back into the original
+    MAME files (with their expected CRC32s). Otherwise one file is written
+    per section and per C-ROM chip, named so that plan_from_names() picks
+    them up again (CRC32 unknown: -1).
+    """
+    layout = {}
+    if game:
+        for rom in sorted(game.roms, key=lambda rom: (rom.role, rom.index)):
+            stream = f'c{rom.index}' if rom.role == 'c' else rom.role
+            layout.setdefault(stream, []).append(rom)
+        return layout
+    
+    for name, _, size in header.sections():
+        if name == 'c':
+            for idx, chip_size in enumerate(header.c_pair_sizes()):
+                for chip in (idx * 2 + 1, idx * 2 + 2):
+                    layout[f'c{chip}'] = [RomEntry('c', chip, chip_size, -1, f'{stem}-c{chip}.bin')]
+        elif size:
+            layout[name] = [RomEntry(name, 0, size, -1, f'{stem}-{name}1.bin')]
+    return layout
+
+
+def extract_ngfc(path: Path, output_dir: Optional[Path] = None,
+                 game: Optional[GameEntry] = None,
+                 chunk_size: int = STREAM_CHUNK_SIZE) -> List[Tuple[str, int, int, int]]:
+    """
+    Rebuild per-chip ROM files from an NGFC file.
+    
+    Files are written to output_dir (nothing is written when it is None,
+    which just checksums the data). Returns a list of
+    (file name, size, crc32, expected crc32 or -1).
+    """
+    with open(path, 'rb') as f:
+        header = NGFCHeader.read(f)
+        if game is None:
+            game = find_game_for_header(header)
+        layout = extract_file_layout(header, path.stem, game)
+        
+        if output_dir is not None:
+            output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Per stream: index of the current file, bytes written to it, its CRC and handle
+        state = {stream: [0, 0, 0, None] for stream in layout}
+        results = []
+        
+        def finish(stream):
+            st = state[stream]
+            rom = layout[stream][st[0]]
+            if st[3]:
+                st[3].close()
+            results.append((rom.name, st[1], st[2], rom.crc32))
+            st[0] += 1
+            st[1] = st[2] = 0
+            st[3] = None
+        
+        try:
+            for stream, data in extract_streams(f, header, chunk_size):
+                st = state[stream]
+                files = layout[stream]
+                view = memoryview(data)
+                while len(view):
+                    if st[0] >= len(files):
+                        raise ValueError(f"{stream}: more data than the expected ROM files")
+                    rom = files[st[0]]
+                    if st[3] is None and output_dir is not None:
+                        st[3] = open(output_dir / rom.name, 'wb')
+                    part = view[:rom.size - st[1]]
+                    if st[3]:
+                        st[3].write(part)
+                    st[2] = zlib.crc32(part, st[2])
+                    st[1] += len(part)
+                    view = view[len(part):]
+                    if st[1] == rom.size:
+                        finish(stream)
+        finally:
+            for st in state.values():
+                if st[3]:
+                    st[3].close()
+        
+        for stream, st in state.items():
+            if st[0] < len(layout[stream]):
+                raise ValueError(f"{stream}: missing data for {layout[stream][st[0]].name}")
+    
+    return results
+
+
+def source_stream_crcs(source: Path) -> Dict[str, Tuple[int, int]]:
+    """
+    CRC32 and size of each extract stream ('p', 's', ..., 'c1'..'cN') as it
+    should be recovered from a source ROM set.
+    """
+    if source.suffix.lower() == '.zip':
+        zf = zipfile.ZipFile(source, 'r')
+        names = zf.namelist()
+        opener = zf.open
+    else:
+        zf = None
+        names = [f.name for f in source.iterdir() if f.is_file()]
+        opener = lambda name: open(source / name, 'rb')
+    
+    try:
+        match = get_gamedb().identify(zip_members(zf) if zf else dir_members(source),
+                                      hint=source.stem)
+        plan = plan_from_game(match[1]) if match else plan_from_names(names)
+        
+        streams = {role: plan[role] for role in ('p', 's', 'm', 'v') if plan[role]}
+        for idx, (c1, c2) in enumerate(plan['c_pairs']):
+            streams[f'c{idx * 2 + 1}'] = [c1]
+            streams[f'c{idx * 2 + 2}'] = [c2]
+        
+        crcs = {}
+        for stream, files in streams.items():
+            crc = size = 0
+            for name in files:
+                with opener(name) as fh:
+                    for chunk in iter(lambda: fh.read(STREAM_CHUNK_SIZE), b''):
+                        crc = zlib.crc32(chunk, crc)
+                        size += len(chunk)
+            crcs[stream] = (crc, size)
+        return crcs
+    finally:
+        if zf:
+            zf.close()
+
+
+def verify_roundtrip(path: Path, source: Path, chunk_size: int = STREAM_CHUNK_SIZE) -> bool:
+    """
+    Check that an NGFC file inverts back to the ROM set it was made from.
+    
+    Each extracted stream is compared in full against the source files:
+    CRC32 over the source length, and anything past it (C-ROM chips
+    shorter than their pair) must be zero padding.
+    """
+    print(f"Round-trip check: {path} against {source}")
+    expected = source_stream_crcs(source)
+    
+    with open(path, 'rb') as f:
+        header = NGFCHeader.read(f)
+        got = {}
+        padding = {}  # stream -> offset of the first non-zero byte past the source length
+        for stream, data in extract_streams(f, header, chunk_size):
+            crc, size = got.get(stream, (0, 0))
+            limit = expected.get(stream, (0, size + len(data)))[1]
+            part = data[:max(0, limit - size)]
+            tail = data[len(part):]
+            if stream not in padding and tail.count(0) != len(tail):
+                padding[stream] = size + len(part) + next(i for i, b in enumerate(tail) if b)
+            got[stream] = (zlib.crc32(part, crc), size + len(part))
+    
+    ok = True
+    for stream in sorted(set(expected) | set(got), key=lambda s: (SECTION_ORDER.index(s[0]), int(s[1:] or 0))):
+        if stream not in got:
+            print(f"  ✗ {stream}: missing from NGFC file")
+            ok = False
+        elif stream not in expected:
+            print(f"  ✗ {stream}: not in source set")
+            ok = False
+        elif stream in padding:
+            print(f"  ✗ {stream}: non-zero data at 0x{padding[stream]:X}, past the {expected[stream][1]:,} source bytes")
+            ok = False
+        elif got[stream] != expected[stream]:
+            print(f"  ✗ {stream}: CRC32 {got[stream][0]:08X} != {expected[stream][0]:08X}")
+            ok = False
+        else:
+            print(f"  ✓ {stream}: {got[stream][1]:,} bytes, CRC32 {got[stream][0]:08X}")
+    return ok
+
+
+def extract_command(files: List[Path], output_dir: Optional[Path], set_name: Optional[str],
+                    source: Optional[Path]) -> bool:
+    """Extract (or checksum) one or more NGFC files; returns True if all checks pass."""
+    game = None
+    if set_name:
+        game = get_gamedb().get(set_name)
+        if game is None:
+            print(f"Error: '{set_name}' is not in the game database")
+            return False
+    
+    ok = True
+    for path in files:
+        start = time.perf_counter()
+        if source:
+            ok &= verify_roundtrip(path, source)
+        else:
+            target = output_dir / path.stem if output_dir and len(files) > 1 else output_dir
+            print(f"Extracting: {path}" + (f" -> {target}" if target else ""))
+            for name, size, crc, expected in extract_ngfc(path, target, game):
+                if expected < 0:
+                    print(f"  {name}: {size:,} bytes, CRC32 {crc:08X}")
+                elif crc == expected:
+                    print(f"  ✓ {name}: {size:,} bytes, CRC32 {crc:08X}")
+                else:
+                    print(f"  ✗ {name}: CRC32 {crc:08X}, expected {expected:08X}")
+                    ok = False
+        print(f"  ({time.perf_counter() - start:.2f}s)")
+    return ok
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Convert Neo Geo ROMs to NGFC format for flash cart use',
@@ -519,6 +2035,22 @@ def main():
     convert_parser.add_argument('input', type=Path, help='Input ROM set (directory or zip)')
     convert_parser.add_argument('output', type=Path, help='Output NGFC file')
     convert_parser.add_argument('--ngh', type=int, default=0, help='NGH number (optional)')
+    convert_parser.add_argument('--preview-title', nargs='?', const='', metavar='TEXT',
+                                help='Add a menu preview rendered with the S-ROM font (default text: game name)')
+    convert_parser.add_argument('--preview-image', type=Path, metavar='IMAGE',
+                                help='Add a menu preview from a PNG/PPM image')
+    convert_parser.add_argument('--boot-first', action='store_true',
+                                help='Order data by boot priority so firmware can start the game early')
+    convert_parser.add_argument('--boot-c', type=float, default=BOOT_C_SIZE / 1024 / 1024, metavar='MB',
+                                help=f'C-ROM in the boot prefix (default: {BOOT_C_SIZE // 1024 // 1024} MB)')
+    convert_parser.add_argument('--boot-v', type=float, default=BOOT_V_SIZE / 1024 / 1024, metavar='MB',
+                                help=f'V-ROM in the boot prefix (default: {BOOT_V_SIZE // 1024 // 1024} MB)')
+    convert_parser.add_argument('--link-frames', action='store_true',
+                                help='Store S/M/C-ROM pre-encoded as inter-Pico link frames')
+    convert_parser.add_argument('--bank-tables', action='store_true',
+                                help='Add precomputed address translation tables')
+    convert_parser.add_argument('--preview-font-base', type=lambda s: int(s, 0), default=0,
+                                help='S-ROM tile of character code 0 for --preview-title (default: 0)')
     
     # Verify command
     verify_parser = subparsers.add_parser('verify', help='Verify NGFC file')
@@ -528,13 +2060,91 @@ def main():
     info_parser = subparsers.add_parser('info', help='Show NGFC file information')
     info_parser.add_argument('file', type=Path, help='NGFC file to examine')
     
+    # Extract command
+    extract_parser = subparsers.add_parser('extract', help='Rebuild MAME ROM files from NGFC files')
+    extract_parser.add_argument('files', type=Path, nargs='+', help='NGFC file(s) to extract')
+    extract_parser.add_argument('-o', '--output', type=Path,
+                                help='Output directory (omit to only checksum the ROMs)')
+    extract_parser.add_argument('--set', dest='set_name', help='Game database set name for file names/CRCs')
+    extract_parser.add_argument('--verify', type=Path, metavar='SOURCE',
+                                help='Round-trip check against the source ROM set (directory or zip)')
+    
+    # Boot report command
+    boot_parser = subparsers.add_parser('boot-report', help='Show how much of NGFC files must load before boot')
+    boot_parser.add_argument('files', type=Path, nargs='+', help='NGFC file(s)')
+    
+    # Preview command
+    preview_parser = subparsers.add_parser('preview', help='Export the menu preview of an NGFC file as PNG')
+    preview_parser.add_argument('file', type=Path, help='NGFC file')
+    preview_parser.add_argument('output', type=Path, help='Output PNG')
+    
+    # Tiles command
+    tiles_parser = subparsers.add_parser('tiles', help='Export C-ROM sprite tiles as PNG atlas pages')
+    tiles_parser.add_argument('source', type=Path, help='NGFC file or ROM set (directory or zip)')
+    tiles_parser.add_argument('output', type=Path, help='Output PNG (pages get _000, _001... suffixes)')
+    tiles_parser.add_argument('--start', type=int, default=0, help='First tile (default: 0)')
+    tiles_parser.add_argument('--count', type=int, help='Number of tiles (default: all)')
+    tiles_parser.add_argument('--columns', type=int, default=32, help='Tiles per atlas row (default: 32)')
+    tiles_parser.add_argument('--rows', type=int, default=32, help='Tile rows per page (default: 32)')
+    tiles_parser.add_argument('--diff', type=Path, metavar='OTHER',
+                              help='Highlight pixels that differ from another NGFC file or ROM set')
+    
+    # Diff command
+    diff_parser = subparsers.add_parser('diff', help='Compare two NGFC files or directories of them')
+    diff_parser.add_argument('old', type=Path, help='NGFC file or directory')
+    diff_parser.add_argument('new', type=Path, help='NGFC file or directory')
+    diff_parser.add_argument('--max-ranges', type=int, default=20,
+                             help='Changed ranges listed per file (default: 20)')
+    diff_parser.add_argument('--jobs', type=int, help='Hashing threads (default: CPU count)')
+    diff_parser.add_argument('--no-cache', action='store_true', help='Do not read or update the hash cache')
+    
+    # Identify command
+    identify_parser = subparsers.add_parser('identify', help='Identify ROM set zips against the game database')
+    identify_parser.add_argument('paths', type=Path, nargs='+', help='ROM set zips or directories of zips')
+    
+    # Link command
+    link_parser = subparsers.add_parser('link', help='Validate link frame streams with the reference receiver')
+    link_parser.add_argument('files', type=Path, nargs='+', help='NGFC file(s) converted with --link-frames')
+    link_parser.add_argument('--bench', action='store_true', help='Measure read, framing and receive throughput')
+    
+    # Serve command
+    serve_parser = subparsers.add_parser('serve', help='Run the HTTP conversion service')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    serve_parser.add_argument('--port', type=int, default=8086, help='Port (default: 8086)')
+    serve_parser.add_argument('--workers', type=int, help='Conversion processes (default: CPU count)')
+    serve_parser.add_argument('--memory', type=int, metavar='MB',
+                              help='Memory budget for running conversions (default: half of RAM)')
+    serve_parser.add_argument('--max-queued', type=int, default=8, help='Jobs allowed to wait (default: 8)')
+    serve_parser.add_argument('--max-uploads', type=int, default=4,
+                              help='Uploads received at the same time (default: 4)')
+    
+    # Game database commands
+    gamedb_parser = subparsers.add_parser('gamedb', help='Build the game database')
+    gamedb_sub = gamedb_parser.add_subparsers(dest='gamedb_command')
+    gamedb_build = gamedb_sub.add_parser('build', help='Build database from MAME -listxml output')
+    gamedb_build.add_argument('listxml', type=Path, help='MAME -listxml output file')
+    gamedb_build.add_argument('-o', '--output', type=Path, default=GAMEDB_PATH,
+                              help='Output database (default: bundled ngfc_gamedb.tsv)')
+    gamedb_build.add_argument('--ngh-map', type=Path, default=NGH_MAP_PATH,
+                              help='NGH numbers and regions by set (default: bundled ngfc_ngh.tsv)')
+    
     args = parser.parse_args()
     
     if args.command == 'convert':
         if not args.input.exists():
             print(f"Error: Input not found: {args.input}")
             sys.exit(1)
-        convert_to_ngfc(args.input, args.output, args.ngh)
+        if args.preview_image and not args.preview_image.exists():
+            print(f"Error: Image not found: {args.preview_image}")
+            sys.exit(1)
+        if args.link_frames and args.boot_first:
+            print("Error: --link-frames needs the standard layout (no --boot-first)")
+            sys.exit(1)
+        convert_to_ngfc(args.input, args.output, args.ngh,
+                        preview_title=args.preview_title, preview_image=args.preview_image,
+                        preview_font_base=args.preview_font_base, boot_order=args.boot_first,
+                        boot_c=int(args.boot_c * 1024 * 1024), boot_v=int(args.boot_v * 1024 * 1024),
+                        bank_tables=args.bank_tables, link_frames=args.link_frames)
         
     elif args.command == 'verify':
         if not args.file.exists():
@@ -548,6 +2158,84 @@ def main():
             sys.exit(1)
         verify_ngfc(args.file)
         
+    elif args.command == 'extract':
+        for path in args.files + ([args.verify] if args.verify else []):
+            if not path.exists():
+                print(f"Error: File not found: {path}")
+                sys.exit(1)
+        if not extract_command(args.files, args.output, args.set_name, args.verify):
+            sys.exit(1)
+        
+    elif args.command == 'boot-report':
+        for path in args.files:
+            if not path.exists():
+                print(f"Error: File not found: {path}")
+                sys.exit(1)
+        boot_report(args.files)
+        
+    elif args.command == 'preview':
+        from ngfc_preview import export_preview
+        if not args.file.exists():
+            print(f"Error: File not found: {args.file}")
+            sys.exit(1)
+        if not export_preview(args.file, args.output):
+            sys.exit(1)
+        
+    elif args.command == 'tiles':
+        from ngfc_tiles import tiles_command
+        for path in [args.source] + ([args.diff] if args.diff else []):
+            if not path.exists():
+                print(f"Error: File not found: {path}")
+                sys.exit(1)
+        if not tiles_command(args.source, args.output, args.start, args.count,
+                             args.columns, args.rows, args.diff):
+            sys.exit(1)
+        
+    elif args.command == 'diff':
+        from ngfc_diff import diff_command, DIFF_CACHE_PATH
+        for path in (args.old, args.new):
+            if not path.exists():
+                print(f"Error: File not found: {path}")
+                sys.exit(1)
+        if not diff_command(args.old, args.new, None if args.no_cache else DIFF_CACHE_PATH,
+                            args.jobs, args.max_ranges):
+            sys.exit(1)
+        
+    elif args.command == 'identify':
+        identify_library(args.paths)
+        
+    elif args.command == 'link':
+        from ngfc_link import link_command
+        for path in args.files:
+            if not path.exists():
+                print(f"Error: File not found: {path}")
+                sys.exit(1)
+        if not link_command(args.files, args.bench):
+            sys.exit(1)
+        
+    elif args.command == 'serve':
+        import asyncio
+        from ngfc_server import serve
+        try:
+            asyncio.run(serve(args.host, args.port, max_workers=args.workers,
+                              memory_budget=args.memory * 1024 * 1024 if args.memory else None,
+                              max_queued=args.max_queued, max_uploads=args.max_uploads))
+        except KeyboardInterrupt:
+            pass
+        
+    elif args.command == 'gamedb':
+        if args.gamedb_command != 'build':
+            gamedb_parser.print_help()
+            sys.exit(1)
+        if not args.listxml.exists():
+            print(f"Error: File not found: {args.listxml}")
+            sys.exit(1)
+        if not args.ngh_map.exists():
+            print(f"Error: File not found: {args.ngh_map}")
+            sys.exit(1)
+        count = build_gamedb(args.listxml, args.output, args.ngh_map)
+        print(f"Wrote {count} games to {args.output}")
+        
     else:
         parser.print_help()
 
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Block-hash comparison of NGFC files (ngfc_diff.py)
+
+Compares two .ngfc files, or two directories of them, region by region:
+header, menu preview, bank tables and the P/S/M/V/C sections in section order, so a
+boot-first file and a standard file with the same data compare equal.
+Header fields and flags that only describe where the data sits (chunk
+map, bank table offset, boot-first and link-frame layout) are ignored.
+
+Each region is hashed in DIFF_BLOCK_SIZE blocks straight from an mmap of
+the file. Batches of blocks are hashed on a thread pool (hashlib releases
+the GIL on large buffers). Only blocks whose hashes differ are compared
+byte-wise, narrowing each to the exact changed ranges, which are reported
+as section offsets with their C-ROM pair and sprite tile (or fix tile).
+
+Block hashes can be kept in a cache file keyed by path, size and mtime,
+so comparing output directories again after a converter change only
+rehashes the files that were rewritten.
+
+License: GPL v3 (same as MiSTer)
+"""
+
+import base64
+import hashlib
+import json
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from ngfc_converter import (
+    FLAG_BANK_TABLES,
+    FLAG_BOOT_ORDER,
+    FLAG_LINK_FRAMES,
+    FLAG_PREVIEW,
+    NGFCHeader,
+    PREVIEW_OFFSET,
+    PREVIEW_SIZE,
+    SECTION_ORDER,
+    read_section_extents,
+)
+
+
+DIFF_BLOCK_SIZE = 256 * 1024
+DIFF_BATCH_BLOCKS = 16        # Blocks hashed per thread pool task
+DIFF_DIGEST_SIZE = 8
+DIFF_MIN_SPAN = 32            # Byte-wise narrowing stops at this size
+DIFF_CACHE_PATH = Path.home() / '.cache' / 'ngfc' / 'diff-hashes.json'
+DIFF_CACHE_VERSION = 2        # Bump when the regions or hashing change
+REGION_ORDER = ('preview', 'tables') + SECTION_ORDER
+SPRITE_TILE_BYTES = 128       # Transformed C section bytes per sprite tile
+FIX_TILE_BYTES = 32
+
+# Header fields and flags that only locate the data; regions are compared in section space
+LAYOUT_FIELDS = ('boot_prefix', 'chunk_map_offset', 'tables_offset', 'tables_size')
+LAYOUT_FLAGS = FLAG_BOOT_ORDER | FLAG_LINK_FRAMES
+
+SECTION_NAMES = {
+    'header': 'Header', 'preview': 'Preview', 'tables': 'Bank tables',
+    'p': 'P-ROM', 's': 'S-ROM', 'm': 'M-ROM', 'v': 'V-ROM', 'c': 'C-ROM',
+}
+
+
+class FileHashes(NamedTuple):
+    """Block hashes of one NGFC file."""
+    size: int
+    mtime_ns: int
+    block_size: int
+    header: bytes
+    regions: Dict[str, Tuple[int, bytes]]  # region -> (size, concatenated block digests)
+
+
+class FileDiff(NamedTuple):
+    """Differences between two NGFC files."""
+    header_fields: List[Tuple[str, int, int]]       # (field, old, new)
+    ranges: List[Tuple[str, int, int]]              # (region, start, end) in region offsets
+    sizes: Dict[str, Tuple[int, int]]               # region -> (old size, new size), changed only
+
+    @property
+    def identical(self) -> bool:
+        return not (self.header_fields or self.ranges or self.sizes)
+
+
+class NGFCImage:
+    """An mmap-ed NGFC file with its regions located."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self.header = NGFCHeader.read(self._file)
+            self._file.seek(0)
+            self.header_data = self._file.read(self.header.packed_size())
+            self.extents = read_section_extents(self._file, self.header)
+            self.extents['preview'] = [(0, PREVIEW_OFFSET, PREVIEW_SIZE)] \
+                if self.header.flags & FLAG_PREVIEW else []
+            self.extents['tables'] = [(0, self.header.tables_offset, self.header.tables_size)] \
+                if self.header.flags & FLAG_BANK_TABLES else []
+            self.stat = os.fstat(self._file.fileno())
+            self.map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self.view = memoryview(self.map)
+        for name, extents in self.extents.items():
+            for _, file_offset, size in extents:
+                if file_offset + size > len(self.map):
+                    self.close()
+                    raise ValueError(f"{path}: {SECTION_NAMES[name]} extends past end of file")
+
+    def region_size(self, name: str) -> int:
+        return sum(size for _, _, size in self.extents[name])
+
+    def read(self, name: str, start: int, length: int):
+        """Region bytes [start, start + length): a zero-copy view when in one extent."""
+        parts = []
+        end = start + length
+        for section_offset, file_offset, size in self.extents[name]:
+            lo = max(start, section_offset)
+            hi = min(end, section_offset + size)
+            if lo < hi:
+                parts.append(self.view[file_offset + lo - section_offset:file_offset + hi - section_offset])
+        if len(parts) == 1:
+            return parts[0]
+        return b''.join(parts)
+
+    def close(self):
+        if hasattr(self, 'view'):
+            self.view.release()
+            self.map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _hash_blocks(image: NGFCImage, name: str, starts: List[int], block_size: int) -> bytes:
+    digests = []
+    for start in starts:
+        data = image.read(name, start, block_size)
+        digests.append(hashlib.blake2b(data, digest_size=DIFF_DIGEST_SIZE).digest())
+        if isinstance(data, memoryview):
+            data.release()
+    return b''.join(digests)
+
+
+def hash_image(image: NGFCImage, executor: ThreadPoolExecutor,
+               block_size: int = DIFF_BLOCK_SIZE) -> FileHashes:
+    """Hash every region of an open image in parallel batches."""
+    futures = {}
+    for name in REGION_ORDER:
+        size = image.region_size(name)
+        starts = list(range(0, size, block_size))
+        futures[name] = (size, [executor.submit(_hash_blocks, image, name, starts[i:i + DIFF_BATCH_BLOCKS], block_size)
+                                for i in range(0, len(starts), DIFF_BATCH_BLOCKS)])
+    regions = {name: (size, b''.join(future.result() for future in batch))
+               for name, (size, batch) in futures.items()}
+    return FileHashes(image.stat.st_size, image.stat.st_mtime_ns, block_size, image.header_data, regions)
+
+
+class HashCache:
+    """
+    Block hashes of previously seen files, keyed by absolute path, size and
+    mtime. Entries from another cache version, or missing a region, are
+    treated as misses.
+    """
+
+    def __init__(self, path: Optional[Path] = DIFF_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        if path and path.exists():
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def get(self, path: Path, block_size: int) -> Optional[FileHashes]:
+        entry = self.entries.get(str(path.resolve()))
+        if not isinstance(entry, dict) or entry.get('version') != DIFF_CACHE_VERSION:
+            return None
+        stat = path.stat()
+        try:
+            if (entry['size'], entry['mtime_ns'], entry['block_size']) != \
+                    (stat.st_size, stat.st_mtime_ns, block_size):
+                return None
+            regions = {name: (size, base64.b64decode(digests)) for name, (size, digests) in entry['regions'].items()}
+            header = bytes.fromhex(entry['header'])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if set(regions) != set(REGION_ORDER):
+            return None
+        return FileHashes(entry['size'], entry['mtime_ns'], block_size, header, regions)
+
+    def put(self, path: Path, hashes: FileHashes):
+        self.entries[str(path.resolve())] = {
+            'version': DIFF_CACHE_VERSION, 'size': hashes.size, 'mtime_ns': hashes.mtime_ns, 'block_size': hashes.block_size,
+            'header': hashes.header.hex(),
+            'regions': {name: [size, base64.b64encode(digests).decode()]
+                        for name, (size, digests) in hashes.regions.items()},
+        }
+        self.dirty = True
+
+    def save(self):
+        if not (self.path and self.dirty):
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+def file_hashes(path: Path, executor: ThreadPoolExecutor, cache: Optional[HashCache] = None,
+                block_size: int = DIFF_BLOCK_SIZE) -> FileHashes:
+    """Block hashes of a file, from the cache when it is unchanged."""
+    hashes = cache.get(path, block_size) if cache else None
+    if hashes is None:
+        with NGFCImage(path) as image:
+            hashes = hash_image(image, executor, block_size)
+        if cache:
+            cache.put(path, hashes)
+    return hashes
+
+
+def changed_spans(a, b, start: int = 0, min_span: int = DIFF_MIN_SPAN) -> List[Tuple[int, int]]:
+    """
+    Changed byte ranges between two equal-length buffers, as (start, end).
+
+    Halves are compared with slice equality until spans shrink to
+    min_span; the ends of each merged run are then narrowed to the byte.
+    """
+    spans = []
+    stack = [(0, len(a))]
+    while stack:
+        lo, hi = stack.pop()
+        if a[lo:hi] == b[lo:hi]:
+            continue
+        if hi - lo <= min_span:
+            if spans and spans[-1][1] == lo:
+                spans[-1][1] = hi
+            else:
+                spans.append([lo, hi])
+            continue
+        mid = (lo + hi) // 2
+        stack.append((mid, hi))
+        stack.append((lo, mid))
+
+    for span in spans:
+        while a[span[0]] == b[span[0]]:
+            span[0] += 1
+        while a[span[1] - 1] == b[span[1] - 1]:
+            span[1] -= 1
+    return [(start + lo, start + hi) for lo, hi in spans]
+
+
+def header_changes(old: bytes, new: bytes) -> List[Tuple[str, int, int]]:
+    """Header fields that differ, as (field, old value, new value), ignoring layout-only ones."""
+    a, b = NGFCHeader.unpack(old), NGFCHeader.unpack(new)
+    a.flags &= ~LAYOUT_FLAGS
+    b.flags &= ~LAYOUT_FLAGS
+    return [(field, value, getattr(b, field)) for field, value in vars(a).items()
+            if field not in LAYOUT_FIELDS and value != getattr(b, field)]
+
+
+def diff_images(a: NGFCImage, b: NGFCImage, hashes_a: FileHashes, hashes_b: FileHashes) -> FileDiff:
+    """Compare two images, reading only the blocks whose hashes differ."""
+    ranges = []
+    sizes = {}
+    block_size = hashes_a.block_size
+    for name in REGION_ORDER:
+        size_a, digests_a = hashes_a.regions[name]
+        size_b, digests_b = hashes_b.regions[name]
+        if size_a != size_b:
+            sizes[name] = (size_a, size_b)
+        common = min(size_a, size_b)
+        for block in range(0, (common + block_size - 1) // block_size):
+            d = block * DIFF_DIGEST_SIZE
+            start = block * block_size
+            length = min(block_size, common - start)
+            # The last block of a shorter region hashes fewer bytes: recheck it
+            if digests_a[d:d + DIFF_DIGEST_SIZE] == digests_b[d:d + DIFF_DIGEST_SIZE] and \
+                    (length == block_size or size_a == size_b):
+                continue
+            block_a, block_b = bytes(a.read(name, start, length)), bytes(b.read(name, start, length))
+            for lo, hi in changed_spans(block_a, block_b, start):
+                if ranges and ranges[-1][0] == name and ranges[-1][2] == lo:
+                    ranges[-1] = (name, ranges[-1][1], hi)
+                else:
+                    ranges.append((name, lo, hi))
+    return FileDiff(header_changes(hashes_a.header, hashes_b.header), ranges, sizes)
+
+
+def diff_files(path_a: Path, path_b: Path, executor: ThreadPoolExecutor,
+               cache: Optional[HashCache] = None, block_size: int = DIFF_BLOCK_SIZE) -> FileDiff:
+    """Compare two NGFC files."""
+    hashes_a = file_hashes(path_a, executor, cache, block_size)
+    hashes_b = file_hashes(path_b, executor, cache, block_size)
+    if hashes_a.regions == hashes_b.regions and not header_changes(hashes_a.header, hashes_b.header):
+        return FileDiff([], [], {})
+    with NGFCImage(path_a) as a, NGFCImage(path_b) as b:
+        return diff_images(a, b, hashes_a, hashes_b)
+
+
+def describe_range(header: NGFCHeader, region: str, start: int, end: int) -> str:
+    """Human-readable location of a changed region range."""
+    if end - start == 1:
+        text = f"{SECTION_NAMES[region]} 0x{start:X} (1 byte)"
+    else:
+        text = f"{SECTION_NAMES[region]} 0x{start:X}-0x{end - 1:X} ({end - start:,} bytes)"
+    if region == 'c':
+        parts = []
+        base = first_tile = 0
+        for pair, chip_size in enumerate(header.c_pair_sizes()):
+            lo, hi = max(start, base), min(end, base + chip_size * 2)
+            if lo < hi:
+                t0 = first_tile + (lo - base) // SPRITE_TILE_BYTES
+                t1 = first_tile + (hi - 1 - base) // SPRITE_TILE_BYTES
+                tiles = f"tile {t0}" if t0 == t1 else f"tiles {t0}-{t1}"
+                parts.append(f"C{pair * 2 + 1}/C{pair * 2 + 2} {tiles}")
+            base += chip_size * 2
+            first_tile += chip_size * 2 // SPRITE_TILE_BYTES
+        if parts:
+            text += ": " + ", ".join(parts)
+    elif region == 's':
+        t0, t1 = start // FIX_TILE_BYTES, (end - 1) // FIX_TILE_BYTES
+        text += f": fix tile {t0}" if t0 == t1 else f": fix tiles {t0}-{t1}"
+    return text
+
+
+def print_diff(diff: FileDiff, header: NGFCHeader, max_ranges: int = 20):
+    for field, old, new in diff.header_fields:
+        if isinstance(old, int):
+            old, new = f"0x{old:X}", f"0x{new:X}"
+        print(f"  Header {field}: {old} -> {new}")
+    for region, (old, new) in diff.sizes.items():
+        print(f"  {SECTION_NAMES[region]} size: {old:,} -> {new:,} bytes")
+    for region, start, end in diff.ranges[:max_ranges]:
+        print(f"  {describe_range(header, region, start, end)}")
+    if len(diff.ranges) > max_ranges:
+        changed = sum(end - start for _, start, end in diff.ranges[max_ranges:])
+        print(f"  ... {len(diff.ranges) - max_ranges} more ranges ({changed:,} bytes)")
+
+
+def diff_command(path_a: Path, path_b: Path, cache_path: Optional[Path] = DIFF_CACHE_PATH,
+                 jobs: Optional[int] = None, max_ranges: int = 20) -> bool:
+    """Compare two files or directories and print the differences. Returns True if identical."""
+    cache = HashCache(cache_path) if cache_path else None
+    if path_a.is_dir() != path_b.is_dir():
+        print("Error: compare two files or two directories")
+        return False
+
+    if path_a.is_dir():
+        names_a = {p.name for p in path_a.glob('*.ngfc')}
+        names_b = {p.name for p in path_b.glob('*.ngfc')}
+        pairs = [(path_a / name, path_b / name) for name in sorted(names_a & names_b)]
+        only = [(path_a, name) for name in sorted(names_a - names_b)] + \
+               [(path_b, name) for name in sorted(names_b - names_a)]
+    else:
+        pairs, only = [(path_a, path_b)], []
+
+    identical = 0
+    changed = 0
+    with ThreadPoolExecutor(jobs or os.cpu_count()) as executor:
+        for a, b in pairs:
+            try:
+                diff = diff_files(a, b, executor, cache)
+            except (OSError, ValueError) as e:
+                print(f"{b.name}: error: {e}")
+                changed += 1
+                continue
+            if diff.identical:
+                identical += 1
+                continue
+            changed += 1
+            print(f"{b.name}: changed")
+            with open(b, 'rb') as f:
+                header = NGFCHeader.read(f)
+            print_diff(diff, header, max_ranges)
+    if cache:
+        cache.save()
+
+    for directory, name in only:
+        print(f"{name}: only in {directory}")
+    if path_a.is_dir():
+        print(f"\n{len(pairs)} compared: {identical} identical, {changed} changed, {len(only)} unmatched")
+    elif not changed:
+        print("Files are identical")
+    return not changed and not only
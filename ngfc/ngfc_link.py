@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Inter-Pico link frame receiver (ngfc_link.py)
+
+Reference implementation of the receiving side of the link streams in
+.ngfc files converted with --link-frames (see encode_link_frames): link B
+carries C-ROM to Pico B, link C carries S-ROM then M-ROM to Pico C.
+
+Pico A sends each link's region of the file unmodified, sector by sector.
+LinkReceiver consumes that byte stream in arbitrary pieces, the way data
+arrives from the link PIO, and checks every frame as firmware must: sync
+byte, target, sequence number, contiguous target address, CRC32 and
+zero padding, then that every target memory was filled exactly once.
+
+The benchmark reports the cost of each stage on this machine: reading
+the pre-encoded stream (all Pico A has to do), framing the data at load
+time (what pre-encoding saves), and validating it on the receiving end.
+
+License: GPL v3 (same as MiSTer)
+"""
+
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from ngfc_converter import (
+    FLAG_BOOT_ORDER,
+    FLAG_LINK_FRAMES,
+    LINK_FRAME_HEADER_SIZE,
+    LINK_FRAME_SYNC,
+    LINK_LAST_FRAME,
+    LINK_PAYLOAD_SIZE,
+    LINK_STREAMS,
+    LINK_TARGETS,
+    NGFCHeader,
+    SECTOR_SIZE,
+    encode_link_frames,
+    iter_section_range,
+    link_section_size,
+    link_sequence_starts,
+    read_section_extents,
+)
+
+
+LINK_READ_SIZE = 64 * 1024   # Bytes per read when replaying a link stream
+LINK_BENCH_ROUNDS = 3
+
+
+class LinkError(ValueError):
+    """A link stream failed validation."""
+
+
+class LinkReceiver:
+    """
+    Validating receiver for one link.
+
+    targets maps target id -> memory size. Call feed() with stream data
+    as it arrives and finish() at the end of the stream; both raise
+    LinkError on the first invalid frame.
+    """
+
+    def __init__(self, link: str, targets: Dict[int, int], first_sequence: int = 0):
+        self.link = link
+        self.memory = {target: bytearray(size) for target, size in targets.items()}
+        self.received = {target: 0 for target in targets}
+        self.complete = set()
+        self.sequence = first_sequence
+        self.frames = 0
+        self.position = 0      # Stream offset of the buffer start
+        self._buffer = bytearray()
+
+    def _error(self, message: str):
+        raise LinkError(f"link {self.link}, frame at stream offset 0x{self.position:X}: {message}")
+
+    def feed(self, data: bytes):
+        """Consume stream data, validating and storing every complete frame."""
+        self._buffer += data
+        while len(self._buffer) >= LINK_FRAME_HEADER_SIZE:
+            sync, flags, length, sequence, address, crc = struct.unpack_from('<BBHIII', self._buffer)
+            span = (LINK_FRAME_HEADER_SIZE + length + SECTOR_SIZE - 1) // SECTOR_SIZE * SECTOR_SIZE
+            if sync != LINK_FRAME_SYNC:
+                self._error(f"bad sync byte 0x{sync:02X}")
+            if not 0 < length <= LINK_PAYLOAD_SIZE:
+                self._error(f"bad payload length {length}")
+            if len(self._buffer) < span:
+                break
+            self._frame(flags, length, sequence, address, crc, span)
+            del self._buffer[:span]
+            self.position += span
+
+    def _frame(self, flags: int, length: int, sequence: int, address: int, crc: int, span: int):
+        target = flags & ~LINK_LAST_FRAME
+        payload_end = LINK_FRAME_HEADER_SIZE + length
+        payload = memoryview(self._buffer)[LINK_FRAME_HEADER_SIZE:payload_end]
+        try:
+            if zlib.crc32(payload, zlib.crc32(self._buffer[:12])) != crc:
+                self._error(f"CRC mismatch (sequence {sequence})")
+            if sequence != self.sequence:
+                self._error(f"sequence {sequence}, expected {self.sequence}")
+            if target not in self.memory:
+                self._error(f"unexpected target {target}")
+            if target in self.complete:
+                self._error(f"target {target} already complete")
+            if address != self.received[target]:
+                self._error(f"target {target} address 0x{address:X}, expected 0x{self.received[target]:X}")
+            memory = self.memory[target]
+            if address + length > len(memory):
+                self._error(f"target {target} address 0x{address:X} + {length} past end of memory")
+            if self._buffer[payload_end:span].count(0) != span - payload_end:
+                self._error("non-zero padding")
+            last = address + length == len(memory)
+            if bool(flags & LINK_LAST_FRAME) != last:
+                self._error(f"last-frame flag {'missing' if last else 'set early'}")
+
+            memory[address:address + length] = payload
+        finally:
+            payload.release()
+
+        self.received[target] += length
+        if last:
+            self.complete.add(target)
+        self.sequence += 1
+        self.frames += 1
+
+    def finish(self):
+        """Check the stream ended cleanly with every target filled."""
+        if self._buffer:
+            self._error(f"{len(self._buffer)} trailing bytes")
+        for target, memory in self.memory.items():
+            if memory and target not in self.complete:
+                self._error(f"target {target} incomplete: {self.received[target]:,} of {len(memory):,} bytes")
+
+
+def link_regions(header: NGFCHeader) -> Dict[str, List[Tuple[str, int, int]]]:
+    """File regions Pico A sends on each link: link -> [(section, offset, file bytes)]."""
+    if not header.flags & FLAG_LINK_FRAMES:
+        raise ValueError("File has no link frames (convert with --link-frames)")
+    if header.flags & FLAG_BOOT_ORDER:
+        raise ValueError("Link frames need the standard layout")
+    regions = {}
+    for name, offset, size in header.sections():
+        if name in LINK_TARGETS and size:
+            regions.setdefault(LINK_STREAMS[name], []).append((name, offset, link_section_size(size)))
+    return regions
+
+
+def receive_links(path: Path, read_size: int = LINK_READ_SIZE) -> Dict[str, LinkReceiver]:
+    """
+    Replay every link stream of a file through a LinkReceiver.
+
+    Returns link -> finished receiver (memories keyed by target id).
+    Raises LinkError if a stream is invalid.
+    """
+    with open(path, 'rb') as f:
+        header = NGFCHeader.read(f)
+        sequences = link_sequence_starts(header)
+        receivers = {}
+        for link, regions in link_regions(header).items():
+            targets = {LINK_TARGETS[name]: getattr(header, f'{name}_size') for name, _, _ in regions}
+            receiver = LinkReceiver(link, targets, sequences[regions[0][0]])
+            for _, offset, file_size in regions:
+                f.seek(offset)
+                remaining = file_size
+                while remaining:
+                    data = f.read(min(read_size, remaining))
+                    if not data:
+                        raise LinkError(f"link {link}: file truncated at 0x{f.tell():X}")
+                    receiver.feed(data)
+                    remaining -= len(data)
+            receiver.finish()
+            receivers[link] = receiver
+    return receivers
+
+
+def link_benchmark(path: Path, rounds: int = LINK_BENCH_ROUNDS) -> Dict[str, float]:
+    """
+    Time the link stages over all link-framed data of a file.
+
+    Returns MB/s of payload for: 'read' (Pico A reading the pre-encoded
+    frames), 'encode' (framing at load time instead) and 'receive'
+    (validating receiver), best of rounds.
+    """
+    with open(path, 'rb') as f:
+        header = NGFCHeader.read(f)
+        regions = [region for regions in link_regions(header).values() for region in regions]
+        extents = read_section_extents(f, header)
+        payload_bytes = sum(getattr(header, f'{name}_size') for name, _, _ in regions)
+        sections = {name: b''.join(iter_section_range(f, extents[name], 0, getattr(header, f'{name}_size')))
+                    for name, _, _ in regions}
+
+        def read_frames():
+            for _, offset, file_size in regions:
+                f.seek(offset)
+                remaining = file_size
+                while remaining:
+                    remaining -= len(f.read(min(LINK_READ_SIZE, remaining)))
+
+        def encode_frames():
+            step = LINK_READ_SIZE // LINK_PAYLOAD_SIZE * LINK_PAYLOAD_SIZE
+            for name, data in sections.items():
+                for start in range(0, len(data), step):
+                    encode_link_frames(data[start:start + step], LINK_TARGETS[name], start, 0, False)
+
+        def best(stage) -> float:
+            times = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                stage()
+                times.append(time.perf_counter() - start)
+            return payload_bytes / max(min(times), 1e-9) / 1024 / 1024
+
+        return {
+            'read': best(read_frames),
+            'encode': best(encode_frames),
+            'receive': best(lambda: receive_links(path)),
+        }
+
+
+def link_command(paths: List[Path], bench: bool = False) -> bool:
+    """Validate the link streams of NGFC files, optionally benchmarking them."""
+    all_ok = True
+    for path in paths:
+        print(f"{path}:")
+        try:
+            receivers = receive_links(path)
+        except (LinkError, ValueError) as e:
+            print(f"  ✗ {e}")
+            all_ok = False
+            continue
+        for link, receiver in sorted(receivers.items()):
+            sizes = ', '.join(f"target {target}: {len(memory):,} bytes"
+                              for target, memory in sorted(receiver.memory.items()))
+            print(f"  ✓ Link {link}: {receiver.frames:,} frames ({sizes})")
+        if bench:
+            rates = link_benchmark(path)
+            print(f"  Pre-encoded read: {rates['read']:,.0f} MB/s")
+            print(f"  Load-time framing: {rates['encode']:,.0f} MB/s")
+            print(f"  Receiver validation: {rates['receive']:,.0f} MB/s")
+    return all_ok
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Menu preview assets for NGFC files (ngfc_preview.py)
+
+Builds the optional preview section the cart menu shows while a game is
+highlighted: either the game title rendered with the game's own S-ROM fix
+font, or a user-supplied image downscaled and quantized to 15 colours.
+
+The preview is stored in the Neo Geo's native fix layer format (8x8 4bpp
+tiles, transformed like the S-ROM section, plus one 16-colour palette of
+Neo Geo colour words) at a fixed, sector-aligned file offset, so the menu
+can fetch and display it with a single aligned read and no decoding.
+
+Preview section (PREVIEW_SIZE bytes at PREVIEW_OFFSET):
+  0x000: Magic "NGPV" (4 bytes)
+  0x004: Width in tiles (1 byte), height in tiles (1 byte)
+  0x006: Source (1 byte): 1 = fix-font title, 2 = image
+  0x007: Reserved (1 byte)
+  0x008: Title, ASCII, zero padded (24 bytes)
+  0x020: Palette, 16 Neo Geo colour words, little-endian (32 bytes)
+  0x040: Reserved (448 bytes)
+  0x200: Tiles, row-major, 32 bytes each (S-ROM transformed)
+
+License: GPL v3 (same as MiSTer)
+"""
+
+import struct
+import zlib
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from ngfc_converter import (
+    NGFCHeader,
+    FLAG_PREVIEW,
+    PREVIEW_OFFSET,
+    PREVIEW_SIZE,
+    transform_srom,
+    restore_srom,
+)
+from ngfc_tiles import write_png
+
+PREVIEW_MAGIC = b'NGPV'
+PREVIEW_TILES_OFFSET = 0x200
+PREVIEW_COLUMNS = 16   # 128 x 64 pixels
+PREVIEW_ROWS = 8
+FIX_TILE_SIZE = 32
+
+PREVIEW_SOURCE_TITLE = 1
+PREVIEW_SOURCE_IMAGE = 2
+
+# Fix tile byte columns: pixel pair n (pixels 2n, 2n+1) is stored at
+# FIX_COLUMN_OFFSET[n] + line, low nibble = left pixel
+FIX_COLUMN_OFFSET = (0x10, 0x18, 0x00, 0x08)
+
+
+def neogeo_color(r: int, g: int, b: int) -> int:
+    """Convert 8-bit RGB to a Neo Geo colour word (5 bits per channel, dark bit clear)."""
+    r, g, b = r >> 3, g >> 3, b >> 3
+    return (((r & 1) << 14) | ((g & 1) << 13) | ((b & 1) << 12) |
+            ((r >> 1) << 8) | ((g >> 1) << 4) | (b >> 1))
+
+
+def neogeo_rgb(color: int) -> Tuple[int, int, int]:
+    """Convert a Neo Geo colour word back to 8-bit RGB (dark bit ignored)."""
+    r = (((color >> 8) & 0xF) << 1) | ((color >> 14) & 1)
+    g = (((color >> 4) & 0xF) << 1) | ((color >> 13) & 1)
+    b = ((color & 0xF) << 1) | ((color >> 12) & 1)
+    return (r << 3) | (r >> 2), (g << 3) | (g >> 2), (b << 3) | (b >> 2)
+
+
+# Default title palette: 0 transparent, 1-15 grey ramp
+GREY_COLORS = [0] + [neogeo_color(i * 17, i * 17, i * 17) for i in range(1, 16)]
+
+
+def encode_fix_tile(pixels: bytes) -> bytearray:
+    """Encode 64 pixel indices (8x8, row-major) as a fix tile in original S-ROM format."""
+    tile = bytearray(FIX_TILE_SIZE)
+    for y in range(8):
+        for pair, offset in enumerate(FIX_COLUMN_OFFSET):
+            left = pixels[y * 8 + pair * 2] & 0xF
+            right = pixels[y * 8 + pair * 2 + 1] & 0xF
+            tile[offset + y] = left | (right << 4)
+    return tile
+
+
+def decode_fix_tile(tile: bytes) -> bytearray:
+    """Decode a fix tile in original S-ROM format to 64 pixel indices."""
+    pixels = bytearray(64)
+    for y in range(8):
+        for pair, offset in enumerate(FIX_COLUMN_OFFSET):
+            value = tile[offset + y]
+            pixels[y * 8 + pair * 2] = value & 0xF
+            pixels[y * 8 + pair * 2 + 1] = value >> 4
+    return pixels
+
+
+def layout_title(title: str, columns: int = PREVIEW_COLUMNS, rows: int = PREVIEW_ROWS) -> List[str]:
+    """Word-wrap and centre a title on the preview tile grid (one character per tile)."""
+    lines = []
+    for word in title.split():
+        word = word[:columns]
+        if lines and len(lines[-1]) + 1 + len(word) <= columns:
+            lines[-1] += ' ' + word
+        else:
+            lines.append(word)
+    lines = lines[:rows]
+    
+    top = (rows - len(lines)) // 2
+    grid = [' ' * columns] * rows
+    for i, line in enumerate(lines):
+        pad = (columns - len(line)) // 2
+        grid[top + i] = (' ' * pad + line).ljust(columns)
+    return grid
+
+
+def render_title(srom: bytes, title: str, font_base: int = 0) -> List[bytes]:
+    """
+    Render a title with the game's fix font.
+    
+    Most games keep an ASCII font in the S-ROM with tile number = character
+    code; font_base is added for games whose font starts elsewhere.
+    Returns the preview tiles (original S-ROM format), row-major.
+    """
+    tile_count = len(srom) // FIX_TILE_SIZE
+    blank = bytes(FIX_TILE_SIZE)
+    tiles = []
+    for line in layout_title(title.upper()):
+        for char in line:
+            code = ord(char) if 0x20 <= ord(char) < 0x7F else 0x20
+            index = font_base + code
+            if char == ' ' or index >= tile_count:
+                tiles.append(blank)
+            else:
+                tiles.append(bytes(srom[index * FIX_TILE_SIZE:(index + 1) * FIX_TILE_SIZE]))
+    return tiles
+
+
+def _unfilter_png(raw: bytes, width: int, height: int, bpp: int) -> bytearray:
+    """Undo PNG scanline filters (8-bit samples)."""
+    stride = width * bpp
+    out = bytearray(stride * height)
+    prev = bytearray(stride)
+    pos = 0
+    for y in range(height):
+        kind = raw[pos]
+        line = bytearray(raw[pos + 1:pos + 1 + stride])
+        pos += 1 + stride
+        if kind == 1:
+            for i in range(bpp, stride):
+                line[i] = (line[i] + line[i - bpp]) & 0xFF
+        elif kind == 2:
+            for i in range(stride):
+                line[i] = (line[i] + prev[i]) & 0xFF
+        elif kind == 3:
+            for i in range(stride):
+                left = line[i - bpp] if i >= bpp else 0
+                line[i] = (line[i] + ((left + prev[i]) >> 1)) & 0xFF
+        elif kind == 4:
+            for i in range(stride):
+                a = line[i - bpp] if i >= bpp else 0
+                b = prev[i]
+                c = prev[i - bpp] if i >= bpp else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                pred = a if pa <= pb and pa <= pc else (b if pb <= pc else c)
+                line[i] = (line[i] + pred) & 0xFF
+        elif kind != 0:
+            raise ValueError(f"Unknown PNG filter type {kind}")
+        out[y * stride:(y + 1) * stride] = line
+        prev = line
+    return out
+
+
+def load_image(path: Path) -> Tuple[int, int, bytes]:
+    """
+    Load an image as (width, height, RGB bytes).
+    
+    Supports binary PPM (P6, 8-bit) and non-interlaced 8-bit PNG
+    (grey, RGB, palette, grey+alpha, RGBA; alpha is dropped).
+    """
+    data = path.read_bytes()
+    
+    if data[:2] == b'P6':
+        fields = []
+        pos = 2
+        while len(fields) < 3:
+            while data[pos:pos + 1].isspace():
+                pos += 1
+            if data[pos:pos + 1] == b'#':
+                pos = data.index(b'\n', pos)
+                continue
+            end = pos
+            while not data[end:end + 1].isspace():
+                end += 1
+            fields.append(int(data[pos:end]))
+            pos = end
+        width, height, maxval = fields
+        if maxval != 255:
+            raise ValueError(f"Unsupported PPM max value {maxval}")
+        return width, height, data[pos + 1:pos + 1 + width * height * 3]
+    
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError(f"Unsupported image format: {path}")
+    
+    pos = 8
+    idat = []
+    palette = b''
+    while pos < len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b'IHDR':
+            width, height, depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', body)
+        elif kind == b'PLTE':
+            palette = body
+        elif kind == b'IDAT':
+            idat.append(body)
+        elif kind == b'IEND':
+            break
+    
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}.get(color_type)
+    if depth != 8 or interlace or channels is None:
+        raise ValueError(f"Unsupported PNG (bit depth {depth}, colour type {color_type}, interlace {interlace})")
+    
+    pixels = _unfilter_png(zlib.decompress(b''.join(idat)), width, height, channels)
+    if color_type == 3:
+        lut = [palette[i * 3:i * 3 + 3] for i in range(len(palette) // 3)]
+        rgb = b''.join(lut[p] for p in pixels)
+    elif color_type in (0, 4):
+        grey = pixels[0::channels]
+        rgb = bytearray(len(grey) * 3)
+        rgb[0::3] = rgb[1::3] = rgb[2::3] = grey
+    else:
+        rgb = bytearray(width * height * 3)
+        for c in range(3):
+            rgb[c::3] = pixels[c::channels]
+    return width, height, bytes(rgb)
+
+
+def quantize_image(width: int, height: int, rgb: bytes,
+                   out_width: int = PREVIEW_COLUMNS * 8,
+                   out_height: int = PREVIEW_ROWS * 8) -> Tuple[bytearray, List[int]]:
+    """
+    Downscale (box filter, aspect preserved, centred) and reduce an RGB
+    image to 15 colours.
+    
+    Returns (pixel indices, 16 Neo Geo colour words). Index 0 is the fix
+    layer's transparent colour and is used for the letterbox border.
+    """
+    scale = max(width / out_width, height / out_height)
+    fit_w = max(1, min(out_width, int(width / scale)))
+    fit_h = max(1, min(out_height, int(height / scale)))
+    left = (out_width - fit_w) // 2
+    top = (out_height - fit_h) // 2
+    
+    # Box-filter each output pixel, snapped to 12-bit colour for the histogram
+    samples = {}
+    colors = [None] * (out_width * out_height)
+    for oy in range(fit_h):
+        y0 = int(oy * scale)
+        y1 = max(y0 + 1, min(height, int((oy + 1) * scale)))
+        for ox in range(fit_w):
+            x0 = int(ox * scale)
+            x1 = max(x0 + 1, min(width, int((ox + 1) * scale)))
+            r = g = b = 0
+            for y in range(y0, y1):
+                row = y * width
+                for x in range(x0, x1):
+                    i = (row + x) * 3
+                    r += rgb[i]
+                    g += rgb[i + 1]
+                    b += rgb[i + 2]
+            n = (y1 - y0) * (x1 - x0)
+            color = (r // n, g // n, b // n)
+            key = (color[0] >> 4, color[1] >> 4, color[2] >> 4)
+            samples[key] = samples.get(key, 0) + 1
+            colors[(top + oy) * out_width + left + ox] = color
+    
+    # Popularity palette of the 15 most common 12-bit colours
+    popular = sorted(samples, key=lambda k: -samples[k])[:15]
+    palette_rgb = [(r * 17, g * 17, b * 17) for r, g, b in popular]
+    
+    pixels = bytearray(out_width * out_height)
+    cache = {}
+    for i, color in enumerate(colors):
+        if color is None:
+            continue
+        index = cache.get(color)
+        if index is None:
+            index = 1 + min(range(len(palette_rgb)), key=lambda p: sum(
+                (a - b) ** 2 for a, b in zip(color, palette_rgb[p])))
+            cache[color] = index
+        pixels[i] = index
+    
+    palette = [0] + [neogeo_color(*c) for c in palette_rgb]
+    palette += [0] * (16 - len(palette))
+    return pixels, palette
+
+
+def image_tiles(pixels: bytes, columns: int = PREVIEW_COLUMNS, rows: int = PREVIEW_ROWS) -> List[bytes]:
+    """Cut a (columns*8) x (rows*8) indexed image into fix tiles, row-major."""
+    width = columns * 8
+    tiles = []
+    for ty in range(rows):
+        for tx in range(columns):
+            tile = b''.join(bytes(pixels[(ty * 8 + y) * width + tx * 8:(ty * 8 + y) * width + tx * 8 + 8])
+                            for y in range(8))
+            tiles.append(encode_fix_tile(tile))
+    return tiles
+
+
+def pack_preview(tiles: List[bytes], palette: List[int], title: str, source: int) -> bytes:
+    """Pack the fixed-size preview section."""
+    head = struct.pack('<4sBBBx24s16H', PREVIEW_MAGIC, PREVIEW_COLUMNS, PREVIEW_ROWS, source,
+                       title.encode('ascii', 'replace')[:24], *palette)
+    section = bytearray(PREVIEW_SIZE)
+    section[:len(head)] = head
+    data = transform_srom(b''.join(tiles))
+    section[PREVIEW_TILES_OFFSET:PREVIEW_TILES_OFFSET + len(data)] = data
+    return bytes(section)
+
+
+def build_preview(title: str, srom: bytes = b'', image: Optional[Path] = None,
+                  font_base: int = 0) -> bytes:
+    """Build the preview section from an image, or else from the title and S-ROM font."""
+    if image is not None:
+        pixels, palette = quantize_image(*load_image(image))
+        return pack_preview(image_tiles(pixels), palette, title, PREVIEW_SOURCE_IMAGE)
+    return pack_preview(render_title(srom, title, font_base), GREY_COLORS, title, PREVIEW_SOURCE_TITLE)
+
+
+def unpack_preview(section: bytes) -> Tuple[str, int, bytearray, List[int], int, int]:
+    """
+    Decode a preview section to (title, source, pixel indices, palette,
+    width, height) with pixels row-major.
+    """
+    magic, columns, rows, source, title = struct.unpack('<4sBBBx24s', section[:32])
+    if magic != PREVIEW_MAGIC:
+        raise ValueError(f"Invalid preview magic: {magic}")
+    palette = list(struct.unpack('<16H', section[32:64]))
+    
+    count = columns * rows
+    tiles = restore_srom(section[PREVIEW_TILES_OFFSET:PREVIEW_TILES_OFFSET + count * FIX_TILE_SIZE])
+    width = columns * 8
+    pixels = bytearray(width * rows * 8)
+    for t in range(count):
+        tile = decode_fix_tile(tiles[t * FIX_TILE_SIZE:(t + 1) * FIX_TILE_SIZE])
+        tx, ty = t % columns, t // columns
+        for y in range(8):
+            start = (ty * 8 + y) * width + tx * 8
+            pixels[start:start + 8] = tile[y * 8:y * 8 + 8]
+    
+    return title.rstrip(b'\0').decode('ascii', 'replace'), source, pixels, palette, width, rows * 8
+
+
+def export_preview(path: Path, output: Path) -> bool:
+    """Write the preview section of an NGFC file as a PNG."""
+    with open(path, 'rb') as f:
+        header = NGFCHeader.read(f)
+        if not header.flags & FLAG_PREVIEW:
+            print(f"Error: {path} has no preview section")
+            return False
+        f.seek(PREVIEW_OFFSET)
+        section = f.read(PREVIEW_SIZE)
+    
+    title, source, pixels, palette, width, height = unpack_preview(section)
+    rgb = b''.join(bytes(neogeo_rgb(c)) for c in palette)
+    write_png(output, width, height, pixels, rgb)
+    kind = {PREVIEW_SOURCE_TITLE: 'title', PREVIEW_SOURCE_IMAGE: 'image'}.get(source, 'unknown')
+    print(f"Preview '{title}' ({kind}, {width}x{height}) written to {output}")
+    return True
@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+"""
+NGFC conversion service (ngfc_server.py)
+
+An asyncio HTTP service that converts uploaded ROM sets (zip or .neo) to
+NGFC and streams the result back while it is being written.
+
+Conversions run in a process pool. Jobs start only when a worker is free
+and their estimated memory fits in the memory budget; up to max_queued
+further jobs wait, anything beyond that is refused with 503 so clients
+back off instead of piling up uploads. The limits are checked against
+Content-Length before the body is read, and at most max_uploads bodies
+are received at once.
+
+The worker writes the output file front to back (NGFCWriter computes the
+header CRC first), and the request handler tails that file into a chunked
+HTTP response, so the first bytes go out long before the conversion ends.
+A client disconnect or DELETE cancels the job: queued jobs are dropped,
+running ones stop at their next chunk.
+
+Endpoints:
+  POST   /convert?name=mslug.zip[&ngh=201][&boot_first=1][&bank_tables=1]   body: ROM set
+         -> 200 chunked .ngfc (X-NGFC-Job: job id)
+  GET    /status        -> JSON: workers, memory budget, queued/running jobs
+  DELETE /jobs/<id>     -> cancel a job
+
+License: GPL v3 (same as MiSTer)
+"""
+
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from ngfc_converter import NGFCWriter, STREAM_CHUNK_SIZE, load_romset, resolve_ngh
+
+
+DEFAULT_PORT = 8086
+DEFAULT_MAX_QUEUED = 8
+DEFAULT_MAX_UPLOADS = 4
+MAX_UPLOAD_SIZE = 256 * 1024 * 1024   # Largest official sets are ~110 MB zipped
+WORKER_BASE_MEMORY = 32 * 1024 * 1024  # Interpreter + modules per worker process
+POLL_INTERVAL = 0.02                   # Output tail polling (seconds)
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+HTTP_REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    411: 'Length Required', 413: 'Payload Too Large', 422: 'Unprocessable Entity',
+    503: 'Service Unavailable',
+}
+
+
+class ServiceBusy(Exception):
+    """Too many jobs queued; retry later."""
+
+
+class JobTooLarge(Exception):
+    """Job needs more memory than the whole budget."""
+
+
+class ConversionCancelled(Exception):
+    """Raised inside a worker when its job is cancelled."""
+
+
+def default_memory_budget() -> int:
+    """Half of physical memory (2 GB when unknown)."""
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2
+    except (ValueError, OSError, AttributeError):
+        return 2 * 1024 * 1024 * 1024
+
+
+def estimate_memory(path: Path) -> int:
+    """
+    Peak worker memory for converting a ROM set.
+
+    Source ROMs are held uncompressed (sizes from the zip central
+    directory), plus the transformed S-ROM (at most 10% of a set) and a
+    few output chunks in flight.
+    """
+    if path.suffix.lower() == '.zip':
+        with zipfile.ZipFile(path) as zf:
+            data_size = sum(info.file_size for info in zf.infolist())
+    else:
+        data_size = path.stat().st_size
+    return _worker_memory(data_size)
+
+
+def estimate_upload_memory(length: int) -> int:
+    """Lower bound of estimate_memory() for an upload of length bytes (a zip never expands)."""
+    return _worker_memory(length)
+
+
+def _worker_memory(data_size: int) -> int:
+    return WORKER_BASE_MEMORY + data_size * 11 // 10 + 3 * STREAM_CHUNK_SIZE
+
+
+def _cancel_check(cancel_path: str):
+    """Progress callback for NGFCWriter.write that raises ConversionCancelled once cancel_path exists."""
+    def progress(written):
+        if os.path.exists(cancel_path):
+            raise ConversionCancelled()
+    return progress
+
+
+def _run_conversion(input_path: str, output_path: str, cancel_path: str, options: dict) -> dict:
+    """Worker process entry point: convert input_path, stop if cancel_path appears."""
+    progress = _cancel_check(cancel_path)
+    progress(0)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        roms = load_romset(Path(input_path))
+        game = roms.get('game')
+        game_ngh, flags = resolve_ngh(roms, Path(input_path))
+        ngh_number = options.get('ngh_number') or game_ngh
+        writer = NGFCWriter(roms, ngh_number, flags, boot_order=options.get('boot_order', False),
+                            bank_tables=options.get('bank_tables', False))
+        with open(output_path, 'wb') as f:
+            size = writer.write(f, progress)
+
+    return {'game': game.name if game else None, 'ngh_number': ngh_number, 'size': size}
+
+
+class ConversionJob:
+    """One conversion: its files, state and output stream."""
+
+    def __init__(self, job_id: int, workdir: Path, input_path: Path, memory: int, options: dict):
+        self.id = job_id
+        self.workdir = workdir
+        self.input_path = input_path
+        self.output_path = workdir / (input_path.stem + '.ngfc')
+        self.cancel_path = workdir / 'cancel'
+        self.memory = memory
+        self.options = options
+        self.state = 'queued'   # queued, running, done, failed, cancelled
+        self.error = None       # type: Optional[str]
+        self.result = None      # type: Optional[dict]
+        self.task = None        # type: Optional[asyncio.Task]
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ('done', 'failed', 'cancelled')
+
+    def cancel(self):
+        """Cancel the job (no-op once finished)."""
+        if self.finished:
+            return
+        if self.state == 'running':
+            self.cancel_path.touch()
+        else:
+            self.state = 'cancelled'
+            if self.task:
+                self.task.cancel()
+
+    async def wait_output(self):
+        """Wait until the output file has data or the job has finished."""
+        while not self.finished:
+            if self.output_path.exists() and self.output_path.stat().st_size:
+                return
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def stream(self, chunk_size: int = STREAM_CHUNK_SIZE):
+        """
+        Yield the output file as it is written.
+
+        Raises RuntimeError if the job fails or is cancelled, after
+        yielding whatever had been written.
+        """
+        await self.wait_output()
+        with contextlib.ExitStack() as stack:
+            f = None
+            while True:
+                finished = self.finished
+                if f is None and self.output_path.exists():
+                    f = stack.enter_context(open(self.output_path, 'rb'))
+                while f:
+                    data = f.read(chunk_size)
+                    if not data:
+                        break
+                    yield data
+                if finished:
+                    break
+                await asyncio.sleep(POLL_INTERVAL)
+        if self.state != 'done':
+            raise RuntimeError(self.error or self.state)
+
+    def info(self) -> dict:
+        written = self.output_path.stat().st_size if self.output_path.exists() else 0
+        return {'id': self.id, 'name': self.input_path.name, 'state': self.state,
+                'memory': self.memory, 'written': written, 'error': self.error}
+
+
+class ConversionService:
+    """
+    Runs conversions in a process pool under CPU (worker) and memory budgets.
+    """
+
+    def __init__(self, workdir: Optional[Path] = None, max_workers: Optional[int] = None,
+                 memory_budget: Optional[int] = None, max_queued: int = DEFAULT_MAX_QUEUED,
+                 max_uploads: int = DEFAULT_MAX_UPLOADS):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.memory_budget = memory_budget or default_memory_budget()
+        self.max_queued = max_queued
+        self.max_uploads = max_uploads
+        self.uploading = 0  # Uploads admitted by begin_upload and not yet submitted
+        self._tempdir = None
+        if workdir is None:
+            self._tempdir = tempfile.TemporaryDirectory(prefix='ngfc-')
+            workdir = Path(self._tempdir.name)
+        self.workdir = workdir
+        self.executor = ProcessPoolExecutor(self.max_workers)
+        self.jobs = {}  # type: Dict[int, ConversionJob]
+        self.memory_used = 0
+        self.running = 0
+        self._ids = itertools.count(1)
+        self._slots = asyncio.Condition()
+
+    def new_job_dir(self) -> Path:
+        """Private directory for a job's upload, output and cancel files."""
+        return Path(tempfile.mkdtemp(dir=self.workdir))
+
+    def queued(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.state == 'queued')
+
+    def begin_upload(self, length: int):
+        """
+        Admit an upload of length bytes before its body is read.
+
+        Every admitted upload will need a free worker or a queue slot, so
+        uploads in progress count against max_queued. Raises ServiceBusy
+        or JobTooLarge like submit(); call end_upload() once the upload
+        is submitted or abandoned.
+        """
+        memory = estimate_upload_memory(length)
+        if memory > self.memory_budget:
+            raise JobTooLarge(f"needs at least {memory // 2**20} MB, budget is {self.memory_budget // 2**20} MB")
+        if self.uploading >= self.max_uploads:
+            raise ServiceBusy(f"{self.max_uploads} uploads already in progress")
+        if self.queued() + self.uploading >= self.max_queued + max(0, self.max_workers - self.running):
+            raise ServiceBusy(f"{self.max_queued} jobs already queued")
+        self.uploading += 1
+
+    def end_upload(self):
+        self.uploading -= 1
+
+    def submit(self, input_path: Path, ngh_number: int = 0, boot_order: bool = False,
+               bank_tables: bool = False) -> ConversionJob:
+        """
+        Queue a conversion of input_path (inside a directory from new_job_dir).
+
+        Raises ServiceBusy when the queue is full and JobTooLarge when the
+        job could never fit in the memory budget; the caller keeps the file.
+        """
+        memory = estimate_memory(input_path)
+        if memory > self.memory_budget:
+            raise JobTooLarge(f"needs {memory // 2**20} MB, budget is {self.memory_budget // 2**20} MB")
+
+        options = {'ngh_number': ngh_number, 'boot_order': boot_order, 'bank_tables': bank_tables}
+        job = ConversionJob(next(self._ids), input_path.parent, input_path, memory, options)
+        if not self.queued() and self._fits(job):
+            self._reserve(job)
+        elif self.queued() >= self.max_queued:
+            raise ServiceBusy(f"{self.max_queued} jobs already queued")
+        self.jobs[job.id] = job
+        job.task = asyncio.ensure_future(self._run(job))
+        job.task.add_done_callback(self._job_done)
+        return job
+
+    def _fits(self, job: ConversionJob) -> bool:
+        return self.running < self.max_workers and self.memory_used + job.memory <= self.memory_budget
+
+    def _next_queued(self) -> Optional[ConversionJob]:
+        return next((job for job in self.jobs.values() if job.state == 'queued'), None)
+
+    def _reserve(self, job: ConversionJob):
+        self.running += 1
+        self.memory_used += job.memory
+        job.state = 'running'
+
+    async def _run(self, job: ConversionJob):
+        if job.state == 'queued':
+            # First in, first out: wait for a worker and enough memory
+            try:
+                async with self._slots:
+                    await self._slots.wait_for(lambda: self._next_queued() is job and self._fits(job))
+                    self._reserve(job)
+            except asyncio.CancelledError:
+                job.state = 'cancelled'
+                return
+
+        loop = asyncio.get_running_loop()
+        try:
+            job.result = await loop.run_in_executor(
+                self.executor, _run_conversion, str(job.input_path), str(job.output_path),
+                str(job.cancel_path), job.options)
+            job.state = 'done'
+        except ConversionCancelled:
+            job.state = 'cancelled'
+        except Exception as e:
+            job.state = 'failed'
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.running -= 1
+            self.memory_used -= job.memory
+
+    def _job_done(self, task: asyncio.Task):
+        # A finished or cancelled job may let the next queued one start
+        asyncio.ensure_future(self._wake())
+
+    async def _wake(self):
+        async with self._slots:
+            self._slots.notify_all()
+
+    def remove(self, job: ConversionJob):
+        """Forget a finished job and delete its files."""
+        self.jobs.pop(job.id, None)
+        shutil.rmtree(job.workdir, ignore_errors=True)
+
+    def status(self) -> dict:
+        return {
+            'workers': self.max_workers,
+            'running': self.running,
+            'queued': self.queued(),
+            'max_queued': self.max_queued,
+            'uploading': self.uploading,
+            'memory_budget': self.memory_budget,
+            'memory_used': self.memory_used,
+            'jobs': [job.info() for job in self.jobs.values()],
+        }
+
+    async def close(self):
+        for job in list(self.jobs.values()):
+            job.cancel()
+        tasks = [job.task for job in self.jobs.values() if job.task]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.executor.shutdown()
+        if self._tempdir:
+            self._tempdir.cleanup()
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Read an HTTP/1.1 request line and headers: (method, target, headers)."""
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise ValueError("malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return parts[0], parts[1], headers
+
+
+def format_response(status: int, headers: Optional[dict] = None) -> bytes:
+    lines = [f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+class ConversionServer:
+    """HTTP front end for a ConversionService (one request per connection)."""
+
+    def __init__(self, service: ConversionService, max_upload: int = MAX_UPLOAD_SIZE):
+        self.service = service
+        self.max_upload = max_upload
+
+    async def send(self, writer, status: int, body, headers: Optional[dict] = None):
+        if not isinstance(body, bytes):
+            body = (json.dumps(body, indent=1) + '\n').encode()
+        headers = dict(headers or {})
+        headers.setdefault('Content-Type', 'application/json')
+        headers.update({'Content-Length': len(body), 'Connection': 'close'})
+        writer.write(format_response(status, headers) + body)
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await read_request(reader)
+            if request:
+                await self.dispatch(reader, writer, *request)
+        except ValueError as e:
+            await self.send(writer, 400, {'error': str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def dispatch(self, reader, writer, method: str, target: str, headers: dict):
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == '/status':
+            if method != 'GET':
+                return await self.send(writer, 405, {'error': 'use GET'})
+            return await self.send(writer, 200, self.service.status())
+
+        if url.path.startswith('/jobs/'):
+            if method != 'DELETE':
+                return await self.send(writer, 405, {'error': 'use DELETE'})
+            job_id = url.path[len('/jobs/'):]
+            job = self.service.jobs.get(int(job_id)) if job_id.isdigit() else None
+            if not job:
+                return await self.send(writer, 404, {'error': 'no such job'})
+            job.cancel()
+            return await self.send(writer, 200, job.info())
+
+        if url.path == '/convert':
+            if method != 'POST':
+                return await self.send(writer, 405, {'error': 'use POST'})
+            return await self.convert(reader, writer, headers, query)
+
+        await self.send(writer, 404, {'error': 'not found'})
+
+    async def convert(self, reader, writer, headers: dict, query: dict):
+        if 'content-length' not in headers:
+            return await self.send(writer, 411, {'error': 'Content-Length required'})
+        length = int(headers['content-length'])
+        if length > self.max_upload:
+            return await self.send(writer, 413, {'error': f'upload larger than {self.max_upload} bytes'})
+
+        # Upload name drives format detection and game identification
+        name = Path(query.get('name', 'romset.zip')).name
+        if Path(name).suffix.lower() not in ('.zip', '.neo'):
+            return await self.send(writer, 400, {'error': 'name must end in .zip or .neo'})
+        try:
+            ngh_number = int(query.get('ngh', 0))
+        except ValueError:
+            return await self.send(writer, 400, {'error': 'ngh must be a number'})
+        boot_order = query.get('boot_first', '0') not in ('0', 'false', '')
+        bank_tables = query.get('bank_tables', '0') not in ('0', 'false', '')
+
+        # Refuse before reading the body when the job could not be taken
+        try:
+            self.service.begin_upload(length)
+        except ServiceBusy as e:
+            return await self.send(writer, 503, {'error': str(e)}, {'Retry-After': 5})
+        except JobTooLarge as e:
+            return await self.send(writer, 413, {'error': str(e)})
+
+        job_dir = self.service.new_job_dir()
+        job = None
+        try:
+            input_path = job_dir / name
+            try:
+                with open(input_path, 'wb') as f:
+                    remaining = length
+                    while remaining:
+                        data = await reader.readexactly(min(UPLOAD_CHUNK_SIZE, remaining))
+                        f.write(data)
+                        remaining -= len(data)
+                job = self.service.submit(input_path, ngh_number, boot_order, bank_tables)
+            except ServiceBusy as e:
+                return await self.send(writer, 503, {'error': str(e)}, {'Retry-After': 5})
+            except JobTooLarge as e:
+                return await self.send(writer, 413, {'error': str(e)})
+            except zipfile.BadZipFile as e:
+                return await self.send(writer, 422, {'error': f'bad zip: {e}'})
+            finally:
+                self.service.end_upload()
+
+            # The client sends nothing more; EOF means it has gone away
+            watcher = asyncio.ensure_future(reader.read(1))
+            watcher.add_done_callback(lambda _: job.cancel())
+            try:
+                await self.stream_job(writer, job)
+            finally:
+                watcher.cancel()
+                job.cancel()
+                await asyncio.gather(job.task, return_exceptions=True)
+        finally:
+            if job:
+                self.service.remove(job)
+            else:
+                shutil.rmtree(job_dir, ignore_errors=True)
+
+    async def stream_job(self, writer, job: ConversionJob):
+        """Send the job output as a chunked response; errors before any output get a status."""
+        await job.wait_output()
+        if job.finished and job.state != 'done':
+            return await self.send(writer, 422, {'error': job.error or job.state})
+
+        writer.write(format_response(200, {
+            'Content-Type': 'application/octet-stream',
+            'Content-Disposition': f'attachment; filename="{job.output_path.name}"',
+            'Transfer-Encoding': 'chunked',
+            'X-NGFC-Job': job.id,
+            'Connection': 'close',
+        }))
+        try:
+            async for data in job.stream():
+                writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+                await writer.drain()
+        except RuntimeError:
+            # Failed mid-stream: close without the final chunk so the
+            # client sees a truncated response rather than a short file
+            return
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+
+async def serve(host: str = '127.0.0.1', port: int = DEFAULT_PORT, **options):
+    """Run the conversion service until cancelled."""
+    max_upload = options.pop('max_upload', MAX_UPLOAD_SIZE)
+    service = ConversionService(**options)
+    server = ConversionServer(service, max_upload)
+    tcp = await asyncio.start_server(server.handle, host, port)
+    print(f"Serving on http://{host}:{port} ({service.max_workers} workers, "
+          f"{service.memory_budget // 2**20} MB memory budget)")
+    try:
+        async with tcp:
+            await tcp.serve_forever()
+    finally:
+        await service.close()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Neo Geo C-ROM sprite tile decoder (ngfc_tiles.py)
+
+Decodes planar 4bpp sprite data into chunky 16x16 pixel indices, from a
+MAME ROM set (C1/C2 pairs) or from the transformed C-ROM section of an
+.ngfc file, and exports paged PNG atlases (optionally diffing two sources).
+
+Sprite tile format (MAME neosprite_optimized_device::optimize_sprite_data):
+  Each tile is 64 bytes in each chip of a pair. C1 holds bitplanes 0/1,
+  C2 bitplanes 2/3, as (plane 0, plane 1) byte pairs per 8-pixel line.
+  Bytes 0x00-0x1F of a tile are the right half (lines 0-15), bytes
+  0x20-0x3F the left half. Bit x of a plane byte is pixel x of the line.
+
+Decoding works on whole tile ranges at once: bytes.translate() spreads one
+pixel column of every line into its bit position, and the four planes are
+OR-ed together as big integers, so there are no per-pixel Python loops.
+
+License: GPL v3 (same as MiSTer)
+"""
+
+import struct
+import zipfile
+import zlib
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from ngfc_converter import (
+    NGFCHeader,
+    permute_blocks,
+    read_section_extents,
+    iter_section_range,
+    split_crom_pair,
+    get_gamedb,
+    plan_from_game,
+    plan_from_names,
+    zip_members,
+    dir_members,
+)
+
+TILE_SIZE = 16
+TILE_PIXELS = TILE_SIZE * TILE_SIZE
+TILE_CHIP_BYTES = 64          # Bytes per tile in each chip of a pair
+DECODE_BATCH_TILES = 16384    # Tiles decoded per batch (4 MB of pixels)
+
+# PLANE_SPREAD[plane][x]: translate table mapping a plane byte to bit
+# `plane` of pixel x
+PLANE_SPREAD = [
+    [bytes(((b >> x) & 1) << plane for b in range(256)) for x in range(8)]
+    for plane in range(4)
+]
+
+# Half-line order: chip data is (tile, half, line) with the right half
+# first; pixels are (tile, line, half) with the left half first
+HALF_LINE_ORDER = [(1 - (i & 1)) * 16 + (i >> 1) for i in range(32)]
+
+# Atlas palette: 0-15 grey ramp, 16-31 the same indices in red (diff)
+GREY_PALETTE = bytes(v for i in range(16) for v in (i * 17,) * 3)
+DIFF_PALETTE = GREY_PALETTE + bytes(v for i in range(16) for v in (128 + i * 8, i * 4, i * 4))
+
+
+def decode_tiles(c1: bytes, c2: bytes) -> bytearray:
+    """
+    Decode C1/C2 tile data into chunky pixels.
+    
+    c1 and c2 hold the same tiles (64 bytes each per tile). Returns 256
+    bytes per tile: 16 lines of 16 pixel indices (0-15), left to right.
+    """
+    if len(c1) != len(c2) or len(c1) % TILE_CHIP_BYTES:
+        raise ValueError(f"C1/C2 data must be equal multiples of {TILE_CHIP_BYTES} bytes")
+    
+    planes = (c1[0::2], c1[1::2], c2[0::2], c2[1::2])
+    lines = len(planes[0])   # 8-pixel half lines
+    out = bytearray(lines * 8)
+    if not lines:
+        return out
+    
+    for x in range(8):
+        column = 0
+        for plane, data in enumerate(planes):
+            column |= int.from_bytes(data.translate(PLANE_SPREAD[plane][x]), 'little')
+        column = column.to_bytes(lines, 'little')
+        out[x::8] = permute_blocks(column, HALF_LINE_ORDER)
+    
+    return out
+
+
+
+class TileSource:
+    """
+    Random access to sprite tiles, as (C1, C2) chip bytes.
+    
+    Tiles are numbered across all pairs (C1/C2 first, then C3/C4...), the
+    way the hardware addresses them. A source is either an .ngfc file (its
+    C section is read on demand and inverted with split_crom_pair) or a MAME
+    ROM set directory/zip (the C-ROM files are loaded into memory).
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+        self._extents = []
+        self._pairs = []   # (first tile, tile count, C section offset or (c1, c2) data)
+        
+        if path.suffix.lower() == '.ngfc':
+            self._file = open(path, 'rb')
+            header = NGFCHeader.read(self._file)
+            self._extents = read_section_extents(self._file, header)['c']
+            offset = 0
+            for chip_size in header.c_pair_sizes():
+                self._add_pair(chip_size, offset)
+                offset += chip_size * 2
+        else:
+            for c1, c2 in _load_crom_pairs(path):
+                size = max(len(c1), len(c2))
+                size -= size % TILE_CHIP_BYTES
+                self._add_pair(size, (c1[:size].ljust(size, b'\0'), c2[:size].ljust(size, b'\0')))
+    
+    def _add_pair(self, chip_size: int, data):
+        first = self.tile_count
+        self._pairs.append((first, chip_size // TILE_CHIP_BYTES, data))
+    
+    @property
+    def tile_count(self) -> int:
+        if not self._pairs:
+            return 0
+        first, count, _ = self._pairs[-1]
+        return first + count
+    
+    def read(self, start: int, count: int) -> Tuple[bytes, bytes]:
+        """Chip data (C1, C2) for tiles start .. start + count - 1."""
+        if start < 0 or start + count > self.tile_count:
+            raise ValueError(f"Tiles {start}-{start + count - 1} out of range (0-{self.tile_count - 1})")
+        
+        c1_parts, c2_parts = [], []
+        for first, tiles, data in self._pairs:
+            lo = max(start, first)
+            hi = min(start + count, first + tiles)
+            if lo >= hi:
+                continue
+            begin = (lo - first) * TILE_CHIP_BYTES
+            end = (hi - first) * TILE_CHIP_BYTES
+            if isinstance(data, int):
+                # Each tile is 128 transformed bytes (32-byte aligned)
+                length = (end - begin) * 2
+                c1, c2 = split_crom_pair(b''.join(
+                    iter_section_range(self._file, self._extents, data + begin * 2, length, length)))
+            else:
+                c1, c2 = data[0][begin:end], data[1][begin:end]
+            c1_parts.append(c1)
+            c2_parts.append(c2)
+        
+        return b''.join(c1_parts), b''.join(c2_parts)
+    
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _load_crom_pairs(path: Path) -> List[Tuple[bytes, bytes]]:
+    """Load only the C-ROM pairs of a MAME ROM set (directory or zip)."""
+    if path.suffix.lower() == '.zip':
+        with zipfile.ZipFile(path, 'r') as zf:
+            match = get_gamedb().identify(zip_members(zf), hint=path.stem)
+            plan = plan_from_game(match[1]) if match else plan_from_names(zf.namelist())
+            return [(zf.read(c1), zf.read(c2)) for c1, c2 in plan['c_pairs']]
+    
+    match = get_gamedb().identify(dir_members(path), hint=path.name)
+    plan = plan_from_game(match[1]) if match else plan_from_names(
+        [f.name for f in path.iterdir() if f.is_file()])
+    return [((path / c1).read_bytes(), (path / c2).read_bytes()) for c1, c2 in plan['c_pairs']]
+
+
+def atlas_order(columns: int) -> List[int]:
+    """
+    Permutation from tile-major pixels to image rows for one band of
+    `columns` tiles (columns * 256 bytes).
+    """
+    order = []
+    for y in range(TILE_SIZE):
+        for tx in range(columns):
+            base = tx * TILE_PIXELS + y * TILE_SIZE
+            order.extend(range(base, base + TILE_SIZE))
+    return order
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def write_png(path: Path, width: int, height: int, pixels: bytes, palette: bytes):
+    """Write 8-bit indexed pixels (row-major) as a paletted PNG."""
+    compressor = zlib.compressobj(1)
+    body = []
+    view = memoryview(pixels)
+    for row in range(height):
+        body.append(compressor.compress(b'\0'))
+        body.append(compressor.compress(view[row * width:(row + 1) * width]))
+    body.append(compressor.flush())
+    
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)))
+        f.write(_png_chunk(b'PLTE', palette))
+        f.write(_png_chunk(b'IDAT', b''.join(body)))
+        f.write(_png_chunk(b'IEND', b''))
+
+
+def mark_differences(a: bytes, b: bytes) -> bytearray:
+    """Pixels of a, with pixels that differ in b replaced by 16 + b's index."""
+    n = len(a)
+    ia = int.from_bytes(a, 'little')
+    ib = int.from_bytes(b, 'little')
+    # 0xFF for every differing pixel, 0x00 elsewhere
+    mask = int.from_bytes((ia ^ ib).to_bytes(n, 'little').translate(_NONZERO), 'little')
+    marked = (ia & ~mask) | ((ib | _repeat_byte(0x10, n)) & mask)
+    return bytearray(marked.to_bytes(n, 'little'))
+
+
+_NONZERO = bytes([0] + [0xFF] * 255)
+
+
+def _repeat_byte(value: int, n: int) -> int:
+    return int.from_bytes(bytes([value]) * n, 'little')
+
+
+def export_atlas(source: TileSource, output: Path, start: int = 0, count: Optional[int] = None,
+                 columns: int = 32, rows: int = 32,
+                 other: Optional[TileSource] = None) -> Tuple[List[Path], List[int]]:
+    """
+    Export tiles as paged PNG atlases of columns x rows tiles.
+    
+    Pages are written as <output stem>_000.png, _001.png... (or just
+    output when everything fits on one page). With `other`, pixels that
+    differ between the two sources are drawn in red.
+    
+    Returns (written pages, indices of tiles that differ from `other`).
+    Raises ValueError for a start outside the tiles or a count, columns or
+    rows below 1.
+    """
+    if columns < 1 or rows < 1:
+        raise ValueError(f"Atlas pages need at least one column and row, got {columns}x{rows}")
+    tile_count = source.tile_count if other is None else min(source.tile_count, other.tile_count)
+    if not 0 <= start < tile_count:
+        raise ValueError(f"Start tile {start} out of range (0-{tile_count - 1})" if tile_count
+                         else "No tiles to export")
+    if count is not None and count < 1:
+        raise ValueError(f"Tile count must be at least 1, got {count}")
+    count = tile_count - start if count is None else count
+    if other is not None:
+        count = min(count, tile_count - start)
+    
+    output.parent.mkdir(parents=True, exist_ok=True)
+    per_page = columns * rows
+    page_count = max(1, (count + per_page - 1) // per_page)
+    band = columns * TILE_PIXELS
+    order = atlas_order(columns)
+    batch_tiles = max(1, DECODE_BATCH_TILES // per_page) * per_page
+    palette = DIFF_PALETTE if other is not None else GREY_PALETTE
+    pages = []
+    changed = []
+    
+    for batch_start in range(start, start + count, batch_tiles):
+        n = min(batch_tiles, start + count - batch_start)
+        c1, c2 = source.read(batch_start, n)
+        pixels = decode_tiles(c1, c2)
+        
+        if other is not None:
+            o1, o2 = other.read(batch_start, n)
+            for t in range(0, len(c1), TILE_CHIP_BYTES):
+                if c1[t:t + TILE_CHIP_BYTES] != o1[t:t + TILE_CHIP_BYTES] or \
+                        c2[t:t + TILE_CHIP_BYTES] != o2[t:t + TILE_CHIP_BYTES]:
+                    changed.append(batch_start + t // TILE_CHIP_BYTES)
+            if c1 != o1 or c2 != o2:
+                pixels = mark_differences(pixels, decode_tiles(o1, o2))
+        
+        # Lay out whole bands of tiles as image rows, padding the last band
+        pixels += bytes(-len(pixels) % band)
+        image = permute_blocks(pixels, order)
+        
+        for offset in range(0, max(len(image), 1), per_page * TILE_PIXELS):
+            page = len(pages)
+            page_image = image[offset:offset + per_page * TILE_PIXELS]
+            if page_count == 1:
+                path = output
+            else:
+                path = output.with_name(f"{output.stem}_{page:03d}{output.suffix or '.png'}")
+            write_png(path, columns * TILE_SIZE, max(len(page_image) // band, 1) * TILE_SIZE,
+                      page_image or bytes(band), palette)
+            pages.append(path)
+    
+    return pages, changed
+
+
+def tiles_command(source: Path, output: Path, start: int = 0, count: Optional[int] = None,
+                  columns: int = 32, rows: int = 32, diff: Optional[Path] = None) -> bool:
+    """Export a sprite atlas (and report differing tiles when diffing)."""
+    with TileSource(source) as src:
+        other = TileSource(diff) if diff else None
+        try:
+            print(f"Decoding {source}: {src.tile_count:,} tiles")
+            if other is not None:
+                print(f"Comparing with {diff}: {other.tile_count:,} tiles")
+                if other.tile_count != src.tile_count:
+                    print("  Warning: tile counts differ, comparing the common range")
+            pages, changed = export_atlas(src, output, start, count, columns, rows, other)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return False
+        finally:
+            if other is not None:
+                other.close()
+    
+    print(f"Wrote {len(pages)} page(s): {pages[0]}" + (f" .. {pages[-1]}" if len(pages) > 1 else ""))
+    if diff:
+        if changed:
+            print(f"  ✗ {len(changed):,} tiles differ (first: {', '.join(str(t) for t in changed[:16])})")
+        else:
+            print("  ✓ All tiles identical")
+    return not changed
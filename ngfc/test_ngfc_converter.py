@@ -7,6 +7,10 @@ from MiSTer's neogeo_loader.cpp
 """
 
 import sys
+import tempfile
+import time
+import zipfile
+import zlib
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
@@ -16,10 +20,82 @@ from ngfc_converter import (
     interleave_crom_pair,
     transform_srom,
     NGFCHeader,
-    NGFC_HEADER_SIZE
+    NGFC_HEADER_SIZE,
+    GameDB,
+    GAMEDB_FILE_HEADER,
+    build_gamedb,
+    find_game_for_header,
+    get_ngh_map,
+    prom_ngh_number,
+    identify_romset,
+    load_mame_zip,
+    transform_crom_pair,
+    split_crom_pair,
+    restore_crom_burst_order,
+    deinterleave_crom_pair,
+    restore_srom,
+    convert_to_ngfc,
+    extract_ngfc,
+    verify_roundtrip,
+    plan_boot_layout,
+    read_chunk_map,
+    FLAG_BOOT_ORDER,
+    SECTOR_SIZE,
+    BANK_UNMAPPED,
+    build_bank_tables,
+    pack_bank_tables,
+    unpack_bank_tables,
+    validate_bank_tables,
+    read_bank_tables,
+    FLAG_BANK_TABLES,
+    FLAG_PAIR_TABLE,
+    ADPCMB_INDEX,
+    V_PAGE_COUNT,
+    NGFCWriter,
+    load_mame_romset,
 )
 
 
+def make_test_romset(tmp: Path):
+    """
+    Write a small ROM set zip with non-standard file names, and a game
+    database describing it. Returns (zip path, database, file contents).
+    """
+    files = {
+        'prog_a.bin': bytes([0x10 + (i & 0x0F) for i in range(256)]),
+        'prog_b.bin': bytes([0x20 + (i & 0x0F) for i in range(256)]),
+        'fix.bin': bytes([0x30 + (i & 0x0F) for i in range(64)]),
+        'z80.bin': bytes([0x40 + (i & 0x0F) for i in range(64)]),
+        'pcm.bin': bytes([0x50 + (i & 0x0F) for i in range(128)]),
+        'gfx_a.bin': bytes([(i * 3) & 0xFF for i in range(128)]),
+        'gfx_b.bin': bytes([(i * 5) & 0xFF for i in range(128)]),
+        'gfx_c.bin': bytes([(i * 7) & 0xFF for i in range(128)]),
+        'gfx_d.bin': bytes([(i * 11) & 0xFF for i in range(128)]),
+    }
+    # role, index per file - note C chip order differs from name order
+    layout = {
+        'prog_a.bin': ('p', 0), 'prog_b.bin': ('p', 1),
+        'fix.bin': ('s', 0), 'z80.bin': ('m', 0), 'pcm.bin': ('v', 0),
+        'gfx_a.bin': ('c', 1), 'gfx_b.bin': ('c', 3),
+        'gfx_c.bin': ('c', 2), 'gfx_d.bin': ('c', 4),
+    }
+
+    zip_path = tmp / 'testgame.zip'
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+
+    db_path = tmp / 'gamedb.tsv'
+    with open(db_path, 'w') as f:
+        f.write(GAMEDB_FILE_HEADER)
+        for name, data in files.items():
+            role, idx = layout[name]
+            f.write(f"testgame\t201\t0x0010\t{role}\t{idx}\t0x{len(data):X}\t"
+                    f"{zlib.crc32(data):08x}\t{name}\n")
+
+    return zip_path, GameDB(db_path), files
+
+
 def test_byte_swap():
     """
     Test byte swap transformation.
@@ -206,6 +282,11 @@ def test_header_pack_unpack():
     header.c_size = 16777216
     header.c_size_original = 16777216
     header.crc32 = 0xDEADBEEF
+    header.c_pair_size = 8388608
+    header.boot_prefix = 0x123400
+    header.chunk_map_offset = 0x40
+    header.tables_offset = 0x200
+    header.tables_size = 0x1180
     
     # Pack
     packed = header.pack()
@@ -229,6 +310,11 @@ def test_header_pack_unpack():
         (unpacked.v_size, 4194304, 'v_size'),
         (unpacked.c_size, 16777216, 'c_size'),
         (unpacked.crc32, 0xDEADBEEF, 'crc32'),
+        (unpacked.c_pair_size, 8388608, 'c_pair_size'),
+        (unpacked.boot_prefix, 0x123400, 'boot_prefix'),
+        (unpacked.chunk_map_offset, 0x40, 'chunk_map_offset'),
+        (unpacked.tables_offset, 0x200, 'tables_offset'),
+        (unpacked.tables_size, 0x1180, 'tables_size'),
     ]
     
     all_pass = True
@@ -275,6 +361,617 @@ def test_large_crom():
     return True
 
 
+def test_gamedb_identify():
+    """Test ROM set identification from zip central directory CRCs."""
+    print("Testing game database identification...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        zip_path, db, files = make_test_romset(Path(tmp))
+
+        result = identify_romset(zip_path, db)
+        if result is None:
+            print("  ✗ Set not identified")
+            return False
+
+        game, plan = result
+        expected_pairs = [('gfx_a.bin', 'gfx_c.bin'), ('gfx_b.bin', 'gfx_d.bin')]
+        checks = [
+            (game.name, 'testgame', 'name'),
+            (game.ngh_number, 201, 'ngh_number'),
+            (game.flags, 0x0010, 'flags'),
+            (plan['p'], ['prog_a.bin', 'prog_b.bin'], 'P-ROM order'),
+            (plan['c_pairs'], expected_pairs, 'C-ROM pairing'),
+        ]
+        all_pass = True
+        for got, expected, name in checks:
+            if got != expected:
+                print(f"  ✗ {name}: got {got}, expected {expected}")
+                all_pass = False
+
+        # A set missing one of its files must not be identified
+        partial = Path(tmp) / 'partial.zip'
+        with zipfile.ZipFile(partial, 'w') as zf:
+            for name, data in files.items():
+                if name != 'gfx_d.bin':
+                    zf.writestr(name, data)
+        if identify_romset(partial, db) is not None:
+            print("  ✗ Incomplete set was identified")
+            all_pass = False
+
+        # Loading uses the database plan, not the (unrecognised) file names
+        roms = load_mame_zip(zip_path, db)
+        if roms['p'] != files['prog_a.bin'] + files['prog_b.bin']:
+            print("  ✗ P-ROM data loaded in wrong order")
+            all_pass = False
+        if roms['c_pairs'][0] != (files['gfx_a.bin'], files['gfx_c.bin']):
+            print("  ✗ C-ROM pair loaded incorrectly")
+            all_pass = False
+
+        # Merged zip: a clone with more ROMs must not win over the zip's name
+        db_path = Path(tmp) / 'merged.tsv'
+        lines = (Path(tmp) / 'gamedb.tsv').read_text().splitlines(keepends=True)
+        clone = [line.replace('testgame\t', 'testgamex\t', 1) for line in lines if not line.startswith('#')]
+        extra = b'clone only'
+        clone.append(f"testgamex\t201\t0x0010\tp\t2\t0x{len(extra):X}\t{zlib.crc32(extra):08x}\textra.bin\n")
+        db_path.write_text(''.join(lines + clone))
+        members = {name: (zlib.crc32(data), len(data)) for name, data in files.items()}
+        members['extra.bin'] = (zlib.crc32(extra), len(extra))
+        for hint in ('testgame', 'testgamex'):
+            match = GameDB(db_path).identify(members, hint)
+            if match is None or match[0].name != hint:
+                print(f"  ✗ Merged zip named {hint} identified as {match and match[0].name}")
+                all_pass = False
+
+    if all_pass:
+        print("  ✓ Identification, load order and pairing correct")
+    return all_pass
+
+
+def test_gamedb_scan_speed():
+    """Test identifying a library of 300 zips is fast (no decompression)."""
+    print("Testing game database scan speed...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        zip_path, db, _ = make_test_romset(Path(tmp))
+        data = zip_path.read_bytes()
+        zips = []
+        for i in range(300):
+            path = Path(tmp) / f'set{i:03d}.zip'
+            path.write_bytes(data)
+            zips.append(path)
+
+        start = time.perf_counter()
+        found = sum(1 for path in zips if identify_romset(path, db))
+        elapsed = time.perf_counter() - start
+
+    if found != 300:
+        print(f"  ✗ Identified {found}/300 sets")
+        return False
+    if elapsed > 1.0:
+        print(f"  ✗ Scan too slow: {elapsed:.3f}s")
+        return False
+
+    print(f"  ✓ 300 sets identified in {elapsed:.3f}s")
+    return True
+
+
+def test_gamedb_build_listxml():
+    """Test building the database from MAME -listxml output."""
+    print("Testing game database build from listxml...")
+
+    listxml = """<?xml version="1.0"?>
+<mame>
+  <machine name="testgame" sourcefile="neogeo/neogeo.cpp">
+    <rom name="t-p1.p1" size="256" crc="0000abcd" region="cslot1:maincpu" offset="0"/>
+    <rom name="t-s1.s1" size="64" crc="00001111" region="cslot1:fixed" offset="0"/>
+    <rom name="t-m1.m1" size="64" crc="00002222" region="cslot1:audiocpu" offset="0"/>
+    <rom name="t-v2.v2" size="128" crc="00003334" region="cslot1:ymsnd:adpcma" offset="80"/>
+    <rom name="t-v1.v1" size="128" crc="00003333" region="cslot1:ymsnd:adpcma" offset="0"/>
+    <rom name="t-c2.c2" size="128" crc="00004442" region="cslot1:sprites" offset="1"/>
+    <rom name="t-c1.c1" size="128" crc="00004441" region="cslot1:sprites" offset="0"/>
+    <rom name="sp-s2.sp1" size="131072" crc="9036d879" region="mainbios" offset="0"/>
+  </machine>
+  <machine name="testgamea" sourcefile="neogeo/neogeo.cpp" cloneof="testgame" romof="testgame">
+    <rom name="t-p1a.p1" size="256" crc="0000abce" region="cslot1:maincpu" offset="0"/>
+    <rom name="t-c1.c1" size="128" crc="00004441" region="cslot1:sprites" offset="0"/>
+    <rom name="t-c2.c2" size="128" crc="00004442" region="cslot1:sprites" offset="1"/>
+  </machine>
+  <machine name="othergame" sourcefile="misc/other.cpp">
+    <rom name="o.p1" size="256" crc="0000eeee" region="maincpu" offset="0"/>
+    <rom name="o.c1" size="256" crc="0000ffff" region="sprites" offset="0"/>
+  </machine>
+</mame>
+"""
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = Path(tmp) / 'list.xml'
+        xml_path.write_text(listxml)
+        ngh_map_path = Path(tmp) / 'ngh.tsv'
+        ngh_map_path.write_text("# set\tngh\tflags\ntestgame\t201\t0x0010\n")
+        db_path = Path(tmp) / 'gamedb.tsv'
+        count = build_gamedb(xml_path, db_path, ngh_map_path)
+        db = GameDB(db_path)
+        game = db.get('testgame')
+        clone = db.get('testgamea')
+
+    if count != 2 or game is None or clone is None or db.get('othergame') is not None:
+        print(f"  ✗ Expected testgame and its clone, got {count} games")
+        return False
+
+    roms = {rom.name: rom for rom in game.roms}
+    checks = [
+        (len(game.roms), 7, 'ROM count'),
+        ((roms['t-v1.v1'].role, roms['t-v1.v1'].index), ('v', 0), 'v1'),
+        ((roms['t-v2.v2'].role, roms['t-v2.v2'].index), ('v', 1), 'v2'),
+        ((roms['t-c1.c1'].role, roms['t-c1.c1'].index), ('c', 1), 'c1'),
+        ((roms['t-c2.c2'].role, roms['t-c2.c2'].index), ('c', 2), 'c2'),
+        (roms['t-p1.p1'].crc32, 0xABCD, 'p1 crc'),
+        ((game.ngh_number, game.flags), (201, 0x0010), 'NGH map entry'),
+        ((clone.ngh_number, clone.flags), (201, 0x0010), 'clone NGH from parent'),
+    ]
+    all_pass = True
+    for got, expected, name in checks:
+        if got != expected:
+            print(f"  ✗ {name}: got {got}, expected {expected}")
+            all_pass = False
+
+    if all_pass:
+        print("  ✓ Database built from listxml")
+    return all_pass
+
+
+def test_ngh_number():
+    """Test NGH numbers from P-ROM headers and the NGH map, and header lookup without one."""
+    print("Testing NGH number sources...")
+
+    prom = bytearray(0x200)
+    prom[0x100:0x10A] = b'NEO-GEO\x00\x02\x01'
+    swapped = bytearray(b for pair in zip(prom[1::2], prom[0::2]) for b in pair)
+    banked_first = bytearray(0x100000) + prom
+    ngh_map = get_ngh_map()
+    numbers = [ngh for ngh, _ in ngh_map.values()]
+
+    checks = [
+        (prom_ngh_number(prom), 201, 'P-ROM header'),
+        (prom_ngh_number(swapped), 201, 'byte-swapped P-ROM header'),
+        (prom_ngh_number(banked_first), 201, 'P-ROM header 1 MB in'),
+        (prom_ngh_number(bytes(0x200)), 0, 'P-ROM without header'),
+        (ngh_map.get('mslug'), (201, 0x0070), 'bundled NGH map'),
+        (len(numbers), len(set(numbers)), 'unique NGH numbers in map'),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # Unknown sets: NGH from the P-ROM header, else from the map by set name
+        for set_name, p_data, expected in (('hdr', prom, (201, 0x0070)),
+                                           ('kof98', bytes(0x200), (242, 0x0070))):
+            set_dir = tmp / set_name
+            set_dir.mkdir()
+            (set_dir / 'x-p1.bin').write_bytes(p_data)
+            (set_dir / 'x-c1.bin').write_bytes(bytes(128))
+            (set_dir / 'x-c2.bin').write_bytes(bytes(128))
+            convert_to_ngfc(set_dir, tmp / f'{set_name}.ngfc')
+            header = NGFCHeader.unpack((tmp / f'{set_name}.ngfc').read_bytes()[:NGFC_HEADER_SIZE])
+            checks.append(((header.ngh_number, header.flags & 0x0070), expected, f'{set_name} header'))
+
+        # Files without an NGH number match a database game on sizes alone
+        _, db, _ = make_test_romset(tmp)
+        header = NGFCHeader()
+        header.p_size, header.s_size, header.m_size, header.v_size = 512, 64, 64, 128
+        header.c_size_original = 512
+        game = find_game_for_header(header, db)
+        checks.append((game.name if game else None, 'testgame', 'game by sizes'))
+
+    all_pass = True
+    for got, expected, name in checks:
+        if got != expected:
+            print(f"  ✗ {name}: got {got}, expected {expected}")
+            all_pass = False
+    if all_pass:
+        print("  ✓ NGH numbers from P-ROM header, NGH map and sizes")
+    return all_pass
+
+
+def test_inverse_transforms():
+    """Test the fused C-ROM transform and all inverse transforms."""
+    print("Testing inverse transforms...")
+    
+    size = 4096
+    c1 = bytes([(i * 13 + 1) & 0xFF for i in range(size)])
+    c2 = bytes([(i * 29 + 7) & 0xFF for i in range(size)])
+    reference = transform_crom_burst_order(byte_swap_crom(interleave_crom_pair(c1, c2)))
+    fused = transform_crom_pair(c1, c2)
+    
+    all_pass = True
+    if fused != reference:
+        print("  ✗ Fused C-ROM transform differs from step-by-step pipeline")
+        all_pass = False
+    
+    if split_crom_pair(fused) != (bytearray(c1), bytearray(c2)):
+        print("  ✗ split_crom_pair did not recover C1/C2")
+        all_pass = False
+    
+    # Chunked split must match whole-buffer split
+    halves = [split_crom_pair(fused[i:i + 1024]) for i in range(0, len(fused), 1024)]
+    if b''.join(h[0] for h in halves) != c1 or b''.join(h[1] for h in halves) != c2:
+        print("  ✗ Chunked split_crom_pair did not recover C1/C2")
+        all_pass = False
+    
+    steps = deinterleave_crom_pair(byte_swap_crom(restore_crom_burst_order(reference)))
+    if steps != (bytearray(c1), bytearray(c2)):
+        print("  ✗ Step-by-step inverse did not recover C1/C2")
+        all_pass = False
+    
+    s_data = bytes([(i * 5) & 0xFF for i in range(1024)])
+    if restore_srom(transform_srom(s_data)) != s_data:
+        print("  ✗ restore_srom did not recover S-ROM")
+        all_pass = False
+    
+    if all_pass:
+        print("  ✓ All inverse transforms recover the original data")
+    return all_pass
+
+
+def test_extract_roundtrip():
+    """Test extracting a converted set back to its original files."""
+    print("Testing NGFC extract round trip...")
+    
+    all_pass = True
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        zip_path, db, files = make_test_romset(tmp)
+        
+        # Second C-ROM pair smaller than the first
+        files['gfx_b.bin'] = files['gfx_b.bin'][:64]
+        files['gfx_d.bin'] = files['gfx_d.bin'][:64]
+        set_dir = tmp / 'rt'
+        set_dir.mkdir()
+        names = {'prog_a.bin': 'rt-p1.bin', 'prog_b.bin': 'rt-p2.bin', 'fix.bin': 'rt-s1.bin',
+                 'z80.bin': 'rt-m1.bin', 'pcm.bin': 'rt-v1.bin', 'gfx_a.bin': 'rt-c1.bin',
+                 'gfx_c.bin': 'rt-c2.bin', 'gfx_b.bin': 'rt-c3.bin', 'gfx_d.bin': 'rt-c4.bin'}
+        for name, data in files.items():
+            (set_dir / names[name]).write_bytes(data)
+        
+        ngfc_path = tmp / 'rt.ngfc'
+        convert_to_ngfc(set_dir, ngfc_path)
+        
+        out_dir = tmp / 'out'
+        results = extract_ngfc(ngfc_path, out_dir, chunk_size=64)
+        got = {name: (out_dir / name).read_bytes() for name, _, _, _ in results}
+        expected = {
+            'rt-p1.bin': files['prog_a.bin'] + files['prog_b.bin'],
+            'rt-s1.bin': files['fix.bin'],
+            'rt-m1.bin': files['z80.bin'],
+            'rt-v1.bin': files['pcm.bin'],
+            'rt-c1.bin': files['gfx_a.bin'],
+            'rt-c2.bin': files['gfx_c.bin'],
+            'rt-c3.bin': files['gfx_b.bin'],
+            'rt-c4.bin': files['gfx_d.bin'],
+        }
+        if got != expected:
+            print(f"  ✗ Extracted files differ: {sorted(got)}")
+            all_pass = False
+        
+        if not verify_roundtrip(ngfc_path, set_dir):
+            print("  ✗ Round-trip verification failed")
+            all_pass = False
+        
+        # Data past the end of a shorter source chip is not padding
+        short_dir = tmp / 'short'
+        short_dir.mkdir()
+        for path in set_dir.iterdir():
+            data = path.read_bytes()
+            (short_dir / path.name).write_bytes(data[:96] if path.name == 'rt-c2.bin' else data)
+        if verify_roundtrip(ngfc_path, short_dir):
+            print("  ✗ Non-zero data past the source length passed verification")
+            all_pass = False
+        convert_to_ngfc(short_dir, tmp / 'short.ngfc')
+        if not verify_roundtrip(tmp / 'short.ngfc', short_dir):
+            print("  ✗ Zero padded chip failed verification")
+            all_pass = False
+        
+        # Corrupt one C-ROM byte: verification must notice
+        data = bytearray(ngfc_path.read_bytes())
+        data[-1] ^= 0xFF
+        ngfc_path.write_bytes(data)
+        if verify_roundtrip(ngfc_path, set_dir):
+            print("  ✗ Corrupted file passed round-trip verification")
+            all_pass = False
+    
+    if all_pass:
+        print("  ✓ Extract recovers the original ROM files")
+    return all_pass
+
+
+def test_boot_layout_plan():
+    """Test boot-priority ordering of sections and chunks."""
+    print("Testing boot-first layout plan...")
+    
+    sizes = {'p': 0x100000, 's': 0x20000, 'm': 0x20000, 'v': 0x400000, 'c': 0x1000000}
+    chunks, prefix = plan_boot_layout(sizes, 0x40, chunk_size=0x100000,
+                                      boot_c=0x200000, boot_v=0x100000)
+    
+    all_pass = True
+    order = [(c.section, c.section_offset, c.size) for c in chunks[:5]]
+    expected = [('p', 0, 0x100000), ('m', 0, 0x20000), ('s', 0, 0x20000),
+                ('v', 0, 0x100000), ('c', 0, 0x200000)]
+    if order != expected:
+        print(f"  ✗ Boot chunks: {order}")
+        all_pass = False
+    
+    if prefix != chunks[4].file_offset + chunks[4].size:
+        print(f"  ✗ Boot prefix 0x{prefix:X} does not end after the C-ROM head")
+        all_pass = False
+    
+    if any(c.file_offset % SECTOR_SIZE for c in chunks):
+        print("  ✗ Chunks not sector aligned")
+        all_pass = False
+    
+    # Every byte of every section is covered exactly once
+    for name, size in sizes.items():
+        spans = sorted((c.section_offset, c.size) for c in chunks if c.section == name)
+        pos = 0
+        for start, length in spans:
+            if start != pos:
+                all_pass = False
+            pos = start + length
+        if pos != size:
+            print(f"  ✗ {name}: chunks cover {pos:#x} of {size:#x} bytes")
+            all_pass = False
+    
+    # Remaining V (3 chunks) and C (14 chunks) are interleaved, not V then C
+    rest = ''.join(c.section for c in chunks[5:])
+    if rest.startswith('vvv') or rest.endswith('vvv') or rest.count('v') != 3:
+        print(f"  ✗ Remainder order: {rest}")
+        all_pass = False
+    
+    if all_pass:
+        print(f"  ✓ Boot prefix {prefix / (chunks[-1].file_offset + chunks[-1].size):.1%} of file")
+    return all_pass
+
+
+def test_boot_first_roundtrip():
+    """Test a boot-first file still extracts to the original ROMs."""
+    print("Testing boot-first conversion round trip...")
+    
+    all_pass = True
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        set_dir = tmp / 'bf'
+        set_dir.mkdir()
+        (set_dir / 'bf-p1.bin').write_bytes(bytes([(i * 3) & 0xFF for i in range(4096)]))
+        (set_dir / 'bf-s1.bin').write_bytes(bytes([(i * 5) & 0xFF for i in range(1024)]))
+        (set_dir / 'bf-m1.bin').write_bytes(bytes([(i * 7) & 0xFF for i in range(1024)]))
+        (set_dir / 'bf-v1.bin').write_bytes(bytes([(i * 11) & 0xFF for i in range(8192)]))
+        (set_dir / 'bf-c1.bin').write_bytes(bytes([(i * 13) & 0xFF for i in range(8192)]))
+        (set_dir / 'bf-c2.bin').write_bytes(bytes([(i * 17) & 0xFF for i in range(8192)]))
+        
+        standard = tmp / 'std.ngfc'
+        boot = tmp / 'boot.ngfc'
+        convert_to_ngfc(set_dir, standard)
+        convert_to_ngfc(set_dir, boot, boot_order=True, boot_c=2048, boot_v=1024)
+        
+        with open(boot, 'rb') as f:
+            header = NGFCHeader.unpack(f.read(NGFC_HEADER_SIZE))
+            chunks, boot_count = read_chunk_map(f, header.chunk_map_offset)
+        
+        if not header.flags & FLAG_BOOT_ORDER or boot_count != 5:
+            print(f"  ✗ Flags 0x{header.flags:04X}, {boot_count} boot chunks")
+            all_pass = False
+        if header.crc32 != NGFCHeader.unpack(standard.read_bytes()[:NGFC_HEADER_SIZE]).crc32:
+            print("  ✗ CRC differs from standard layout")
+            all_pass = False
+        
+        if not verify_roundtrip(boot, set_dir, chunk_size=1024):
+            print("  ✗ Boot-first file does not round trip")
+            all_pass = False
+    
+    if all_pass:
+        print("  ✓ Boot-first file extracts to the original ROMs")
+    return all_pass
+
+
+def test_bank_tables():
+    """Test address translation tables for a banked game, and their validation."""
+    print("Testing bank tables...")
+    
+    MB = 0x100000
+    header = NGFCHeader()
+    header.p_size = 5 * MB           # 1 MB fixed + 4 banks
+    header.s_size = 0x20000
+    header.m_size = 0x20000
+    header.v_size = 20 * MB          # 16 MB ADPCM-A + 4 MB ADPCM-B
+    header.c_size = 20 * MB
+    header.c_pair_size = 4 * MB      # pairs of 8, 8 and 4 MB
+    sizes = {name: size for name, _, size in header.sections()}
+    tables = unpack_bank_tables(pack_bank_tables(build_bank_tables(sizes, header.c_pair_sizes())))
+    
+    pbnk, mbnk, vbnk, cpar = tables['PBNK'], tables['MBNK'], tables['VBNK'], tables['CPAR']
+    checks = [
+        (pbnk[0:2], [MB, MB - 1], 'P bank 0'),
+        (pbnk[6:8], [4 * MB, MB - 1], 'P bank 3'),
+        (pbnk[8:10], [MB, MB - 1], 'P bank 4 (empty, falls back to bank 0)'),
+        (mbnk[3 * 256 + 5], 5 << 14, 'Z80 16 KB window bank 5'),
+        (mbnk[3 * 256 + 9], 1 << 14, 'Z80 16 KB window bank 9 (mirrored)'),
+        (mbnk[0 * 256 + 100], (100 << 11) & 0x1FFFF, 'Z80 2 KB window bank 100 (mirrored)'),
+        (cpar, [0, 0x10000, 0, 4 * MB, 0x10000, 0x10000, 8 * MB, 4 * MB,
+                0x20000, 0x8000, 16 * MB, 2 * MB], 'C-ROM pairs'),
+        (tables['MASK'][5], 0x3FFFF, 'sprite tile mask'),
+        (vbnk[3], 3 * MB, 'ADPCM-A page 3'),
+        (vbnk[16 + 5], 16 * MB + MB, 'ADPCM-B page 5 (mirrored)'),
+        (validate_bank_tables(tables, header), [], 'validation'),
+    ]
+    
+    # 12 MB of V-ROM: pages past the end are unmapped
+    header.v_size = 12 * MB
+    sizes['v'] = header.v_size
+    small = build_bank_tables(sizes, header.c_pair_sizes())
+    checks.append((small['VBNK'][11:13], [11 * MB, BANK_UNMAPPED], 'unmapped ADPCM page'))
+    checks.append((validate_bank_tables(small, header), [], 'validation with unmapped pages'))
+    
+    # Broken tables are reported
+    small['CPAR'][6] += 0x100
+    small['PBNK'][0] = 5 * MB
+    problems = validate_bank_tables(small, header)
+    checks.append((len(problems), 2, f'problems found in broken tables: {problems}'))
+    
+    packed = bytearray(pack_bank_tables(small))
+    packed[100] ^= 1
+    try:
+        unpack_bank_tables(bytes(packed))
+        checks.append((False, True, 'corrupt tables rejected'))
+    except ValueError:
+        pass
+    
+    # Tables are opt-in: default files keep P-ROM right after the header
+    with tempfile.TemporaryDirectory() as tmp:
+        zip_path, _, _ = make_test_romset(Path(tmp))
+        for bank_tables in (False, True):
+            ngfc_path = Path(tmp) / f'tables{int(bank_tables)}.ngfc'
+            convert_to_ngfc(zip_path, ngfc_path, bank_tables=bank_tables)
+            with open(ngfc_path, 'rb') as f:
+                written = NGFCHeader.unpack(f.read(NGFC_HEADER_SIZE))
+                if bank_tables:
+                    problems = validate_bank_tables(read_bank_tables(f, written), written)
+                    checks.append((problems, [], 'tables read back from file'))
+            checks.append((bool(written.flags & FLAG_BANK_TABLES), bank_tables, f'tables flag ({bank_tables})'))
+            if not bank_tables:
+                checks.append((written.data_offset(), NGFC_HEADER_SIZE, 'default data offset'))
+    
+    all_pass = True
+    for got, expected, name in checks:
+        if got != expected:
+            print(f"  ✗ {name}: got {got}, expected {expected}")
+            all_pass = False
+    
+    if all_pass:
+        print(f"  ✓ {len(pack_bank_tables(tables)):,} bytes of tables cover every address")
+    return all_pass
+
+
+def test_adpcmb_region():
+    """Test sets with a separate ADPCM-B region: database index, header and VBNK."""
+    print("Testing separate ADPCM-B region...")
+    
+    files = {
+        'e-p1.p1': ('cslot1:maincpu', 0, bytes(range(256))),
+        'e-v1.v1': ('cslot1:ymsnd:adpcma', 0, bytes([0x11]) * 0x30000),
+        'e-v2.v2': ('cslot1:ymsnd:adpcmb', 0, bytes([0x22]) * 0x10000),
+        'e-v3.v3': ('cslot1:ymsnd:adpcmb', 0x10000, bytes([0x33]) * 0x10000),
+        'e-c1.c1': ('cslot1:sprites', 0, bytes([0x44]) * 256),
+        'e-c2.c2': ('cslot1:sprites', 1, bytes([0x55]) * 256),
+    }
+    roms_xml = ''.join(f'    <rom name="{name}" size="{len(data)}" crc="{zlib.crc32(data):08x}" '
+                       f'region="{region}" offset="{offset:x}"/>\n'
+                       for name, (region, offset, data) in files.items())
+    listxml = ('<?xml version="1.0"?>\n<mame>\n  <machine name="earlyset" sourcefile="neogeo/neogeo.cpp">\n'
+               + roms_xml + '  </machine>\n</mame>\n')
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / 'list.xml').write_text(listxml)
+        build_gamedb(tmp / 'list.xml', tmp / 'gamedb.tsv', tmp / 'no-ngh-map.tsv')
+        db = GameDB(tmp / 'gamedb.tsv')
+        set_dir = tmp / 'earlyset'
+        set_dir.mkdir()
+        for name, (_, _, data) in files.items():
+            (set_dir / name).write_bytes(data)
+        roms = load_mame_romset(set_dir, db)
+    
+    indexes = {rom.name: rom.index for rom in db.get('earlyset').roms if rom.role == 'v'}
+    writer = NGFCWriter(roms, bank_tables=True)
+    header = NGFCHeader.unpack(writer.header.pack())
+    tables = unpack_bank_tables(writer.tables)
+    vbnk = tables['VBNK']
+    
+    # The same V-ROM with ADPCM-B sharing the samples is not valid for this header
+    shared = build_bank_tables(writer.sizes, header.c_pair_sizes())
+    
+    checks = [
+        (indexes, {'e-v1.v1': 0, 'e-v2.v2': ADPCMB_INDEX, 'e-v3.v3': ADPCMB_INDEX + 1}, 'V-ROM indexes'),
+        (roms['adpcma_size'], 0x30000, 'loaded ADPCM-A size'),
+        (header.adpcma_size, 0x30000, 'header ADPCM-A size'),
+        (vbnk[0:2], [0, 0], 'ADPCM-A pages (mirrored)'),
+        (vbnk[16:18], [0x30000, 0x30000], 'ADPCM-B pages after ADPCM-A'),
+        (validate_bank_tables(tables, header), [], 'validation'),
+        (len(validate_bank_tables(shared, header)), V_PAGE_COUNT, 'shared ADPCM-B pages rejected'),
+    ]
+    all_pass = True
+    for got, expected, name in checks:
+        if got != expected:
+            print(f"  ✗ {name}: got {got}, expected {expected}")
+            all_pass = False
+    
+    if all_pass:
+        print("  ✓ ADPCM-B mapped after 0x30000 bytes of ADPCM-A")
+    return all_pass
+
+
+def test_pair_table():
+    """Test sets whose C-ROM pairs shrink more than once (e.g. 4, 4, 2, 1 MB chips)."""
+    print("Testing C-ROM pair size table...")
+    
+    chip_sizes = [1024, 1024, 512, 256]
+    all_pass = True
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        set_dir = tmp / 'pt'
+        set_dir.mkdir()
+        (set_dir / 'pt-p1.bin').write_bytes(bytes(range(256)) * 2)
+        chips = {}
+        for pair, size in enumerate(chip_sizes):
+            for n in (pair * 2 + 1, pair * 2 + 2):
+                chips[f'pt-c{n}.bin'] = bytes([(i * (n * 2 + 1) + (i >> 7)) & 0xFF for i in range(size)])
+        for name, data in chips.items():
+            (set_dir / name).write_bytes(data)
+        
+        ngfc_path = tmp / 'pt.ngfc'
+        convert_to_ngfc(set_dir, ngfc_path, bank_tables=True)
+        with open(ngfc_path, 'rb') as f:
+            header = NGFCHeader.read(f)
+            problems = validate_bank_tables(read_bank_tables(f, header), header)
+        
+        if not header.flags & FLAG_PAIR_TABLE or header.c_pair_sizes() != chip_sizes:
+            print(f"  ✗ Pair sizes {header.c_pair_sizes()}, flags 0x{header.flags:04X}")
+            all_pass = False
+        if header.tables_offset != SECTOR_SIZE or problems:
+            print(f"  ✗ Bank tables at 0x{header.tables_offset:X}: {problems}")
+            all_pass = False
+        
+        out_dir = tmp / 'out'
+        results = extract_ngfc(ngfc_path, out_dir)
+        got = {name: (out_dir / name).read_bytes() for name, _, _, _ in results if name in chips}
+        if got != chips:
+            print(f"  ✗ Extracted C-ROM files differ: {sorted(got)}")
+            all_pass = False
+        if not verify_roundtrip(ngfc_path, set_dir):
+            print("  ✗ Round-trip verification failed")
+            all_pass = False
+        
+        # Regular sets keep the plain layout
+        regular = tmp / 'regular.ngfc'
+        (set_dir / 'pt-c7.bin').unlink()
+        (set_dir / 'pt-c8.bin').unlink()
+        convert_to_ngfc(set_dir, regular)
+        with open(regular, 'rb') as f:
+            header = NGFCHeader.read(f)
+        if header.flags & FLAG_PAIR_TABLE or header.c_pair_sizes() != chip_sizes[:3] or \
+                header.data_offset() != NGFC_HEADER_SIZE:
+            print(f"  ✗ Regular set: pairs {header.c_pair_sizes()}, flags 0x{header.flags:04X}")
+            all_pass = False
+        
+        # A header cut before its pair table is refused
+        try:
+            NGFCHeader.unpack(ngfc_path.read_bytes()[:NGFC_HEADER_SIZE])
+            print("  ✗ Truncated pair table accepted")
+            all_pass = False
+        except ValueError:
+            pass
+    
+    if all_pass:
+        print("  ✓ Pairs of 1024, 1024, 512 and 256 bytes stored and extracted")
+    return all_pass
+
+
 def main():
     """Run all tests."""
     print("=" * 60)
@@ -290,6 +987,17 @@ def main():
         test_srom_transformation,
         test_header_pack_unpack,
         test_large_crom,
+        test_gamedb_identify,
+        test_gamedb_scan_speed,
+        test_gamedb_build_listxml,
+        test_ngh_number,
+        test_inverse_transforms,
+        test_extract_roundtrip,
+        test_boot_layout_plan,
+        test_boot_first_roundtrip,
+        test_bank_tables,
+        test_adpcmb_region,
+        test_pair_table,
     ]
     
     passed = 0
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Test suite for block-hash NGFC comparison.
+
+Checks byte-range narrowing against a brute-force reference, section-space
+comparison across layouts with C-ROM tile mapping, and the hash cache.
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ngfc_converter import NGFCHeader, NGFC_HEADER_SIZE, convert_to_ngfc
+from ngfc_diff import (
+    HashCache,
+    NGFCImage,
+    changed_spans,
+    describe_range,
+    diff_command,
+    diff_files,
+)
+
+
+def reference_spans(a: bytes, b: bytes):
+    """Maximal runs of differing bytes."""
+    spans = []
+    for i in range(len(a)):
+        if a[i] != b[i]:
+            if spans and spans[-1][1] == i:
+                spans[-1][1] = i + 1
+            else:
+                spans.append([i, i + 1])
+    return spans
+
+
+def make_set(set_dir: Path):
+    set_dir.mkdir()
+    (set_dir / 'diff-p1.bin').write_bytes(bytes(range(256)) * 64)
+    (set_dir / 'diff-s1.bin').write_bytes(bytes([(i * 7) & 0xFF for i in range(2048)]))
+    (set_dir / 'diff-v1.bin').write_bytes(bytes([(i * 3) & 0xFF for i in range(4096)]))
+    for chip, seed in (('c1', 3), ('c2', 5), ('c3', 7), ('c4', 11)):
+        (set_dir / f'diff-{chip}.bin').write_bytes(bytes([(i * seed + (i >> 8)) & 0xFF for i in range(65536)]))
+
+
+def test_changed_spans():
+    """Test span narrowing: every reported span starts and ends on a changed byte."""
+    print("Testing changed span narrowing...")
+
+    rng = random.Random(1)
+    all_pass = True
+    for trial in range(50):
+        a = bytes(rng.randrange(256) for _ in range(rng.randrange(1, 3000)))
+        b = bytearray(a)
+        for _ in range(rng.randrange(0, 8)):
+            start = rng.randrange(len(b))
+            for i in range(start, min(len(b), start + rng.randrange(1, 80))):
+                b[i] = (b[i] + rng.randrange(1, 256)) & 0xFF
+        expected = reference_spans(a, b)
+        spans = changed_spans(a, bytes(b), start=100)
+
+        # Spans cover every changed byte and may only merge runs closer than 32 bytes
+        covered = set()
+        for lo, hi in spans:
+            covered.update(range(lo - 100, hi - 100))
+        changed = {i for lo, hi in expected for i in range(lo, hi)}
+        edges_ok = all(a[lo - 100] != b[lo - 100] and a[hi - 101] != b[hi - 101] for lo, hi in spans)
+        if not changed <= covered or not edges_ok or len(covered - changed) > 32 * len(spans):
+            print(f"  ✗ Trial {trial}: spans {spans}, expected {expected}")
+            all_pass = False
+            break
+    if all_pass:
+        print("  ✓ 50 random buffers narrowed correctly")
+    return all_pass
+
+
+def test_diff_files():
+    """Test that layouts compare equal section-wise and changes map to C-ROM tiles."""
+    print("Testing NGFC file comparison...")
+
+    all_pass = True
+    with tempfile.TemporaryDirectory() as tmp, ThreadPoolExecutor(4) as executor:
+        tmp = Path(tmp)
+        make_set(tmp / 'diff')
+        standard, boot = tmp / 'standard.ngfc', tmp / 'boot.ngfc'
+        convert_to_ngfc(tmp / 'diff', standard)
+        convert_to_ngfc(tmp / 'diff', boot, boot_order=True, boot_c=32768)
+
+        framed, region = tmp / 'framed.ngfc', tmp / 'region.ngfc'
+        convert_to_ngfc(tmp / 'diff', framed, link_frames=True)
+        convert_to_ngfc(tmp / 'diff', region, flags=0x0020)
+
+        # Layout-only header fields and flags are not differences
+        for other in (boot, framed):
+            diff = diff_files(standard, other, executor, block_size=4096)
+            if not diff.identical:
+                print(f"  ✗ {other.name} differs from the standard layout: {diff}")
+                all_pass = False
+        diff = diff_files(standard, region, executor, block_size=4096)
+        if diff.header_fields != [('flags', 0, 0x0020)] or diff.ranges or diff.sizes:
+            print(f"  ✗ Region flag change: {diff}")
+            all_pass = False
+        if all_pass:
+            print("  ✓ Standard, boot-first and link-framed files compare equal")
+
+        # Flip bytes in tile 1500 (second pair) of the boot-first file
+        with NGFCImage(boot) as image:
+            extent = next(e for e in image.extents['c'] if e[0] <= 1500 * 128 < e[0] + e[2])
+        file_offset = extent[1] + 1500 * 128 - extent[0]
+        data = bytearray(boot.read_bytes())
+        data[file_offset + 5] ^= 0xFF
+        data[file_offset + 9] ^= 0x01
+        changed = tmp / 'changed.ngfc'
+        changed.write_bytes(bytes(data))
+
+        diff = diff_files(boot, changed, executor, block_size=4096)
+        header = NGFCHeader.unpack(data[:NGFC_HEADER_SIZE])
+        expected = [('c', 1500 * 128 + 5, 1500 * 128 + 10)]
+        text = describe_range(header, *diff.ranges[0]) if diff.ranges else ''
+        if diff.ranges != expected or diff.header_fields or 'C3/C4 tile 1500' not in text:
+            print(f"  ✗ Got {diff.ranges} ({text}), expected {expected}")
+            all_pass = False
+        else:
+            print(f"  ✓ {text}")
+
+        # 4, 4, 2 and 1 MB chips: the last pair is located through the pair table
+        mixed = NGFCHeader()
+        mixed.pair_sizes = [0x400000, 0x400000, 0x200000, 0x100000]
+        text = describe_range(mixed, 'c', 0x1500000, 0x1500080)
+        if not text.endswith('C7/C8 tile 172032'):
+            print(f"  ✗ Mixed pair sizes: {text}")
+            all_pass = False
+
+    return all_pass
+
+
+def test_hash_cache():
+    """Test directory comparison and reuse of cached hashes for unchanged files."""
+    print("Testing directory diff and hash cache...")
+
+    all_pass = True
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        make_set(tmp / 'diff')
+        for out in ('old', 'new'):
+            (tmp / out).mkdir()
+            convert_to_ngfc(tmp / 'diff', tmp / out / 'diff.ngfc')
+        cache_path = tmp / 'cache.json'
+
+        if not diff_command(tmp / 'old', tmp / 'new', cache_path):
+            print("  ✗ Identical directories reported as different")
+            all_pass = False
+        cache = HashCache(cache_path)
+        if len(cache.entries) != 2:
+            print(f"  ✗ Expected 2 cache entries, got {len(cache.entries)}")
+            all_pass = False
+        else:
+            print("  ✓ Identical directories, 2 files cached")
+
+        # Rewrite a file keeping size and mtime: the cached hashes are trusted
+        path = tmp / 'new' / 'diff.ngfc'
+        stat = path.stat()
+        data = bytearray(path.read_bytes())
+        data[-1] ^= 0xFF
+        path.write_bytes(bytes(data))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        if not diff_command(tmp / 'old', tmp / 'new', cache_path):
+            print("  ✗ Cached hashes were not used")
+            all_pass = False
+        else:
+            print("  ✓ Unchanged size/mtime served from cache")
+
+        # A new mtime invalidates the entry
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        if diff_command(tmp / 'old', tmp / 'new', cache_path):
+            print("  ✗ Modified file not rehashed")
+            all_pass = False
+        else:
+            print("  ✓ Modified file rehashed and reported")
+
+        # Entries written before the 'tables' region existed are misses, not errors
+        path.write_bytes((tmp / 'old' / 'diff.ngfc').read_bytes())
+        diff_command(tmp / 'old', tmp / 'new', cache_path)
+        entries = json.loads(cache_path.read_text())
+        for entry in entries.values():
+            del entry['version']
+            del entry['regions']['tables']
+        cache_path.write_text(json.dumps(entries))
+        try:
+            identical = diff_command(tmp / 'old', tmp / 'new', cache_path)
+        except KeyError as e:
+            identical = f"KeyError {e}"
+        versions = [entry.get('version') for entry in HashCache(cache_path).entries.values()]
+        if identical is not True or None in versions:
+            print(f"  ✗ Old cache format: result {identical}, entry versions {versions}")
+            all_pass = False
+        else:
+            print("  ✓ Old-format cache entries rehashed")
+
+    return all_pass
+
+
+def main():
+    """Run all tests."""
+    print("=" * 60)
+    print("NGFC Diff Test Suite")
+    print("=" * 60)
+
+    tests = [
+        test_changed_spans,
+        test_diff_files,
+        test_hash_cache,
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        print()
+        try:
+            if test():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"  ✗ Exception: {e}")
+            failed += 1
+
+    print()
+    print("=" * 60)
+    print(f"Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
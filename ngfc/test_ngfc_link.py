@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Test suite for pre-encoded link frames.
+
+Converts a set with --link-frames, replays the link streams through the
+reference receiver, checks that damaged streams are rejected and that
+the framed file still extracts to the source set.
+"""
+
+import random
+import struct
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ngfc_converter import (
+    LINK_FRAME_SIZE,
+    LINK_PAYLOAD_SIZE,
+    LINK_TARGETS,
+    NGFCHeader,
+    SECTOR_SIZE,
+    convert_to_ngfc,
+    iter_section_range,
+    link_sequence_starts,
+    read_section_extents,
+    verify_roundtrip,
+)
+from ngfc_link import LinkError, LinkReceiver, link_benchmark, link_regions, receive_links
+
+
+def make_set(set_dir: Path):
+    """ROM set whose S, M and C sizes are not multiples of the frame payload."""
+    set_dir.mkdir()
+    (set_dir / 'link-p1.bin').write_bytes(bytes(range(256)) * 16)
+    (set_dir / 'link-s1.bin').write_bytes(bytes([(i * 7) & 0xFF for i in range(20000)]))
+    (set_dir / 'link-m1.bin').write_bytes(bytes([(i * 13) & 0xFF for i in range(9000)]))
+    (set_dir / 'link-v1.bin').write_bytes(bytes([(i * 3) & 0xFF for i in range(5000)]))
+    for chip, seed, size in (('c1', 3, 65536), ('c2', 5, 65536), ('c3', 7, 24576), ('c4', 11, 24576)):
+        (set_dir / f'link-{chip}.bin').write_bytes(bytes([(i * seed + (i >> 8)) & 0xFF for i in range(size)]))
+
+
+def link_streams(path: Path):
+    """Raw link streams of a file: link -> bytes, as Pico A would send them."""
+    data = path.read_bytes()
+    header = NGFCHeader.unpack(data)
+    return header, {link: b''.join(data[offset:offset + size] for _, offset, size in regions)
+                    for link, regions in link_regions(header).items()}
+
+
+def test_link_roundtrip():
+    """Test that received target memories match the converted sections."""
+    print("Testing link frame round trip...")
+
+    all_pass = True
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        make_set(tmp / 'link')
+        framed = tmp / 'framed.ngfc'
+        convert_to_ngfc(tmp / 'link', framed, link_frames=True)
+
+        header, streams = link_streams(framed)
+        with open(framed, 'rb') as f:
+            extents = read_section_extents(f, header)
+            sections = {name: b''.join(iter_section_range(f, extents[name], 0, getattr(header, f'{name}_size')))
+                        for name in LINK_TARGETS}
+
+        if any(offset % SECTOR_SIZE for regions in link_regions(header).values() for _, offset, _ in regions):
+            print("  ✗ Link regions not sector aligned")
+            all_pass = False
+
+        # Feed each stream in random pieces, as data arrives from the link
+        rng = random.Random(3)
+        sequences = link_sequence_starts(header)
+        for link, names in (('B', ['c']), ('C', ['s', 'm'])):
+            receiver = LinkReceiver(link, {LINK_TARGETS[name]: len(sections[name]) for name in names},
+                                    sequences[names[0]])
+            stream = streams[link]
+            pos = 0
+            while pos < len(stream):
+                step = rng.randrange(1, 3 * LINK_FRAME_SIZE)
+                receiver.feed(stream[pos:pos + step])
+                pos += step
+            receiver.finish()
+            for name in names:
+                if receiver.memory[LINK_TARGETS[name]] != sections[name]:
+                    print(f"  ✗ Link {link}: {name.upper()}-ROM differs from section data")
+                    all_pass = False
+            frames = sum((len(sections[name]) + LINK_PAYLOAD_SIZE - 1) // LINK_PAYLOAD_SIZE for name in names)
+            if receiver.frames != frames:
+                print(f"  ✗ Link {link}: {receiver.frames} frames, expected {frames}")
+                all_pass = False
+
+        if not verify_roundtrip(framed, tmp / 'link'):
+            print("  ✗ Framed file does not extract to the source set")
+            all_pass = False
+
+        if all_pass:
+            print(f"  ✓ Links B and C received intact ({len(streams['B']):,} + {len(streams['C']):,} bytes)")
+    return all_pass
+
+
+def test_link_errors():
+    """Test that damaged, reordered and truncated streams are rejected."""
+    print("Testing link stream validation...")
+
+    all_pass = True
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        make_set(tmp / 'link')
+        framed = tmp / 'framed.ngfc'
+        convert_to_ngfc(tmp / 'link', framed, link_frames=True)
+        header, streams = link_streams(framed)
+        stream = streams['B']
+        targets = {LINK_TARGETS['c']: header.c_size}
+
+        flipped = bytearray(stream)
+        flipped[LINK_FRAME_SIZE + 100] ^= 0x01
+        swapped = stream[LINK_FRAME_SIZE:2 * LINK_FRAME_SIZE] + stream[:LINK_FRAME_SIZE] + \
+            stream[2 * LINK_FRAME_SIZE:]
+        # Frame header rewritten to another target address: caught by the CRC
+        readdressed = bytearray(stream)
+        struct.pack_into('<I', readdressed, LINK_FRAME_SIZE + 8, 0)
+        padded = bytearray(stream)
+        padded[-1] = 0xFF
+
+        cases = [
+            ('flipped payload bit', bytes(flipped), 'CRC mismatch'),
+            ('swapped frames', swapped, 'sequence'),
+            ('wrong target address', bytes(readdressed), 'CRC mismatch'),
+            ('non-zero padding', bytes(padded), 'padding'),
+            ('truncated stream', stream[:2 * LINK_FRAME_SIZE], 'incomplete'),
+            ('partial frame', stream[:LINK_FRAME_SIZE + 100], 'trailing'),
+        ]
+        for desc, data, expected in cases:
+            receiver = LinkReceiver('B', targets)
+            try:
+                receiver.feed(data)
+                receiver.finish()
+                print(f"  ✗ {desc}: accepted")
+                all_pass = False
+            except LinkError as e:
+                if expected not in str(e):
+                    print(f"  ✗ {desc}: {e}")
+                    all_pass = False
+
+        # A file without frames is refused
+        plain = tmp / 'plain.ngfc'
+        convert_to_ngfc(tmp / 'link', plain)
+        try:
+            receive_links(plain)
+            print("  ✗ File without link frames accepted")
+            all_pass = False
+        except ValueError:
+            pass
+
+    if all_pass:
+        print(f"  ✓ {len(cases)} damaged streams rejected")
+    return all_pass
+
+
+def test_link_benchmark():
+    """Test the throughput benchmark runs over a framed file."""
+    print("Testing link benchmark...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        make_set(tmp / 'link')
+        framed = tmp / 'framed.ngfc'
+        convert_to_ngfc(tmp / 'link', framed, link_frames=True)
+        rates = link_benchmark(framed, rounds=1)
+
+    if set(rates) != {'read', 'encode', 'receive'} or min(rates.values()) <= 0:
+        print(f"  ✗ Rates: {rates}")
+        return False
+    print("  ✓ " + ", ".join(f"{stage} {rate:,.0f} MB/s" for stage, rate in rates.items()))
+    return True
+
+
+def main():
+    """Run all tests."""
+    print("=" * 60)
+    print("NGFC Link Frame Test Suite")
+    print("=" * 60)
+
+    tests = [
+        test_link_roundtrip,
+        test_link_errors,
+        test_link_benchmark,
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        print()
+        try:
+            if test():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"  ✗ Exception: {e}")
+            failed += 1
+
+    print()
+    print("=" * 60)
+    print(f"Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
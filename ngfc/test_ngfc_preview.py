@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Test suite for NGFC menu preview assets.
+
+Verifies fix tile encoding against the S-ROM layout, title rendering from
+the game's fix font, image quantization, and the fixed-offset section.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ngfc_converter import (
+    NGFCHeader,
+    NGFC_HEADER_SIZE,
+    FLAG_PREVIEW,
+    PREVIEW_OFFSET,
+    PREVIEW_SIZE,
+    transform_srom,
+    convert_to_ngfc,
+    verify_roundtrip,
+)
+from ngfc_preview import (
+    encode_fix_tile,
+    decode_fix_tile,
+    layout_title,
+    render_title,
+    load_image,
+    quantize_image,
+    unpack_preview,
+    neogeo_color,
+    neogeo_rgb,
+    PREVIEW_SOURCE_TITLE,
+    PREVIEW_SOURCE_IMAGE,
+)
+from ngfc_tiles import write_png
+
+
+def make_font() -> bytes:
+    """S-ROM whose tile n is filled with colour (n % 15) + 1."""
+    return b''.join(encode_fix_tile(bytes([(n % 15) + 1] * 64)) for n in range(256))
+
+
+def make_romset(tmp: Path) -> Path:
+    set_dir = tmp / 'pv'
+    set_dir.mkdir()
+    (set_dir / 'pv-p1.bin').write_bytes(bytes(range(256)) * 4)
+    (set_dir / 'pv-s1.bin').write_bytes(make_font())
+    (set_dir / 'pv-c1.bin').write_bytes(bytes(range(256)) * 2)
+    (set_dir / 'pv-c2.bin').write_bytes(bytes(range(255, -1, -1)) * 2)
+    return set_dir
+
+
+def test_fix_tile_layout():
+    """Test fix tile encoding: after the S-ROM transform, bytes are line-major."""
+    print("Testing fix tile encoding...")
+    
+    pixels = bytes([(x + y * 3) & 0xF for y in range(8) for x in range(8)])
+    tile = encode_fix_tile(pixels)
+    
+    if decode_fix_tile(tile) != pixels:
+        print("  ✗ Fix tile decode/encode mismatch")
+        return False
+    
+    # Transformed tiles are line 0 (pixel pairs 0-3), line 1...
+    transformed = transform_srom(tile)
+    expected = bytes(pixels[i * 2] | (pixels[i * 2 + 1] << 4) for i in range(32))
+    if transformed != expected:
+        print(f"  ✗ Transformed tile: {transformed.hex()}, expected {expected.hex()}")
+        return False
+    
+    print("  ✓ Fix tiles match the S-ROM column layout")
+    return True
+
+
+def test_title_rendering():
+    """Test title layout and font tile lookup."""
+    print("Testing title rendering...")
+    
+    grid = layout_title("METAL SLUG SUPER VEHICLE-001", columns=16, rows=8)
+    expected_rows = ['METAL SLUG SUPER', '  VEHICLE-001   ']
+    if grid[3:5] != expected_rows or grid[2].strip() or grid[5].strip():
+        print(f"  ✗ Layout: {grid}")
+        return False
+    
+    font = make_font()
+    tiles = render_title(font, "Ab", font_base=0)
+    row = tiles[3 * 16:4 * 16]
+    # 'AB' centred at columns 7, 8; lower case is upper-cased
+    if row[7] != font[ord('A') * 32:ord('A') * 32 + 32] or row[8] != font[ord('B') * 32:ord('B') * 32 + 32]:
+        print("  ✗ Title tiles not taken from the font")
+        return False
+    if row[0] != bytes(32):
+        print("  ✗ Blank cells should be empty tiles")
+        return False
+    
+    print("  ✓ Title rendered from fix font")
+    return True
+
+
+def test_image_quantization():
+    """Test PNG loading, downscaling and palette reduction."""
+    print("Testing image quantization...")
+    
+    all_pass = True
+    with tempfile.TemporaryDirectory() as tmp:
+        # 64x32 paletted image: left half red, right half blue
+        path = Path(tmp) / 'img.png'
+        pixels = bytes((0 if x < 32 else 1) for y in range(32) for x in range(64))
+        write_png(path, 64, 32, pixels, bytes([255, 0, 0, 0, 0, 255]))
+        width, height, rgb = load_image(path)
+        if (width, height) != (64, 32) or rgb[:3] != b'\xff\x00\x00' or rgb[-3:] != b'\x00\x00\xff':
+            print(f"  ✗ PNG load: {width}x{height}")
+            all_pass = False
+    
+    out, palette = quantize_image(width, height, rgb, out_width=32, out_height=32)
+    colors = {neogeo_rgb(palette[i]) for i in set(out) if i}
+    if colors != {(255, 0, 0), (0, 0, 255)}:
+        print(f"  ✗ Palette colours: {colors}")
+        all_pass = False
+    # 2:1 image letterboxed into a square: top and bottom rows transparent
+    if set(out[:32 * 8]) != {0} or 0 in set(out[32 * 8:32 * 24]):
+        print("  ✗ Letterbox incorrect")
+        all_pass = False
+    if neogeo_rgb(neogeo_color(8, 16, 255)) != (8, 16, 255):
+        print("  ✗ Neo Geo colour conversion")
+        all_pass = False
+    
+    if all_pass:
+        print("  ✓ Image downscaled to the menu palette")
+    return all_pass
+
+
+def test_preview_section():
+    """Test the preview section is at its fixed offset and data follows it."""
+    print("Testing preview section in NGFC file...")
+    
+    all_pass = True
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        set_dir = make_romset(tmp)
+        
+        ngfc_path = tmp / 'pv.ngfc'
+        convert_to_ngfc(set_dir, ngfc_path, preview_title='Hi')
+        data = ngfc_path.read_bytes()
+        header = NGFCHeader.unpack(data[:NGFC_HEADER_SIZE])
+        
+        if not header.flags & FLAG_PREVIEW or header.data_offset() != PREVIEW_OFFSET + PREVIEW_SIZE:
+            print("  ✗ Preview flag / data offset")
+            all_pass = False
+        if PREVIEW_OFFSET % 512 or PREVIEW_SIZE % 512:
+            print("  ✗ Preview section not sector aligned")
+            all_pass = False
+        
+        title, source, pixels, palette, width, height = unpack_preview(
+            data[PREVIEW_OFFSET:PREVIEW_OFFSET + PREVIEW_SIZE])
+        if (title, source, width, height) != ('Hi', PREVIEW_SOURCE_TITLE, 128, 64):
+            print(f"  ✗ Preview: {title}, {source}, {width}x{height}")
+            all_pass = False
+        # 'H' tile (colour 72 % 15 + 1 = 13) at row 3, column 7
+        if pixels[3 * 8 * 128 + 7 * 8] != (ord('H') % 15) + 1:
+            print("  ✗ Preview pixels do not come from the font")
+            all_pass = False
+        
+        if data[header.data_offset():header.data_offset() + 1024] != bytes(range(256)) * 4:
+            print("  ✗ P-ROM does not follow the preview section")
+            all_pass = False
+        if not verify_roundtrip(ngfc_path, set_dir):
+            print("  ✗ Round trip failed with preview section")
+            all_pass = False
+        
+        # Bank tables go between the preview and the data
+        convert_to_ngfc(set_dir, ngfc_path, preview_title='Hi', bank_tables=True)
+        header = NGFCHeader.unpack(ngfc_path.read_bytes()[:NGFC_HEADER_SIZE])
+        if header.tables_offset != PREVIEW_OFFSET + PREVIEW_SIZE or \
+                header.data_offset() < header.tables_offset + header.tables_size:
+            print("  ✗ Bank tables offset after the preview")
+            all_pass = False
+        if not verify_roundtrip(ngfc_path, set_dir):
+            print("  ✗ Round trip failed with preview section and bank tables")
+            all_pass = False
+        
+        image = tmp / 'img.png'
+        write_png(image, 16, 16, bytes(256), bytes([0, 200, 0]))
+        convert_to_ngfc(set_dir, ngfc_path, preview_image=image)
+        data = ngfc_path.read_bytes()
+        _, source, pixels, palette, _, _ = unpack_preview(data[PREVIEW_OFFSET:PREVIEW_OFFSET + PREVIEW_SIZE])
+        if source != PREVIEW_SOURCE_IMAGE or neogeo_rgb(palette[pixels[32 * 128 + 64]]) != (0, 206, 0):
+            print("  ✗ Image preview")
+            all_pass = False
+    
+    if all_pass:
+        print("  ✓ Preview section stored at fixed offset")
+    return all_pass
+
+
+def main():
+    """Run all tests."""
+    print("=" * 60)
+    print("NGFC Preview Test Suite")
+    print("=" * 60)
+    print()
+    
+    tests = [
+        test_fix_tile_layout,
+        test_title_rendering,
+        test_image_quantization,
+        test_preview_section,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        print()
+        try:
+            if test():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"  ✗ Exception: {e}")
+            failed += 1
+    
+    print()
+    print("=" * 60)
+    print(f"Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+    
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Test suite for the NGFC conversion service.
+
+Runs the service on localhost and talks to it with a plain asyncio HTTP
+client: streamed output must match a local conversion, the queue must
+refuse work beyond its limits, and cancellation must stop queued and
+running jobs.
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ngfc_converter import NGFCWriter, convert_to_ngfc, load_romset
+from ngfc_server import (
+    ConversionCancelled,
+    ConversionServer,
+    ConversionService,
+    ServiceBusy,
+    _cancel_check,
+    _run_conversion,
+)
+
+
+def make_zip(path: Path, c_size: int = 1024 * 1024) -> Path:
+    """Write a ROM set zip with MAME-style names (not in the game database)."""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('test-p1.bin', bytes(range(256)) * 256)
+        zf.writestr('test-s1.bin', bytes([(i * 7) & 0xFF for i in range(4096)]))
+        zf.writestr('test-m1.bin', bytes(4096))
+        zf.writestr('test-v1.bin', bytes([(i * 3) & 0xFF for i in range(8192)]))
+        zf.writestr('test-c1.bin', bytes([(i * 5 + (i >> 9)) & 0xFF for i in range(c_size)]))
+        zf.writestr('test-c2.bin', bytes([(i * 11 + (i >> 8)) & 0xFF for i in range(c_size)]))
+    return path
+
+
+async def send_request(port: int, method: str, target: str, body: bytes = b''):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    return reader, writer
+
+
+async def http_request(port: int, method: str, target: str, body: bytes = b''):
+    """Minimal HTTP/1.1 client: returns (status, headers, body), decoding chunked bodies."""
+    reader, writer = await send_request(port, method, target, body)
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        name, _, value = line.decode().partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        data = bytearray()
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            if not size:
+                break
+            data += await reader.readexactly(size)
+            await reader.readexactly(2)
+        data = bytes(data)
+    else:
+        data = await reader.readexactly(int(headers['content-length']))
+    writer.close()
+    return status, headers, data
+
+
+async def wait_until(condition, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise TimeoutError("condition not reached")
+
+
+async def start_server(service: ConversionService):
+    server = await asyncio.start_server(ConversionServer(service).handle, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def test_streamed_conversion():
+    """Test that a conversion over HTTP matches a local conversion."""
+    print("Testing streamed conversion over HTTP...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        zip_path = make_zip(tmp / 'test.zip', c_size=6 * 1024 * 1024)
+        expected_path = tmp / 'expected.ngfc'
+        convert_to_ngfc(zip_path, expected_path, boot_order=True)
+
+        async def run():
+            service = ConversionService(tmp / 'work', max_workers=2)
+            server, port = await start_server(service)
+            try:
+                response = await http_request(port, 'POST', '/convert?name=test.zip&boot_first=1',
+                                              zip_path.read_bytes())
+                bad = await http_request(port, 'POST', '/convert?name=bad.zip', b'not a zip')
+                status = await http_request(port, 'GET', '/status')
+            finally:
+                server.close()
+                await service.close()
+            return response, bad, status
+
+        (tmp / 'work').mkdir()
+        (status, headers, data), bad, (_, _, status_body) = asyncio.run(run())
+
+        all_pass = True
+        if status != 200 or data != expected_path.read_bytes():
+            print(f"  ✗ Status {status}, {len(data)} bytes, expected {expected_path.stat().st_size}")
+            all_pass = False
+        else:
+            print(f"  ✓ {len(data):,} bytes streamed, identical to local conversion")
+
+        if bad[0] != 422:
+            print(f"  ✗ Bad upload gave status {bad[0]}")
+            all_pass = False
+        else:
+            print(f"  ✓ Bad upload rejected: {json.loads(bad[2])['error']}")
+
+        state = json.loads(status_body)
+        if state['jobs'] or state['memory_used'] or list((tmp / 'work').iterdir()):
+            print(f"  ✗ Jobs left behind: {state}")
+            all_pass = False
+        else:
+            print("  ✓ Job files cleaned up")
+
+    return all_pass
+
+
+def test_backpressure():
+    """Test worker/memory limits, the queue limit and FIFO start order."""
+    print("Testing backpressure...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        zip_path = make_zip(tmp / 'test.zip')
+
+        async def run():
+            service = ConversionService(tmp / 'work', max_workers=1, max_queued=1)
+            results = {}
+            try:
+                jobs = []
+                for _ in range(2):
+                    job_dir = service.new_job_dir()
+                    (job_dir / 'test.zip').write_bytes(zip_path.read_bytes())
+                    jobs.append(service.submit(job_dir / 'test.zip'))
+                results['states'] = [job.state for job in jobs]
+                try:
+                    service.submit(zip_path)
+                    results['busy'] = False
+                except ServiceBusy:
+                    results['busy'] = True
+
+                await asyncio.gather(*(job.task for job in jobs))
+                results['final'] = [job.state for job in jobs]
+                results['sizes'] = [job.result['size'] for job in jobs]
+            finally:
+                await service.close()
+
+            service = ConversionService(tmp / 'work', memory_budget=1024 * 1024)
+            server, port = await start_server(service)
+            try:
+                results['too_large'] = (await http_request(
+                    port, 'POST', '/convert?name=test.zip', zip_path.read_bytes()))[0]
+            finally:
+                server.close()
+                await service.close()
+            return results
+
+        (tmp / 'work').mkdir()
+        results = asyncio.run(run())
+
+    all_pass = True
+    checks = [
+        (results['states'] == ['running', 'queued'], f"initial states {results['states']}"),
+        (results['busy'], "third job refused while queue is full"),
+        (results['final'] == ['done', 'done'], f"final states {results['final']}"),
+        (results['sizes'][0] == results['sizes'][1], f"output sizes {results['sizes']}"),
+        (results['too_large'] == 413, f"over-budget upload status {results['too_large']}"),
+    ]
+    for ok, desc in checks:
+        print(f"  {'✓' if ok else '✗'} {desc}")
+        all_pass &= ok
+    return all_pass
+
+
+def test_cancellation():
+    """Test cancelling a running conversion and a queued job on client disconnect."""
+    print("Testing cancellation...")
+
+    all_pass = True
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        zip_path = make_zip(tmp / 'test.zip')
+
+        # Running job: worker stops at its next progress check
+        cancel_path = tmp / 'cancel'
+        cancel_path.touch()
+        try:
+            _run_conversion(str(zip_path), str(tmp / 'out.ngfc'), str(cancel_path), {})
+            print("  ✗ Conversion ran despite cancel request")
+            all_pass = False
+        except ConversionCancelled:
+            print("  ✓ Running conversion cancelled")
+
+        # Cancel request arriving during the checksum pass, before any output
+        with contextlib.redirect_stdout(io.StringIO()):
+            writer = NGFCWriter(load_romset(zip_path))
+        check = _cancel_check(str(tmp / 'prepass'))
+        calls = []
+
+        def progress(written):
+            calls.append(written)
+            if len(calls) == 2:
+                (tmp / 'prepass').touch()
+            check(written)
+
+        out = io.BytesIO()
+        try:
+            writer.write(out, progress)
+            print("  ✗ Conversion ignored cancel during checksum pass")
+            all_pass = False
+        except ConversionCancelled:
+            if out.tell() or calls != [0, 0]:
+                print(f"  ✗ Cancelled late: {out.tell()} bytes written, progress calls {calls}")
+                all_pass = False
+            else:
+                print("  ✓ Conversion cancelled during checksum pass")
+
+        async def run():
+            service = ConversionService(tmp / 'work', max_workers=1)
+            server, port = await start_server(service)
+            try:
+                service.running = 1  # Occupy the only worker
+                _, writer = await send_request(port, 'POST', '/convert?name=test.zip',
+                                               zip_path.read_bytes())
+                await wait_until(lambda: service.queued())
+                writer.close()
+                await wait_until(lambda: not service.jobs)
+                service.running = 0
+                return service.status()
+            finally:
+                server.close()
+                await service.close()
+
+        (tmp / 'work').mkdir()
+        status = asyncio.run(run())
+        if status['jobs'] or status['queued']:
+            print(f"  ✗ Queued job survived disconnect: {status}")
+            all_pass = False
+        else:
+            print("  ✓ Queued job cancelled on client disconnect")
+
+    return all_pass
+
+
+def test_upload_admission():
+    """Test that full queues and upload limits are refused before the body is sent."""
+    print("Testing upload admission...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        body = make_zip(tmp / 'test.zip').read_bytes()
+
+        async def start_upload(port: int, length: int):
+            """Send only the request headers; the body is held back."""
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f"POST /convert?name=test.zip HTTP/1.1\r\nHost: localhost\r\n"
+                         f"Content-Length: {length}\r\n\r\n".encode())
+            await writer.drain()
+            return reader, writer
+
+        async def refusal(port: int, length: int):
+            reader, writer = await start_upload(port, length)
+            try:
+                line = await asyncio.wait_for(reader.readline(), 2)
+                return int(line.split()[1])
+            finally:
+                writer.close()
+
+        async def run():
+            results = {}
+            # One worker, no queue: a held upload takes the only slot
+            service = ConversionService(tmp / 'work', max_workers=1, max_queued=0)
+            server, port = await start_server(service)
+            try:
+                reader, writer = await start_upload(port, len(body))
+                await wait_until(lambda: service.uploading == 1)
+                results['queue_full'] = await refusal(port, len(body))
+                results['leftover'] = list((tmp / 'work').iterdir())
+                writer.write(body)
+                results['held'] = int((await reader.readline()).split()[1])
+                writer.close()
+                await wait_until(lambda: not service.jobs and not service.uploading)
+            finally:
+                server.close()
+                await service.close()
+
+            service = ConversionService(tmp / 'work', max_workers=4, max_uploads=1,
+                                        memory_budget=64 * 1024 * 1024)
+            server, port = await start_server(service)
+            try:
+                _, writer = await start_upload(port, len(body))
+                await wait_until(lambda: service.uploading == 1)
+                results['uploads'] = await refusal(port, len(body))
+                writer.close()
+                await wait_until(lambda: not service.uploading)
+                results['too_large'] = await refusal(port, 64 * 1024 * 1024)
+            finally:
+                server.close()
+                await service.close()
+            return results
+
+        (tmp / 'work').mkdir()
+        results = asyncio.run(run())
+
+    all_pass = True
+    checks = [
+        (results['queue_full'] == 503, f"upload refused while the queue is full: {results['queue_full']}"),
+        (len(results['leftover']) == 1, f"only the admitted upload on disk: {len(results['leftover'])} dirs"),
+        (results['held'] == 200, f"admitted upload converted: {results['held']}"),
+        (results['uploads'] == 503, f"upload refused over the upload limit: {results['uploads']}"),
+        (results['too_large'] == 413, f"over-budget Content-Length refused: {results['too_large']}"),
+    ]
+    for ok, desc in checks:
+        print(f"  {'✓' if ok else '✗'} {desc}")
+        all_pass &= ok
+    return all_pass
+
+
+def main():
+    """Run all tests."""
+    print("=" * 60)
+    print("NGFC Conversion Service Test Suite")
+    print("=" * 60)
+
+    tests = [
+        test_streamed_conversion,
+        test_backpressure,
+        test_upload_admission,
+        test_cancellation,
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        print()
+        try:
+            if test():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"  ✗ Exception: {e}")
+            failed += 1
+
+    print()
+    print("=" * 60)
+    print(f"Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
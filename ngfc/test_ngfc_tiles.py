@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Test suite for the C-ROM sprite tile decoder.
+
+Verifies the batch decoder against a per-pixel reference taken from MAME's
+neosprite_optimized_device::optimize_sprite_data(), and that .ngfc and
+MAME sources decode to the same tiles.
+"""
+
+import struct
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ngfc_converter import convert_to_ngfc
+from ngfc_tiles import (
+    decode_tiles,
+    TileSource,
+    export_atlas,
+    tiles_command,
+)
+
+
+def reference_decode(c1: bytes, c2: bytes) -> bytearray:
+    """Per-pixel decoder following MAME's loop over the combined sprite region."""
+    combined = bytearray(len(c1) * 2)
+    combined[0::2] = c1
+    combined[1::2] = c2
+    
+    out = bytearray()
+    for tile in range(0, len(combined), 0x80):
+        src = tile
+        for y in range(16):
+            for half in (0x40, 0x00):
+                s = src + half
+                for x in range(8):
+                    out.append((((combined[s + 3] >> x) & 1) << 3) |
+                               (((combined[s + 1] >> x) & 1) << 2) |
+                               (((combined[s + 2] >> x) & 1) << 1) |
+                               ((combined[s + 0] >> x) & 1))
+            src += 4
+    return out
+
+
+def make_crom(tiles: int, seed: int) -> bytes:
+    return bytes([(i * seed + (i >> 7)) & 0xFF for i in range(tiles * 64)])
+
+
+def test_decode_matches_reference():
+    """Test batch decoding against the per-pixel reference."""
+    print("Testing tile decode against MAME reference...")
+    
+    c1 = make_crom(24, 37)
+    c2 = make_crom(24, 101)
+    result = decode_tiles(c1, c2)
+    expected = reference_decode(c1, c2)
+    
+    if result == expected:
+        print("  ✓ 24 tiles decoded identically")
+        return True
+    
+    first = next(i for i in range(len(expected)) if result[i] != expected[i])
+    print(f"  ✗ Mismatch at tile {first // 256}, pixel {first % 256}")
+    return False
+
+
+def test_decode_known_tile():
+    """Test a hand-built tile: pixel (x, y) = x for the left half, 15 - x for the right."""
+    print("Testing known tile pattern...")
+    
+    c1 = bytearray(64)
+    c2 = bytearray(64)
+    for y in range(16):
+        for x in range(8):
+            for half, value in ((0x20, x), (0x00, 15 - (x + 8))):
+                # Bitplanes 0/1 in C1, 2/3 in C2
+                c1[half + y * 2 + 0] |= (value & 1) << x
+                c1[half + y * 2 + 1] |= ((value >> 1) & 1) << x
+                c2[half + y * 2 + 0] |= ((value >> 2) & 1) << x
+                c2[half + y * 2 + 1] |= ((value >> 3) & 1) << x
+    
+    pixels = decode_tiles(bytes(c1), bytes(c2))
+    expected = bytes(list(range(8)) + [15 - x for x in range(8, 16)]) * 16
+    
+    if pixels == expected:
+        print("  ✓ Known tile decoded correctly")
+        return True
+    print(f"  ✗ Got first line {list(pixels[:16])}")
+    return False
+
+
+def test_ngfc_and_romset_sources():
+    """Test that an .ngfc C section and its source set decode the same, and diffing."""
+    print("Testing NGFC and ROM set tile sources...")
+    
+    all_pass = True
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        set_dir = tmp / 'tiles'
+        set_dir.mkdir()
+        (set_dir / 'tiles-p1.bin').write_bytes(bytes(256))
+        (set_dir / 'tiles-c1.bin').write_bytes(make_crom(40, 3))
+        (set_dir / 'tiles-c2.bin').write_bytes(make_crom(40, 5))
+        (set_dir / 'tiles-c3.bin').write_bytes(make_crom(8, 7))
+        (set_dir / 'tiles-c4.bin').write_bytes(make_crom(8, 11))
+        # Third pair larger than the second: needs the pair size table
+        (set_dir / 'tiles-c5.bin').write_bytes(make_crom(16, 13))
+        (set_dir / 'tiles-c6.bin').write_bytes(make_crom(16, 17))
+        ngfc_path = tmp / 'tiles.ngfc'
+        convert_to_ngfc(set_dir, ngfc_path)
+        
+        with TileSource(ngfc_path) as ngfc, TileSource(set_dir) as romset:
+            if ngfc.tile_count != 64 or romset.tile_count != 64:
+                print(f"  ✗ Tile counts: {ngfc.tile_count}, {romset.tile_count}")
+                return False
+            # Range spanning all three pairs
+            if decode_tiles(*ngfc.read(30, 34)) != decode_tiles(*romset.read(30, 34)):
+                print("  ✗ NGFC tiles differ from ROM set tiles")
+                all_pass = False
+            
+            pages, changed = export_atlas(ngfc, tmp / 'atlas.png', columns=8, rows=4, other=romset)
+            if len(pages) != 2 or changed:
+                print(f"  ✗ Expected 2 identical pages, got {len(pages)} pages, {len(changed)} changed")
+                all_pass = False
+            
+            png = pages[0].read_bytes()
+            width, height = struct.unpack('>II', png[16:24])
+            if png[:8] != b'\x89PNG\r\n\x1a\n' or (width, height) != (128, 64):
+                print(f"  ✗ Bad PNG page: {width}x{height}")
+                all_pass = False
+        
+        # Change one tile of C3 and diff again
+        c3 = bytearray(make_crom(8, 7))
+        c3[5 * 64 + 3] ^= 0x10
+        (set_dir / 'tiles-c3.bin').write_bytes(c3)
+        with TileSource(ngfc_path) as ngfc, TileSource(set_dir) as romset:
+            _, changed = export_atlas(ngfc, tmp / 'diff.png', other=romset)
+        if changed != [45]:
+            print(f"  ✗ Expected tile 45 to differ, got {changed}")
+            all_pass = False
+    
+    if all_pass:
+        print("  ✓ Sources agree and diff finds the changed tile")
+    return all_pass
+
+
+def test_atlas_arguments():
+    """Test that out-of-range starts and empty counts or pages are refused."""
+    print("Testing atlas argument checks...")
+    
+    all_pass = True
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        set_dir = tmp / 'args'
+        set_dir.mkdir()
+        (set_dir / 'args-p1.bin').write_bytes(bytes(256))
+        (set_dir / 'args-c1.bin').write_bytes(make_crom(8, 3))
+        (set_dir / 'args-c2.bin').write_bytes(make_crom(8, 5))
+        
+        cases = [
+            ('start past the end', dict(start=8)),
+            ('negative start', dict(start=-1)),
+            ('zero count', dict(count=0)),
+            ('negative count', dict(count=-4)),
+            ('zero columns', dict(columns=0)),
+            ('zero rows', dict(rows=0)),
+        ]
+        with TileSource(set_dir) as source:
+            for desc, kwargs in cases:
+                try:
+                    export_atlas(source, tmp / 'bad.png', **kwargs)
+                    print(f"  ✗ {desc}: accepted")
+                    all_pass = False
+                except ValueError:
+                    pass
+            pages, _ = export_atlas(source, tmp / 'last.png', start=7)
+            if len(pages) != 1:
+                print(f"  ✗ Last tile alone: {len(pages)} pages")
+                all_pass = False
+        
+        if tiles_command(set_dir, tmp / 'cli.png', start=8) or tiles_command(set_dir, tmp / 'cli.png', columns=0):
+            print("  ✗ tiles command accepted bad arguments")
+            all_pass = False
+        if any(tmp.glob('bad*.png')) or any(tmp.glob('cli*.png')):
+            print("  ✗ Pages written for refused arguments")
+            all_pass = False
+    
+    if all_pass:
+        print(f"  ✓ {len(cases)} bad argument sets refused")
+    return all_pass
+
+
+def main():
+    """Run all tests."""
+    print("=" * 60)
+    print("NGFC Tile Decoder Test Suite")
+    print("=" * 60)
+    print()
+    
+    tests = [
+        test_decode_matches_reference,
+        test_decode_known_tile,
+        test_ngfc_and_romset_sources,
+        test_atlas_arguments,
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        print()
+        try:
+            if test():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"  ✗ Exception: {e}")
+            failed += 1
+    
+    print()
+    print("=" * 60)
+    print(f"Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+    
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())